@@ -1,23 +1,46 @@
 """
 app/agents/graph_system.py
 """
+import logging
 from typing import TypedDict, Annotated, Sequence, Dict, Any, List
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text, select
 from uuid import UUID
 
-from app.models import Evaluation, QuestionTemplate, EvaluationAnswer, Prospect, JobPosition
+from app.config import settings
+from app.models import Evaluation, Prospect
+from app.services.answer_writer import ANSWER_WRITE_MODES, AnswerWrite, answer_write_queue, write_answers
+from app.services.email_outbox import email_outbox
 from app.services.embeddings import embedding_service
-from app.tools.email_tools import send_evaluation_result_email, send_hr_notification
+from app.services.ideal_embeddings import ideal_embedding_store
+from app.services.position_catalog import PositionSummary, position_catalog
+from app.services.question_bank import question_bank_cache
+from app.tools.email_tools import queue_evaluation_emails
+
+logger = logging.getLogger(__name__)
+
+# Valores de durability que acepta graph.ainvoke
+DURABILITY_MODES = ("sync", "async", "exit")
 
 
 def limit_messages(existing: Sequence[BaseMessage], new: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
-    MAX_MESSAGES = 6
-    combined = list(existing) + list(new)
-    return combined[-MAX_MESSAGES:] if len(combined) > MAX_MESSAGES else combined
+    max_messages = settings.CHAT_CONTEXT_MESSAGES
+    existing = list(existing or [])
+    new = list(new or [])
+
+    # Los nodos devuelven el historial completo (existente + nuevos): lo que la
+    # actualización repite del final del historial no se vuelve a agregar
+    overlap = next(
+        (size for size in range(min(len(existing), len(new)), 0, -1) if existing[-size:] == new[:size]),
+        0
+    )
+    combined = existing + new[overlap:]
+
+    return combined[-max_messages:] if len(combined) > max_messages else combined
 
 
 class EvaluationState(TypedDict):
@@ -29,7 +52,8 @@ class EvaluationState(TypedDict):
     current_question: int
     total_questions_test_1: int
     total_questions_test_2: int
-    current_question_data: Dict[str, Any]
+    current_question_id: str
+    question_bank_version: str
     prospect_id: str
     prospect_name: str
     prospect_email: str
@@ -39,14 +63,28 @@ class EvaluationState(TypedDict):
     selected_position: str
     cv_uploaded: bool
     data_confirmed: bool
-    available_positions: List[Dict[str, Any]]
+    position_ids: List[str]
     waiting_for_start: bool
+    pending_answers: List[dict]
+    # Por test ("1", "2"): [suma de score * weight, suma de weight] de lo respondido;
+    # None si la evaluación se retomó de otra sesión (el cierre recalcula en la BD)
+    score_totals: Dict[str, List[float]]
 
 
 class EvaluationAgent:
 
-    def __init__(self, db: AsyncSession, openai_key: str, checkpointer=None):
-        self.db = db
+    def __init__(
+        self,
+        openai_key: str,
+        checkpointer=None,
+        durability: str = settings.CHECKPOINT_DURABILITY,
+        answer_write_mode: str = settings.ANSWER_WRITE_MODE
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Durabilidad de checkpoint no soportada: {durability}")
+        if answer_write_mode not in ANSWER_WRITE_MODES:
+            raise ValueError(f"Modo de escritura de respuestas no soportado: {answer_write_mode}")
+
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.7,
@@ -55,6 +93,8 @@ class EvaluationAgent:
             timeout=20.0
         )
         self.checkpointer = checkpointer
+        self.durability = durability
+        self.answer_write_mode = answer_write_mode
         self.graph = self._build_graph()
 
     def _build_graph(self) -> StateGraph:
@@ -88,6 +128,7 @@ class EvaluationAgent:
                 "await_start": "await_start_confirmation",
                 "eval": "fetch_current_question",
                 "score": "score_answer",
+                "finish": "complete_evaluation",
                 "end": END
             }
         )
@@ -130,10 +171,17 @@ class EvaluationAgent:
 
     def _route_workflow(self, state: EvaluationState) -> EvaluationState:
         return state
+
+    def _db(self, config: RunnableConfig) -> AsyncSession:
+        return config["configurable"]["db"]
     
     def _route_by_stage(self, state: EvaluationState) -> str:
         stage = state.get("workflow_stage", "initial")
         
+        if stage == "answers_unsaved" and not state.get("should_close"):
+            # La evaluación terminó pero quedaron respuestas sin guardar: se reintenta
+            return "finish"
+        
         if state.get("should_close") or state.get("is_complete"):
             return "end"
         
@@ -183,23 +231,24 @@ class EvaluationAgent:
                 return content
         return ""
 
-    async def _greet_and_list_positions(self, state: EvaluationState) -> EvaluationState:
-        positions = await self._load_active_positions()
+    async def _greet_and_list_positions(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
+        positions = (await position_catalog.get(db)).positions
         
         if not positions:
             state["should_close"] = True
             state["messages"] = list(state.get("messages", [])) + [AIMessage(content="No hay posiciones activas.")]
             return state
 
-        state["available_positions"] = positions
+        state["position_ids"] = [pos.id for pos in positions]
 
         greeting = "Bienvenido al proceso de selección.\n\nPosiciones disponibles:\n\n"
         
         for idx, pos in enumerate(positions, 1):
-            greeting += f"{idx}. {pos['title']}\n"
-            greeting += f"   Salario: {pos['currency']} {pos['salary']}\n"
-            if pos['description']:
-                desc = pos['description'][:150]
+            greeting += f"{idx}. {pos.title}\n"
+            greeting += f"   Salario: {pos.currency} {pos.salary}\n"
+            if pos.description:
+                desc = pos.description[:150]
                 greeting += f"   {desc}\n"
             greeting += "\n"
         
@@ -212,17 +261,18 @@ class EvaluationAgent:
         
         return state
 
-    async def _process_position_selection(self, state: EvaluationState) -> EvaluationState:
+    async def _process_position_selection(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         user_input = self._extract_user_message(state).strip()
         
         if not user_input:
             return state
         
-        positions = state.get("available_positions", [])
-        
-        if not positions:
-            positions = await self._load_active_positions()
-            state["available_positions"] = positions
+        catalog = await position_catalog.get(db)
+        position_ids = state.get("position_ids") or [pos.id for pos in catalog.positions]
+        state["position_ids"] = position_ids
+        # Mismo orden del listado; las posiciones desactivadas desde entonces quedan en None
+        positions = [catalog.get(position_id) for position_id in position_ids]
         
         selected = None
         
@@ -234,12 +284,12 @@ class EvaluationAgent:
             selected = self._match_position_by_name(user_input, positions)
         
         if selected:
-            state["position_id"] = str(selected["id"])
-            state["selected_position"] = selected["title"]
+            state["position_id"] = selected.id
+            state["selected_position"] = selected.title
             state["workflow_stage"] = "position_selected"
             
             state["messages"] = list(state.get("messages", [])) + [AIMessage(
-                content=f"Has seleccionado: {selected['title']}.\n\nPerfecto, ahora necesito tu CV."
+                content=f"Has seleccionado: {selected.title}.\n\nPerfecto, ahora necesito tu CV."
             )]
         else:
             state["messages"] = list(state.get("messages", [])) + [AIMessage(
@@ -248,20 +298,21 @@ class EvaluationAgent:
         
         return state
 
-    def _match_position_by_name(self, user_input: str, positions: List[Dict]) -> Dict[str, Any]:
+    def _match_position_by_name(self, user_input: str, positions: List[PositionSummary]) -> PositionSummary:
         lower = user_input.lower()
+        positions = [pos for pos in positions if pos is not None]
         
         for pos in positions:
-            if pos['title'].lower() == lower:
+            if pos.title.lower() == lower:
                 return pos
         
         for pos in positions:
-            if lower in pos['title'].lower():
+            if lower in pos.title.lower():
                 return pos
         
         user_words = set(lower.split())
         for pos in positions:
-            title_words = set(pos['title'].lower().split())
+            title_words = set(pos.title.lower().split())
             if len(user_words & title_words) >= min(2, len(user_words)):
                 return pos
         
@@ -275,14 +326,15 @@ class EvaluationAgent:
         
         return state
 
-    async def _display_extracted_data(self, state: EvaluationState) -> EvaluationState:
+    async def _display_extracted_data(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         if not state.get("prospect_id"):
             state["messages"] = list(state.get("messages", [])) + [AIMessage(
                 content="Error: No se encontró información del prospecto"
             )]
             return state
         
-        prospect = await self._load_prospect(UUID(state["prospect_id"]))
+        prospect = await self._load_prospect(db, UUID(state["prospect_id"]))
         
         confirmation = f"Datos extraídos de tu CV:\n\n"
         confirmation += f"Nombre: {prospect.first_name} {prospect.last_name}\n"
@@ -319,7 +371,8 @@ class EvaluationAgent:
         
         return state
 
-    async def _initialize_evaluation(self, state: EvaluationState) -> EvaluationState:
+    async def _initialize_evaluation(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         if not state.get("data_confirmed"):
             state["messages"] = list(state.get("messages", [])) + [AIMessage(content="Error: Datos no confirmados.")]
             return state
@@ -335,21 +388,22 @@ class EvaluationAgent:
         prospect_id = UUID(state["prospect_id"])
         position_id = UUID(state["position_id"])
         
-        await self._cleanup_orphaned_evaluation(prospect_id, position_id)
+        await self._cleanup_orphaned_evaluation(db, prospect_id, position_id)
         
-        existing_eval = await self._check_for_recent_evaluation(prospect_id, position_id)
+        existing_eval = await self._check_for_recent_evaluation(db, prospect_id, position_id)
         
         if existing_eval:
             if existing_eval['can_continue']:
                 state["evaluation_id"] = str(existing_eval['id'])
                 state["current_test"] = existing_eval['current_test']
                 state["current_question"] = existing_eval['current_question']
+                # Lo respondido en la sesión anterior no está en estos totales: el cierre usa calculate_evaluation_scores
+                state["score_totals"] = None
                 
-                questions_test_1 = await self._load_questions(position_id, 1)
-                questions_test_2 = await self._load_questions(position_id, 2)
+                bank = await question_bank_cache.get(db, state["position_id"])
                 
-                state["total_questions_test_1"] = len(questions_test_1)
-                state["total_questions_test_2"] = len(questions_test_2)
+                state["total_questions_test_1"] = bank.total(1)
+                state["total_questions_test_2"] = bank.total(2)
                 
                 state["workflow_stage"] = "in_progress"
                 state["waiting_for_start"] = False
@@ -373,35 +427,35 @@ class EvaluationAgent:
             current_question=1
         )
         
-        self.db.add(evaluation)
-        await self.db.flush()
-        await self.db.commit()
-        await self.db.refresh(evaluation)
+        db.add(evaluation)
+        await db.flush()
+        await db.commit()
+        await db.refresh(evaluation)
         
         state["evaluation_id"] = str(evaluation.id)
         
-        questions_test_1 = await self._load_questions(position_id, 1)
-        questions_test_2 = await self._load_questions(position_id, 2)
+        bank = await question_bank_cache.get(db, state["position_id"])
         
-        if not questions_test_1:
+        if not bank.total(1):
             state["messages"] = list(state.get("messages", [])) + [AIMessage(
                 content="Error: No hay preguntas configuradas."
             )]
             state["should_close"] = True
             return state
 
-        state["total_questions_test_1"] = len(questions_test_1)
-        state["total_questions_test_2"] = len(questions_test_2)
+        state["total_questions_test_1"] = bank.total(1)
+        state["total_questions_test_2"] = bank.total(2)
         
         state["current_test"] = 1
         state["current_question"] = 1
+        state["score_totals"] = {}
         
         state["workflow_stage"] = "evaluation_initialized"
         
         return state
     
-    async def _cleanup_orphaned_evaluation(self, prospect_id: UUID, position_id: UUID):
-        result = await self.db.execute(
+    async def _cleanup_orphaned_evaluation(self, db: AsyncSession, prospect_id: UUID, position_id: UUID):
+        result = await db.execute(
             text("""
                 UPDATE evaluations
                 SET 
@@ -429,10 +483,10 @@ class EvaluationAgent:
         abandoned_evals = result.fetchall()
         
         if abandoned_evals:
-            await self.db.commit()
+            await db.commit()
     
-    async def _check_for_recent_evaluation(self, prospect_id: UUID, position_id: UUID) -> Dict[str, Any]:
-        result = await self.db.execute(
+    async def _check_for_recent_evaluation(self, db: AsyncSession, prospect_id: UUID, position_id: UUID) -> Dict[str, Any]:
+        result = await db.execute(
             text("""
                 SELECT 
                     e.id,
@@ -511,94 +565,61 @@ class EvaluationAgent:
         
         return state
 
-    async def _load_active_positions(self) -> List[Dict[str, Any]]:
-        result = await self.db.execute(
-            select(JobPosition).where(JobPosition.is_active == True)
-        )
-        positions = result.scalars().all()
-        
-        return [
-            {
-                "id": str(pos.id),
-                "title": pos.title,
-                "description": pos.description,
-                "salary": float(pos.salary) if pos.salary else 0.0,
-                "currency": pos.currency
-            }
-            for pos in positions
-        ]
-
-    async def _load_prospect(self, prospect_id: UUID):
-        result = await self.db.execute(
+    async def _load_prospect(self, db: AsyncSession, prospect_id: UUID):
+        result = await db.execute(
             select(Prospect).where(Prospect.id == prospect_id)
         )
         return result.scalar_one_or_none()
 
-    async def _load_questions(self, position_id: UUID, test_number: int):
-        result = await self.db.execute(
-            select(QuestionTemplate)
-            .where(
-                QuestionTemplate.position_id == position_id,
-                QuestionTemplate.test_number == test_number,
-                QuestionTemplate.is_active == True
-            )
-            .order_by(QuestionTemplate.question_order)
-        )
-        return result.scalars().all()
-
-    async def _fetch_current_question(self, state: EvaluationState) -> EvaluationState:
+    async def _fetch_current_question(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         current_test = state.get("current_test", 0)
         current_question = state.get("current_question", 0)
 
         if current_test == 0 or current_question == 0:
             state["is_complete"] = True
-            state["current_question_data"] = {}
+            state["current_question_id"] = ""
             return state
 
-        position_id = UUID(state["position_id"])
-        questions = await self._load_questions(position_id, current_test)
+        bank = await question_bank_cache.get(db, state["position_id"])
+        question = bank.question(current_test, current_question)
 
-        if not questions:
-            state["is_complete"] = True
-            state["current_question_data"] = {}
-            return state
-
-        question_index = current_question - 1
-        
-        if 0 <= question_index < len(questions):
-            q = questions[question_index]
-            state["current_question_data"] = {
-                "id": str(q.id),
-                "text": q.question_text,
-                "validation_type": q.validation_type,
-                "ideal_answer": q.ideal_answer,
-                "expected_keywords": q.expected_keywords,
-                "min_similarity": float(q.min_similarity),
-                "weight": float(q.weight)
-            }
+        if question:
+            state["current_question_id"] = question.id
+            state["question_bank_version"] = bank.version
             state["is_complete"] = False
         else:
             state["is_complete"] = True
-            state["current_question_data"] = {}
+            state["current_question_id"] = ""
         
         return state
 
-    async def _send_question(self, state: EvaluationState) -> EvaluationState:
+    async def _resolve_current_question(self, db: AsyncSession, state: EvaluationState):
+        question_id = state.get("current_question_id")
+        if not question_id:
+            return None
+
+        bank = await question_bank_cache.get(db, state["position_id"])
+        if bank.version != state.get("question_bank_version"):
+            logger.warning(f"Banco de preguntas modificado durante la evaluación {state.get('evaluation_id')}")
+
+        return bank.find(question_id)
+
+    async def _send_question(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
         if state.get("is_complete"):
             return state
 
-        message = self._format_question_message(state)
+        question = await self._resolve_current_question(self._db(config), state)
+        message = self._format_question_message(state, question)
         state["messages"] = list(state.get("messages", [])) + [AIMessage(content=message)]
 
         return state
 
-    def _format_question_message(self, state: EvaluationState) -> str:
-        question_data = state.get("current_question_data", {})
-        
-        if not question_data:
+    def _format_question_message(self, state: EvaluationState, question) -> str:
+        if question is None:
             return "Error: No se encontró la pregunta"
         
-        question_text = question_data.get("text", "")
+        question_text = question.text
         current_test = state.get("current_test", 1)
         current_question = state.get("current_question", 1)
         total_questions = state.get("total_questions_test_1", 0) if current_test == 1 else state.get("total_questions_test_2", 0)
@@ -611,41 +632,57 @@ class EvaluationAgent:
         else:
             return f"Pregunta {current_question}/{total_questions}: {question_text}"
 
-    async def _score_answer(self, state: EvaluationState) -> EvaluationState:
+    async def _score_answer(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         user_answer = self._extract_user_message(state)
-        question_data = state.get("current_question_data", {})
+        question = await self._resolve_current_question(db, state)
         
-        if not question_data or "id" not in question_data:
+        if question is None:
             state["messages"] = list(state.get("messages", [])) + [AIMessage(content="Error: No se pudo cargar la pregunta.")]
             state["should_close"] = True
             return state
 
+        question_data = question.as_dict()
         validation_type = question_data.get("validation_type", "semantic")
         
         answer_embedding = None
         if validation_type == "semantic":
-            answer_embedding = embedding_service.encode_single(user_answer)
+            answer_embedding = await embedding_service.embed_vector(user_answer)
         
         score, similarity_score, matched_keywords, feedback = await self._compute_score(
-            user_answer, question_data, answer_embedding
+            db, user_answer, question_data, answer_embedding, state["position_id"]
         )
 
-        await self._persist_answer(
-            state["evaluation_id"],
-            question_data["id"],
-            user_answer,
-            answer_embedding,
-            score,
-            similarity_score,
-            matched_keywords,
-            feedback
+        self._accumulate_score(state, state["current_test"], float(score), question_data.get("weight", 1.0))
+        self._advance_progress(state)
+
+        write = AnswerWrite(
+            evaluation_id=state["evaluation_id"],
+            question_id=question_data["id"],
+            answer_text=user_answer,
+            score=float(score),
+            similarity_score=float(similarity_score) if similarity_score is not None else None,
+            matched_keywords=list(matched_keywords),
+            feedback=feedback,
+            semantic=validation_type == "semantic",
+            current_test=None if state.get("is_complete") else state["current_test"],
+            current_question=None if state.get("is_complete") else state["current_question"],
+            answer_embedding=answer_embedding
         )
 
-        await self._advance_progress(state)
+        if self.answer_write_mode == "deferred":
+            # La siguiente pregunta sale sin esperar a la BD; el estado guarda la escritura hasta que se confirme
+            pending = answer_write_queue.reconcile(state["session_token"], state.get("pending_answers", []))
+            answer_write_queue.submit(state["session_token"], write)
+            state["pending_answers"] = pending + [write.as_state()]
+        else:
+            position = await write_answers(db, [write])
+            if position and not state.get("is_complete"):
+                state["current_test"], state["current_question"] = position
         
         return state
 
-    async def _compute_score(self, user_answer: str, question_data: Dict, answer_embedding):
+    async def _compute_score(self, db: AsyncSession, user_answer: str, question_data: Dict, answer_embedding, position_id: str):
         score = 0.0
         similarity_score = None
         matched_keywords = []
@@ -655,9 +692,9 @@ class EvaluationAgent:
 
         if validation_type == "semantic":
             if answer_embedding is None:
-                answer_embedding = embedding_service.encode_single(user_answer)
+                answer_embedding = await embedding_service.embed_vector(user_answer)
             score, similarity_score, feedback = await self._apply_semantic_validation(
-                question_data, answer_embedding
+                db, question_data, answer_embedding, position_id
             )
         elif validation_type == "keyword":
             score, matched_keywords, feedback = self._apply_keyword_validation(
@@ -671,25 +708,18 @@ class EvaluationAgent:
 
         return score, similarity_score, matched_keywords, feedback
 
-    async def _apply_semantic_validation(self, question_data: Dict, answer_embedding):
+    async def _apply_semantic_validation(self, db: AsyncSession, question_data: Dict, answer_embedding, position_id: str):
         feedback = {}
 
         if not question_data.get("ideal_answer"):
             return 0.0, None, feedback
 
-        ideal_embedding_result = await self.db.execute(
-            text("SELECT ideal_embedding FROM question_templates WHERE id = :question_id"),
-            {"question_id": question_data["id"]}
-        )
-        ideal_embedding_row = ideal_embedding_result.fetchone()
+        ideal_embedding = await ideal_embedding_store.get(db, position_id, question_data["id"])
 
-        if not ideal_embedding_row or not ideal_embedding_row[0]:
+        if ideal_embedding is None:
             return 0.0, None, feedback
 
-        similarity = embedding_service.cosine_similarity(
-            answer_embedding,
-            ideal_embedding_row[0]
-        )
+        similarity = embedding_service.cosine_similarity(answer_embedding, ideal_embedding)
 
         min_similarity = question_data.get("min_similarity", 0.65)
 
@@ -734,52 +764,46 @@ class EvaluationAgent:
         else:
             return 50, {"response": "unclear"}
 
-    async def _persist_answer(self, evaluation_id, question_id, answer_text,
-                          answer_embedding, score, similarity_score,
-                          matched_keywords, feedback):
-        
-        if not answer_embedding or len(answer_embedding) == 0:
-            answer_embedding = None
-        
-        answer_record = EvaluationAnswer(
-            evaluation_id=UUID(evaluation_id),
-            question_id=UUID(question_id),
-            answer_text=answer_text,
-            answer_embedding=answer_embedding,
-            score=score,
-            similarity_score=similarity_score,
-            matched_keywords=matched_keywords,
-            feedback_points=feedback
-        )
-
-        self.db.add(answer_record)
-        await self.db.flush()
-        await self.db.commit()
-
-    async def _advance_progress(self, state: EvaluationState):
+    def _advance_progress(self, state: EvaluationState):
         current_test = state["current_test"]
         current_question = state["current_question"]
         total_questions_current = state["total_questions_test_1"] if current_test == 1 else state["total_questions_test_2"]
 
         if current_test == 1 and current_question >= total_questions_current:
-            await self.db.execute(
-                text("UPDATE evaluations SET current_test = 2, current_question = 1 WHERE id = :eval_id"),
-                {"eval_id": state["evaluation_id"]}
-            )
-            await self.db.commit()
             state["current_test"] = 2
             state["current_question"] = 1
         elif current_test == 2 and current_question >= total_questions_current:
             state["is_complete"] = True
         else:
-            await self.db.execute(
-                text("UPDATE evaluations SET current_question = current_question + 1 WHERE id = :eval_id"),
-                {"eval_id": state["evaluation_id"]}
-            )
-            await self.db.commit()
             state["current_question"] += 1
 
-    async def _complete_evaluation(self, state: EvaluationState) -> EvaluationState:
+    def _accumulate_score(self, state: EvaluationState, test_number: int, score: float, weight: float):
+        if state.get("score_totals") is None:
+            return
+
+        totals = {key: list(value) for key, value in state["score_totals"].items()}
+        weighted, weights = totals.get(str(test_number), [0.0, 0.0])
+        weight = float(weight) if weight is not None else 1.0
+        totals[str(test_number)] = [weighted + score * weight, weights + weight]
+        state["score_totals"] = totals
+
+    def _running_scores(self, totals: Dict[str, List[float]]) -> Dict[str, Any]:
+        test_scores = []
+
+        for test_number in ("1", "2"):
+            weighted, weights = totals.get(test_number, [0.0, 0.0])
+            test_scores.append(round(weighted / weights, 2) if weights else 0.0)
+
+        total_score = round(sum(test_scores) / len(test_scores), 2)
+        return {
+            "test_1_score": test_scores[0],
+            "test_2_score": test_scores[1],
+            "total_score": total_score,
+            "passed": total_score >= settings.EVALUATION_PASS_SCORE
+        }
+
+    async def _complete_evaluation(self, state: EvaluationState, config: RunnableConfig) -> EvaluationState:
+        db = self._db(config)
         eval_id = state.get("evaluation_id", "")
         
         if not eval_id:
@@ -787,93 +811,115 @@ class EvaluationAgent:
             state["should_close"] = True
             return state
         
-        await self._compute_final_scores(eval_id)
+        session_token = state["session_token"]
+        if state.get("pending_answers"):
+            answer_write_queue.reconcile(session_token, state["pending_answers"])
+
+        if not await answer_write_queue.drain(session_token):
+            # Lo no confirmado queda en el estado y se reintenta en el siguiente mensaje
+            state["pending_answers"] = answer_write_queue.reconcile(session_token, state.get("pending_answers", []))
+            state["workflow_stage"] = "answers_unsaved"
+            state["is_complete"] = False
+            state["messages"] = list(state.get("messages", [])) + [AIMessage(
+                content="Terminaste la evaluación, pero no pudimos guardar tus últimas respuestas. "
+                        "Envía cualquier mensaje en unos segundos para reintentar."
+            )]
+            return state
 
-        evaluation = await self._load_evaluation_by_id(eval_id)
-        prospect = await self._load_prospect(UUID(state["prospect_id"]))
-        position_title = await self._load_position_title(UUID(state["position_id"]))
+        answer_write_queue.forget(session_token)
+        state["pending_answers"] = []
 
-        if prospect.email:
-            await self._dispatch_notification_emails(
-                evaluation, prospect, position_title
-            )
+        scores = await self._finalize_evaluation(db, state)
+        email_outbox.wake()
 
-        final_message = self._construct_final_message(state, evaluation)
+        final_message = self._construct_final_message(scores)
         state["messages"] = list(state.get("messages", [])) + [AIMessage(content=final_message)]
         state["should_close"] = True
+        state["is_complete"] = True
         state["workflow_stage"] = "completed"
 
         return state
 
-    async def _compute_final_scores(self, evaluation_id: str):
-        await self.db.execute(
-            text("SELECT calculate_evaluation_scores(:eval_id)"),
-            {"eval_id": evaluation_id}
-        )
-        await self.db.commit()
+    async def _finalize_evaluation(self, db: AsyncSession, state: EvaluationState) -> Dict[str, Any]:
+        """Puntajes finales y correos al outbox en una sola transacción"""
+        if state.get("score_totals") is None:
+            scores = await self._calculate_scores_in_db(db, state["evaluation_id"])
+        else:
+            scores = self._running_scores(state["score_totals"])
+            await db.execute(
+                text("""
+                    UPDATE evaluations
+                    SET
+                        test_1_score = :test_1_score,
+                        test_2_score = :test_2_score,
+                        total_score = :total_score,
+                        passed_ai = :passed,
+                        status = 'completed',
+                        completed_at = CURRENT_TIMESTAMP,
+                        duration_seconds = EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - started_at))::int
+                    WHERE id = :eval_id
+                """),
+                {"eval_id": state["evaluation_id"], **scores}
+            )
 
-    async def _load_evaluation_by_id(self, evaluation_id: str):
-        result = await self.db.execute(
-            select(Evaluation).where(Evaluation.id == UUID(evaluation_id))
-        )
-        return result.scalar_one()
+        if state.get("prospect_email"):
+            queue_evaluation_emails(
+                db,
+                evaluation_id=state["evaluation_id"],
+                prospect_email=state["prospect_email"],
+                prospect_name=state.get("prospect_name", ""),
+                position_id=state["position_id"],
+                position_title=state.get("selected_position") or await self._position_title(db, state["position_id"]),
+                total_score=scores["total_score"],
+                test_1_score=scores["test_1_score"],
+                test_2_score=scores["test_2_score"],
+                passed=scores["passed"]
+            )
+
+        await db.commit()
+        return scores
 
-    async def _load_position_title(self, position_id: UUID) -> str:
-        result = await self.db.execute(
-            text("SELECT title FROM job_positions WHERE id = :pos_id"),
-            {"pos_id": str(position_id)}
+    async def _calculate_scores_in_db(self, db: AsyncSession, evaluation_id: str) -> Dict[str, Any]:
+        """Sin totales acumulados (evaluación retomada o checkpoint anterior): se recalcula en la BD"""
+        await db.execute(
+            text("SELECT calculate_evaluation_scores(:eval_id)"),
+            {"eval_id": evaluation_id}
         )
-        row = result.fetchone()
-        return row[0] if row else "Posición"
-
-    async def _dispatch_notification_emails(self, evaluation, prospect, position_title):
-        test_1_score = float(evaluation.test_1_score) if evaluation.test_1_score is not None else 0.0
-        test_2_score = float(evaluation.test_2_score) if evaluation.test_2_score is not None else 0.0
-        total_score = float(evaluation.total_score) if evaluation.total_score is not None else 0.0
-        
-        await send_evaluation_result_email(
-            prospect_email=prospect.email,
-            prospect_name=f"{prospect.first_name} {prospect.last_name}",
-            total_score=total_score,
-            test_1_score=test_1_score,
-            test_2_score=test_2_score,
-            passed=evaluation.passed_ai
+        result = await db.execute(
+            text("""
+                SELECT test_1_score, test_2_score, total_score, passed_ai
+                FROM evaluations
+                WHERE id = :eval_id
+            """),
+            {"eval_id": evaluation_id}
         )
+        row = result.one()
+        return {
+            "test_1_score": float(row.test_1_score) if row.test_1_score is not None else 0.0,
+            "test_2_score": float(row.test_2_score) if row.test_2_score is not None else 0.0,
+            "total_score": float(row.total_score) if row.total_score is not None else 0.0,
+            "passed": bool(row.passed_ai)
+        }
 
-        if evaluation.passed_ai:
-            await send_hr_notification(
-                evaluation_id=str(evaluation.id),
-                prospect_name=f"{prospect.first_name} {prospect.last_name}",
-                position_title=position_title,
-                total_score=total_score,
-                test_1_score=test_1_score,
-                test_2_score=test_2_score
-            )
-
-        await self.db.execute(
-            text("UPDATE evaluations SET email_sent = true WHERE id = :eval_id"),
-            {"eval_id": str(evaluation.id)}
-        )
-        await self.db.commit()
+    async def _position_title(self, db: AsyncSession, position_id: str) -> str:
+        position = (await position_catalog.get(db)).get(position_id)
+        return position.title if position else "Posición"
 
-    def _construct_final_message(self, state: EvaluationState, evaluation) -> str:
-        test_1 = float(evaluation.test_1_score) if evaluation.test_1_score is not None else 0.0
-        test_2 = float(evaluation.test_2_score) if evaluation.test_2_score is not None else 0.0
-        total = float(evaluation.total_score) if evaluation.total_score is not None else 0.0
-        
+    def _construct_final_message(self, scores: Dict[str, Any]) -> str:
         return f"""Evaluación completada.
 
-Test 1: {test_1:.2f}/100
-Test 2: {test_2:.2f}/100
-Total: {total:.2f}/100
+Test 1: {scores["test_1_score"]:.2f}/100
+Test 2: {scores["test_2_score"]:.2f}/100
+Total: {scores["total_score"]:.2f}/100
 
-Resultado: {"APROBADO" if evaluation.passed_ai else "NO APROBADO"}
+Resultado: {"APROBADO" if scores["passed"] else "NO APROBADO"}
 
 Recibirás un email con los detalles.
 Gracias."""
 
     async def process_message(
         self,
+        db: AsyncSession,
         session_token: str,
         message: str = None,
         initial_state: dict = None,
@@ -882,6 +928,8 @@ Gracias."""
         config = {"configurable": {"thread_id": session_token}}
         
         checkpoint = await self.checkpointer.aget_tuple(config)
+        # La sesión de BD es por conexión; viaja en el config de la ejecución
+        config["configurable"]["db"] = db
         
         if checkpoint and checkpoint.checkpoint.get("channel_values"):
             existing_state = checkpoint.checkpoint["channel_values"]
@@ -922,7 +970,7 @@ Gracias."""
             else:
                 input_state = self._create_initial_state(session_token)
         
-        final_state = await self.graph.ainvoke(input_state, config)
+        final_state = await self.graph.ainvoke(input_state, config, durability=self.durability)
 
         last_ai_message = self._extract_last_ai_message(final_state["messages"])
 
@@ -950,14 +998,17 @@ Gracias."""
             "current_question": 0,
             "total_questions_test_1": 0,
             "total_questions_test_2": 0,
-            "current_question_data": {},
+            "current_question_id": "",
+            "question_bank_version": "",
             "prospect_id": "",
             "prospect_name": "",
             "prospect_email": "",
             "should_close": False,
             "is_complete": False,
-            "available_positions": [],
-            "waiting_for_start": False
+            "position_ids": [],
+            "waiting_for_start": False,
+            "pending_answers": [],
+            "score_totals": {}
         }
 
     def _extract_last_ai_message(self, messages):
@@ -967,9 +1018,14 @@ Gracias."""
         return None
 
 
-async def initialize_graph_system(
-    db: AsyncSession,
-    openai_key: str,
-    checkpointer=None
-) -> EvaluationAgent:
-    return EvaluationAgent(db, openai_key, checkpointer)
\ No newline at end of file
+_agent: EvaluationAgent = None
+
+
+def initialize_graph_system(openai_key: str, checkpointer=None) -> EvaluationAgent:
+    """Grafo compilado y cliente LLM compartidos por todo el proceso"""
+    global _agent
+
+    if _agent is None:
+        _agent = EvaluationAgent(openai_key, checkpointer)
+
+    return _agent
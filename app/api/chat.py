@@ -2,18 +2,27 @@
 app/api/chat.py
 Optimizado para 512MB RAM, 2 CPUs
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.database import AsyncSessionLocal
-from sqlalchemy import text, select
+from sqlalchemy import select
 from app.config import settings
 from app.middleware.security import ws_manager, websocket_rate_limiter
-from app.tools.cv_parser import parse_cv_with_llm
+from app.tools.cv_parser import parse_cv
 from app.models import Prospect, ProspectDocument
+from app.schemas import CheckpointPurgeRequest
+from app.api.auth import require_role
+from app.services.checkpoint_retention import checkpoint_retention
+from app.services.hot_checkpointer import HotCheckpointSaver
+from app.services.checkpoint_turn import CheckpointTurn, checkpoint_turn, checkpoint_turns
+from app.services.cv_upload import CvUploadError, cv_uploads
 import json
 import logging
 import asyncio
 import hashlib
+import os
+from io import BytesIO
+from typing import BinaryIO, Union
 from uuid import UUID
 
 logger = logging.getLogger(__name__)
@@ -21,22 +30,47 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 _checkpointer = None
+_checkpointer_lock = asyncio.Lock()
 
 
-def get_checkpointer():
+async def get_checkpointer():
     global _checkpointer
     
     if _checkpointer is None:
-        from app.services.checkpointer import create_checkpointer
-        
-        checkpointer_url = settings.DATABASE_URL.replace(
-            "postgresql+asyncpg://", "postgresql://"
-        )
-        _checkpointer = create_checkpointer(checkpointer_url)
+        async with _checkpointer_lock:
+            if _checkpointer is None:
+                from app.services.checkpointer import create_checkpointer
+                
+                checkpointer_url = settings.DATABASE_URL.replace(
+                    "postgresql+asyncpg://", "postgresql://"
+                )
+                checkpointer = await create_checkpointer(checkpointer_url)
+
+                if settings.HOT_CHECKPOINT_ENABLED:
+                    checkpointer = HotCheckpointSaver(checkpointer)
+
+                _checkpointer = checkpointer
     
     return _checkpointer
 
 
+async def close_checkpointer():
+    global _checkpointer
+    
+    if _checkpointer is not None:
+        await _checkpointer.aclose()
+        _checkpointer = None
+
+
+async def get_evaluation_agent():
+    from app.agents.graph_system import initialize_graph_system
+
+    return initialize_graph_system(
+        openai_key=settings.OPENAI_API_KEY,
+        checkpointer=await get_checkpointer()
+    )
+
+
 @router.websocket("/ws/{session_token}")
 async def websocket_evaluation(websocket: WebSocket, session_token: str):
     client_host = websocket.client.host if websocket.client else "unknown"
@@ -52,18 +86,11 @@ async def websocket_evaluation(websocket: WebSocket, session_token: str):
     
     try:
         db = AsyncSessionLocal()
-        checkpointer = get_checkpointer()
-        
-        from app.agents.graph_system import initialize_graph_system
-        
-        agent = await initialize_graph_system(
-            db=db,
-            openai_key=settings.OPENAI_API_KEY,
-            checkpointer=checkpointer
-        )
+        agent = await get_evaluation_agent()
         
         try:
-            greeting_sent = await handle_initial_greeting(websocket, agent, session_token)
+            async with checkpoint_turn(agent.checkpointer, session_token) as turn:
+                greeting_sent = await handle_initial_greeting(websocket, agent, session_token, db, turn)
             
             if not greeting_sent:
                 ws_closed = True
@@ -83,7 +110,7 @@ async def websocket_evaluation(websocket: WebSocket, session_token: str):
         except:
             pass
     finally:
-        cleanup_connection(client_host, db, websocket, ws_closed)
+        cleanup_connection(client_host, session_token, db, websocket, ws_closed)
 
 
 async def validate_connection(websocket: WebSocket, client_host: str) -> bool:
@@ -104,14 +131,10 @@ async def validate_connection(websocket: WebSocket, client_host: str) -> bool:
     return True
 
 
-async def handle_initial_greeting(websocket: WebSocket, agent, session_token: str) -> bool:
-    config = {"configurable": {"thread_id": session_token}}
-    
-    checkpoint = await agent.checkpointer.aget_tuple(config)
+async def handle_initial_greeting(websocket: WebSocket, agent, session_token: str, db: AsyncSession, turn: CheckpointTurn) -> bool:
+    existing_state = turn.state
     
-    if checkpoint and checkpoint.checkpoint.get("channel_values"):
-        existing_state = checkpoint.checkpoint["channel_values"]
-        
+    if existing_state:
         if existing_state.get("workflow_stage") == "awaiting_position":
             await websocket.send_json({
                 "type": "greeting",
@@ -158,6 +181,7 @@ async def handle_initial_greeting(websocket: WebSocket, agent, session_token: st
             return True
     
     initial_result = await agent.process_message(
+        db=db,
         session_token=session_token,
         message=None,
         initial_state=None
@@ -191,15 +215,42 @@ async def handle_conversation_loop(websocket: WebSocket, agent, session_token: s
     max_messages = 50
     
     while True:
-        data = await websocket.receive_text()
-        message_data = json.loads(data)
+        frame = await websocket.receive()
+        
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000))
         
-        if message_data.get("type") == "ping":
+        # Los frames binarios son bloques de la subida de CV en curso
+        if frame.get("bytes") is not None:
+            await handle_cv_chunk(websocket, frame["bytes"], session_token)
+            continue
+        
+        message_data = json.loads(frame["text"])
+        message_type = message_data.get("type")
+        
+        if message_type == "ping":
             await websocket.send_json({"type": "pong"})
             continue
         
-        if message_data.get("type") == "cv_upload":
-            await handle_cv_upload(websocket, message_data, session_token, db, agent)
+        if message_type == "cv_upload":
+            async with checkpoint_turn(agent.checkpointer, session_token) as turn:
+                await handle_cv_upload(websocket, message_data, session_token, db, agent, turn)
+            continue
+        
+        if message_type == "cv_upload_begin":
+            await handle_cv_upload_begin(websocket, message_data, session_token)
+            continue
+        
+        if message_type == "cv_upload_end":
+            async with checkpoint_turn(agent.checkpointer, session_token) as turn:
+                await handle_cv_upload_end(websocket, message_data, session_token, db, agent, turn)
+            continue
+        
+        if message_type == "cv_upload_cancel":
+            try:
+                cv_uploads.cancel(session_token, message_data.get("upload_id"))
+            except CvUploadError:
+                pass
             continue
         
         message_count += 1
@@ -210,11 +261,13 @@ async def handle_conversation_loop(websocket: WebSocket, agent, session_token: s
             })
             break
         
-        result = await agent.process_message(
-            session_token=session_token,
-            message=message_data["message"],
-            initial_state=None
-        )
+        async with checkpoint_turn(agent.checkpointer, session_token):
+            result = await agent.process_message(
+                db=db,
+                session_token=session_token,
+                message=message_data["message"],
+                initial_state=None
+            )
         
         response_data = {
             "type": "message",
@@ -242,32 +295,107 @@ async def handle_conversation_loop(websocket: WebSocket, agent, session_token: s
             break
 
 
-async def handle_cv_upload(websocket: WebSocket, message_data: dict, session_token: str, db: AsyncSession, agent):
+async def handle_cv_upload(websocket: WebSocket, message_data: dict, session_token: str, db: AsyncSession, agent, turn: CheckpointTurn):
+    import base64
+    
+    file_content_b64 = message_data.get("file_content")
+    file_name = message_data.get("file_name", "cv.pdf")
+    
+    if not file_content_b64:
+        await websocket.send_json({
+            "type": "error",
+            "message": "Faltan datos del archivo"
+        })
+        return
+    
     try:
-        import base64
-        
-        file_content_b64 = message_data.get("file_content")
-        file_name = message_data.get("file_name", "cv.pdf")
-        
-        if not file_content_b64:
-            await websocket.send_json({
-                "type": "error",
-                "message": "Faltan datos del archivo"
-            })
-            return
-        
-        config = {"configurable": {"thread_id": session_token}}
-        
-        checkpoint = await agent.checkpointer.aget_tuple(config)
+        file_content = base64.b64decode(file_content_b64)
+    except ValueError:
+        await websocket.send_json({
+            "type": "error",
+            "message": "Archivo mal codificado"
+        })
+        return
+    
+    if len(file_content) > 5_000_000:
+        await websocket.send_json({
+            "type": "error",
+            "message": "Archivo muy grande (max 5MB)"
+        })
+        return
+    
+    checksum = hashlib.sha256(file_content).hexdigest()
+    
+    await process_cv_file(websocket, file_content, file_name, checksum, session_token, db, agent, turn)
+
+
+async def send_cv_upload_error(websocket: WebSocket, error: CvUploadError, session_token: str):
+    upload = cv_uploads.active(session_token)
+    
+    await websocket.send_json({
+        "type": "cv_upload_error",
+        "message": str(error),
+        "data": {
+            "abort": error.abort,
+            **(upload.progress() if upload and not error.abort else {})
+        }
+    })
+
+
+async def handle_cv_upload_begin(websocket: WebSocket, message_data: dict, session_token: str):
+    try:
+        upload = cv_uploads.begin(
+            session_token,
+            file_name=message_data.get("file_name", "cv.pdf"),
+            size=message_data.get("size"),
+            sha256=message_data.get("sha256"),
+            upload_id=message_data.get("upload_id")
+        )
+    except CvUploadError as e:
+        await send_cv_upload_error(websocket, e, session_token)
+        return
+    
+    await websocket.send_json({
+        "type": "cv_upload_ack",
+        "data": {**upload.progress(), "chunk_size": cv_uploads.chunk_bytes}
+    })
+
+
+async def handle_cv_chunk(websocket: WebSocket, frame: bytes, session_token: str):
+    try:
+        upload = await cv_uploads.write_chunk(session_token, frame)
+    except CvUploadError as e:
+        await send_cv_upload_error(websocket, e, session_token)
+        return
+    
+    await websocket.send_json({"type": "cv_upload_ack", "data": upload.progress()})
+
+
+async def handle_cv_upload_end(websocket: WebSocket, message_data: dict, session_token: str, db: AsyncSession, agent, turn: CheckpointTurn):
+    try:
+        upload, checksum = await cv_uploads.finish(session_token, message_data.get("upload_id"))
+    except CvUploadError as e:
+        await send_cv_upload_error(websocket, e, session_token)
+        return
+    
+    # El PDF se lee desde el temporal de la subida, sin volver a cargarlo entero en memoria
+    try:
+        await process_cv_file(websocket, upload.path, upload.file_name, checksum, session_token, db, agent, turn)
+    finally:
+        upload.discard()
+
+
+async def process_cv_file(websocket: WebSocket, pdf_source: Union[bytes, str], file_name: str, checksum: str, session_token: str, db: AsyncSession, agent, turn: CheckpointTurn):
+    try:
+        channel_values = turn.state
         
-        if not checkpoint or not checkpoint.checkpoint.get("channel_values"):
+        if not channel_values:
             await websocket.send_json({
                 "type": "error",
                 "message": "No hay sesion activa"
             })
             return
         
-        channel_values = checkpoint.checkpoint["channel_values"]
         position_id = channel_values.get("position_id")
         
         if not position_id:
@@ -277,18 +405,7 @@ async def handle_cv_upload(websocket: WebSocket, message_data: dict, session_tok
             })
             return
         
-        file_content = base64.b64decode(file_content_b64)
-        
-        if len(file_content) > 5_000_000:
-            await websocket.send_json({
-                "type": "error",
-                "message": "Archivo muy grande (max 5MB)"
-            })
-            return
-        
-        checksum = hashlib.sha256(file_content).hexdigest()
-        
-        parsed_data = await parse_cv_with_llm(file_content)
+        parsed_data = await parse_cv(pdf_source, checksum)
         
         if not parsed_data.get("email"):
             await websocket.send_json({
@@ -300,7 +417,7 @@ async def handle_cv_upload(websocket: WebSocket, message_data: dict, session_tok
         prospect = await find_or_create_prospect(db, parsed_data)
         
         await store_cv_document(
-            db, prospect.id, file_name, file_content, checksum
+            db, prospect.id, file_name, pdf_source, checksum
         )
         
         await db.flush()
@@ -315,6 +432,7 @@ async def handle_cv_upload(websocket: WebSocket, message_data: dict, session_tok
         }
         
         result = await agent.process_message(
+            db=db,
             session_token=session_token,
             message=None,
             initial_state=update_state,
@@ -372,8 +490,18 @@ async def find_or_create_prospect(db: AsyncSession, parsed_data: dict):
     return prospect
 
 
-async def store_cv_document(db: AsyncSession, prospect_id: UUID, file_name: str, file_content: bytes, checksum: str):
-    file_size = len(file_content)
+def _open_pdf_source(pdf_source: Union[bytes, str]) -> BinaryIO:
+    return open(pdf_source, "rb") if isinstance(pdf_source, str) else BytesIO(pdf_source)
+
+
+def _read_pdf_source(pdf_source: Union[bytes, str]) -> bytes:
+    with _open_pdf_source(pdf_source) as file_obj:
+        return file_obj.read()
+
+
+async def store_cv_document(db: AsyncSession, prospect_id: UUID, file_name: str, pdf_source: Union[bytes, str], checksum: str):
+    """pdf_source: contenido o ruta del archivo subido; solo se carga entero si va a la BD"""
+    file_size = len(pdf_source) if isinstance(pdf_source, bytes) else os.path.getsize(pdf_source)
     storage_type = "database" if file_size < 500_000 else "s3"
     
     if storage_type == "database":
@@ -383,7 +511,7 @@ async def store_cv_document(db: AsyncSession, prospect_id: UUID, file_name: str,
             file_name=f"cv_{prospect_id}.pdf",
             original_file_name=file_name,
             storage_type="database",
-            file_data=file_content,
+            file_data=await asyncio.to_thread(_read_pdf_source, pdf_source),
             file_size=file_size,
             mime_type="application/pdf",
             checksum=checksum
@@ -391,11 +519,12 @@ async def store_cv_document(db: AsyncSession, prospect_id: UUID, file_name: str,
     else:
         from app.services.r2_storage import upload_to_r2
         
-        storage_path = await upload_to_r2(
-            file_content=file_content,
-            prospect_id=str(prospect_id),
-            filename=file_name
-        )
+        with _open_pdf_source(pdf_source) as file_obj:
+            storage_path = await upload_to_r2(
+                file_content=file_obj,
+                prospect_id=str(prospect_id),
+                filename=file_name
+            )
         
         document = ProspectDocument(
             prospect_id=prospect_id,
@@ -423,11 +552,21 @@ async def send_error_message(websocket: WebSocket):
         pass
 
 
-def cleanup_connection(client_host: str, db, websocket: WebSocket, ws_closed: bool):
+def cleanup_connection(client_host: str, session_token: str, db, websocket: WebSocket, ws_closed: bool):
     ws_manager.disconnect(client_host)
     
     if db:
         asyncio.create_task(db.close())
+    
+    if isinstance(_checkpointer, HotCheckpointSaver):
+        asyncio.create_task(flush_session_checkpoint(session_token))
+
+
+async def flush_session_checkpoint(session_token: str):
+    try:
+        await _checkpointer.flush_thread(session_token)
+    except Exception as e:
+        logger.error(f"Error bajando checkpoint de {session_token}: {e}")
 
 
 @router.get("/health")
@@ -465,20 +604,45 @@ def build_websocket_url() -> str:
 @router.post("/checkpoint/clear/{session_token}")
 async def clear_checkpoint(session_token: str):
     try:
-        checkpointer = get_checkpointer()
-        
-        def delete_sync():
-            with checkpointer._pool.connection() as conn:
-                conn.execute(
-                    text("DELETE FROM graph_checkpoints WHERE thread_id = :thread_id"),
-                    {"thread_id": session_token}
-                )
-                conn.commit()
-        
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, delete_sync)
+        checkpointer = await get_checkpointer()
+        if isinstance(checkpointer, HotCheckpointSaver):
+            await checkpointer.discard([session_token])
+        deleted = await checkpoint_retention.purge_threads(checkpointer._pool, [session_token])
         
-        return {"success": True, "message": "Checkpoint eliminado"}
+        return {"success": True, "message": "Checkpoint eliminado", "deleted": deleted}
     except Exception as e:
         logger.error(f"Error eliminando checkpoint: {e}")
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+
+@router.post("/checkpoint/purge")
+async def purge_checkpoints(
+    request: CheckpointPurgeRequest,
+    current_user = Depends(require_role("admin"))
+):
+    checkpointer = await get_checkpointer()
+    if isinstance(checkpointer, HotCheckpointSaver):
+        await checkpointer.discard(request.session_tokens)
+    deleted = await checkpoint_retention.purge_threads(checkpointer._pool, request.session_tokens)
+    
+    return {"success": True, "threads": len(request.session_tokens), "deleted": deleted}
+
+
+@router.get("/checkpoint/stats")
+async def checkpoint_stats(current_user = Depends(require_role("admin"))):
+    checkpointer = await get_checkpointer()
+    
+    return {
+        "writes": checkpointer.stats(),
+        "table_bytes": await checkpoint_retention.table_sizes(checkpointer._pool),
+        "retention": checkpoint_retention.stats(),
+        "turns": checkpoint_turns.stats()
+    }
+
+
+@router.post("/checkpoint/retention/run")
+async def run_checkpoint_retention(current_user = Depends(require_role("admin"))):
+    checkpointer = await get_checkpointer()
+    result = await checkpoint_retention.run_once(checkpointer._pool)
+    
+    return {"success": True, **result}
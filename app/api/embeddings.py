@@ -7,6 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.services.database import get_db
 from app.services.embeddings import embedding_service
+from app.services.ideal_embeddings import ideal_embedding_store
+from app.services.question_bank import question_bank_cache
 from app.services.position_embeddings import (
     generate_position_embedding,
     delete_position_embedding,
@@ -40,7 +42,7 @@ async def generate_question_embeddings(
     try:
         result = await db.execute(
             text("""
-                SELECT qt.id, qt.question_text, qt.ideal_answer
+                SELECT qt.id, qt.question_text, qt.ideal_answer, qt.position_id
                 FROM question_templates qt
                 JOIN job_positions jp ON qt.position_id = jp.id
                 WHERE jp.title = :position_title
@@ -61,15 +63,17 @@ async def generate_question_embeddings(
                 message="No hay preguntas pendientes"
             )
         
+        pending = [
+            (question_id, ideal_answer)
+            for question_id, question_text, ideal_answer, _ in questions
+            if ideal_answer and ideal_answer.strip()
+        ]
+        embeddings = await embedding_service.embed_many([ideal for _, ideal in pending])
+        
         success_count = 0
         
-        for question_id, question_text, ideal_answer in questions:
-            if not ideal_answer or not ideal_answer.strip():
-                continue
-            
+        for (question_id, _), embedding in zip(pending, embeddings):
             try:
-                embedding = await embedding_service.embed_text(ideal_answer)
-                
                 await db.execute(
                     text("""
                         UPDATE question_templates 
@@ -90,6 +94,10 @@ async def generate_question_embeddings(
         
         await db.commit()
         
+        for position_id in {row[3] for row in questions}:
+            ideal_embedding_store.invalidate(str(position_id))
+            question_bank_cache.invalidate(str(position_id))
+        
         return GenerateEmbeddingsResponse(
             success=True,
             position_title=position_title,
@@ -126,16 +134,16 @@ async def generate_all_question_embeddings(db: AsyncSession = Depends(get_db)):
                 {"position_title": position_title}
             )
             
-            questions = result.fetchall()
+            pending = [
+                (question_id, ideal_answer)
+                for question_id, ideal_answer in result.fetchall()
+                if ideal_answer
+            ]
+            embeddings = await embedding_service.embed_many([ideal for _, ideal in pending])
             count = 0
             
-            for question_id, ideal_answer in questions:
-                if not ideal_answer:
-                    continue
-                
+            for (question_id, _), embedding in zip(pending, embeddings):
                 try:
-                    embedding = await embedding_service.embed_text(ideal_answer)
-                    
                     await db.execute(
                         text("""
                             UPDATE question_templates 
@@ -162,6 +170,8 @@ async def generate_all_question_embeddings(db: AsyncSession = Depends(get_db)):
             total_generated += count
         
         await db.commit()
+        ideal_embedding_store.invalidate()
+        question_bank_cache.invalidate()
         
         return {
             "success": True,
@@ -1,18 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 from typing import List
+import asyncio
 import uuid
-import hashlib
 
 from app.services.database import get_db
-from app.models import JobPosition, Prospect, ProspectDocument, Evaluation, QuestionTemplate
+from app.models import JobPosition, Prospect, ProspectDocument, Evaluation
 from app.schemas import (
     JobPositionResponse, CVUploadResponse,
     EvaluationResponse, EvaluationCreate, PendingProspectResponse,
-    EvaluationDetailResponse, ReapplicationCheck
+    EvaluationDetailResponse, ReapplicationCheck, CvParseCacheInvalidateRequest
 )
-from app.tools.cv_parser import parse_cv_with_llm
+from app.tools.cv_parser import parse_cv, CV_PARSER_VERSION
+from app.services.cv_parse_cache import cv_parse_cache
+from app.services.cv_upload import CvMultipartUpload, CvUploadError, receive_cv_multipart
+from app.services.question_bank import question_bank_cache
+from app.services.position_catalog import position_catalog
 from app.api.auth import get_current_user, require_role
 
 router = APIRouter()
@@ -76,33 +80,57 @@ async def get_position(position_id: str, db: AsyncSession = Depends(get_db)):
     return position
 
 
-@router.post("/upload-cv", response_model=CVUploadResponse)
+# El body se lee como stream (receive_cv_multipart): se documenta el formulario a mano
+UPLOAD_CV_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["position_id", "file"],
+                    "properties": {
+                        "position_id": {"type": "string"},
+                        "file": {"type": "string", "format": "binary"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@router.post("/upload-cv", response_model=CVUploadResponse, openapi_extra=UPLOAD_CV_OPENAPI)
 async def upload_cv(
-    position_id: str = Form(...),
-    file: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    validate_file_type(file)
-    
-    file_content = await file.read()
-    validate_file_size(file_content)
-    
-    checksum = calculate_checksum(file_content)
-    parsed_data = await parse_cv_with_llm(file_content)
-    
-    existing_prospect = await find_prospect_by_email(db, parsed_data.get("email"))
-    
-    if existing_prospect:
-        prospect = existing_prospect
-        await update_prospect_cv(db, prospect.id, parsed_data)
-    else:
-        prospect = await create_prospect(db, parsed_data)
-    
-    document = await store_cv_document(
-        db, prospect.id, file, file_content, checksum
-    )
-    
-    await db.commit()
+    try:
+        upload = await receive_cv_multipart(request)
+    except CvUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        validate_upload_form(upload)
+        
+        checksum = upload.spool.checksum
+        parsed_data = await parse_cv(upload.spool.source(), checksum)
+        
+        existing_prospect = await find_prospect_by_email(db, parsed_data.get("email"))
+        
+        if existing_prospect:
+            prospect = existing_prospect
+            await update_prospect_cv(db, prospect.id, parsed_data)
+        else:
+            prospect = await create_prospect(db, parsed_data)
+        
+        document = await store_cv_document(
+            db, prospect.id, upload, checksum
+        )
+        
+        await db.commit()
+    finally:
+        upload.discard()
     
     return CVUploadResponse(
         prospect_id=prospect.id,
@@ -233,6 +261,8 @@ async def deactivate_position(
     
     position.is_active = False
     await db.commit()
+    question_bank_cache.invalidate(position_id)
+    position_catalog.invalidate()
     
     return {"message": "Posición desactivada", "position_id": position_id}
 
@@ -250,6 +280,8 @@ async def activate_position(
     
     position.is_active = True
     await db.commit()
+    question_bank_cache.invalidate(position_id)
+    position_catalog.invalidate()
     
     return {"message": "Posición activada", "position_id": position_id}
 
@@ -275,6 +307,8 @@ async def update_slots(
         position.is_active = False
     
     await db.commit()
+    question_bank_cache.invalidate(position_id)
+    position_catalog.invalidate()
     
     return {
         "message": "Slots actualizados",
@@ -284,6 +318,27 @@ async def update_slots(
     }
 
 
+@router.get("/cv-cache/stats")
+async def cv_cache_stats(
+    current_user = Depends(require_role("admin"))
+):
+    return {
+        "parser_version": CV_PARSER_VERSION,
+        "process": cv_parse_cache.stats(),
+        "versions": await cv_parse_cache.summary()
+    }
+
+
+@router.post("/cv-cache/invalidate")
+async def invalidate_cv_cache(
+    request: CvParseCacheInvalidateRequest,
+    current_user = Depends(require_role("admin"))
+):
+    deleted = await cv_parse_cache.invalidate(request.checksum, request.parser_version)
+    
+    return {"success": True, "deleted": deleted}
+
+
 async def fetch_position_by_id(db: AsyncSession, position_id: str):
     result = await db.execute(
         select(JobPosition).where(JobPosition.id == uuid.UUID(position_id))
@@ -291,18 +346,12 @@ async def fetch_position_by_id(db: AsyncSession, position_id: str):
     return result.scalar_one_or_none()
 
 
-def validate_file_type(file: UploadFile):
-    if file.content_type != "application/pdf":
-        raise HTTPException(status_code=400, detail="Solo archivos PDF permitidos")
-
-
-def validate_file_size(file_content: bytes):
-    if len(file_content) > 5_000_000:
-        raise HTTPException(status_code=400, detail="Archivo muy grande (máx 5MB)")
-
-
-def calculate_checksum(file_content: bytes) -> str:
-    return hashlib.sha256(file_content).hexdigest()
+def validate_upload_form(upload: CvMultipartUpload):
+    if not upload.fields.get("position_id"):
+        raise HTTPException(status_code=422, detail="position_id es requerido")
+    
+    if upload.spool is None or upload.spool.size == 0:
+        raise HTTPException(status_code=422, detail="file es requerido")
 
 
 async def find_prospect_by_email(db: AsyncSession, email: str):
@@ -355,30 +404,28 @@ async def update_prospect_cv(db: AsyncSession, prospect_id: uuid.UUID, parsed_da
 async def store_cv_document(
     db: AsyncSession,
     prospect_id: uuid.UUID,
-    file: UploadFile,
-    file_content: bytes,
+    upload: CvMultipartUpload,
     checksum: str
 ) -> ProspectDocument:
-    file_size = len(file_content)
+    file_size = upload.spool.size
     storage_type = "database" if file_size < 500_000 else "s3"
     
     if storage_type == "database":
-        document = create_database_document(
-            prospect_id, file, file_content, file_size, checksum
+        document = await create_database_document(
+            prospect_id, upload, file_size, checksum
         )
     else:
         document = await create_s3_document(
-            prospect_id, file, file_content, file_size, checksum
+            prospect_id, upload, file_size, checksum
         )
     
     db.add(document)
     return document
 
 
-def create_database_document(
+async def create_database_document(
     prospect_id: uuid.UUID,
-    file: UploadFile,
-    file_content: bytes,
+    upload: CvMultipartUpload,
     file_size: int,
     checksum: str
 ) -> ProspectDocument:
@@ -386,9 +433,9 @@ def create_database_document(
         prospect_id=prospect_id,
         document_type="cv",
         file_name=f"cv_{prospect_id}.pdf",
-        original_file_name=file.filename,
+        original_file_name=upload.file_name,
         storage_type="database",
-        file_data=file_content,
+        file_data=await asyncio.to_thread(upload.spool.read),
         file_size=file_size,
         mime_type="application/pdf",
         checksum=checksum
@@ -397,24 +444,24 @@ def create_database_document(
 
 async def create_s3_document(
     prospect_id: uuid.UUID,
-    file: UploadFile,
-    file_content: bytes,
+    upload: CvMultipartUpload,
     file_size: int,
     checksum: str
 ) -> ProspectDocument:
     from app.services.r2_storage import upload_to_r2
     
-    storage_path = await upload_to_r2(
-        file_content=file_content,
-        prospect_id=str(prospect_id),
-        filename=file.filename
-    )
+    with upload.spool.open() as file_obj:
+        storage_path = await upload_to_r2(
+            file_content=file_obj,
+            prospect_id=str(prospect_id),
+            filename=upload.file_name
+        )
     
     return ProspectDocument(
         prospect_id=prospect_id,
         document_type="cv",
         file_name=f"cv_{prospect_id}.pdf",
-        original_file_name=file.filename,
+        original_file_name=upload.file_name,
         storage_type="s3",
         storage_path=storage_path,
         file_size=file_size,
@@ -453,16 +500,9 @@ async def check_prospect_eligibility(
 
 
 async def validate_questions_exist(db: AsyncSession, position_id: uuid.UUID):
-    result = await db.execute(
-        select(QuestionTemplate)
-        .where(
-            QuestionTemplate.position_id == position_id,
-            QuestionTemplate.is_active == True
-        )
-    )
-    questions = result.scalars().all()
+    bank = await question_bank_cache.get(db, position_id)
     
-    if not questions:
+    if not bank.total(1) and not bank.total(2):
         raise HTTPException(
             status_code=400,
             detail="No hay preguntas configuradas para esta posición"
@@ -30,6 +30,38 @@ class Settings(BaseSettings):
     DB_POOL_RECYCLE: int = 900
     DB_ECHO: bool = False
 
+    # Pool asyncio del checkpointer, compartido por todas las sesiones WebSocket.
+    # Conexiones por proceso: DB_POOL_SIZE + DB_MAX_OVERFLOW + CHECKPOINT_POOL_MAX_SIZE
+    CHECKPOINT_POOL_MIN_SIZE: int = 1
+    CHECKPOINT_POOL_MAX_SIZE: int = 3
+
+    # Retención: últimos N checkpoints por thread y TTL de sesiones
+    CHECKPOINT_KEEP_LAST: int = 3
+    CHECKPOINT_COMPLETED_TTL_HOURS: int = 24
+    CHECKPOINT_IDLE_TTL_HOURS: int = 72
+    CHECKPOINT_RETENTION_INTERVAL_SECONDS: int = 900
+    CHECKPOINT_RETENTION_BATCH_SIZE: int = 500
+    CHECKPOINT_RETENTION_MAX_BATCHES: int = 20
+
+    # Cuándo persiste el grafo sus checkpoints: "sync" tras cada nodo, "async" tras
+    # cada nodo sin esperar la escritura, "exit" una sola vez al terminar el turno
+    CHECKPOINT_DURABILITY: str = "async"
+
+    # "inline": la respuesta se guarda antes de enviar la siguiente pregunta;
+    # "deferred": se envía la pregunta y la respuesta va a una cola por sesión
+    ANSWER_WRITE_MODE: str = "inline"
+    ANSWER_WRITE_MAX_RETRIES: int = 3
+
+    # Puntaje total (promedio de los dos tests, ponderados por weight) para aprobar
+    EVALUATION_PASS_SCORE: float = 70.0
+
+    # Capa en memoria (write-behind) delante del checkpointer Postgres. Opcional: una
+    # caída del proceso pierde los turnos aún no bajados (ver hot_checkpointer.py)
+    HOT_CHECKPOINT_ENABLED: bool = False
+    HOT_CHECKPOINT_MAX_THREADS: int = 100
+    HOT_CHECKPOINT_FLUSH_INTERVAL_SECONDS: int = 15
+    HOT_CHECKPOINT_IDLE_SECONDS: int = 600
+
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_TIMEOUT: int = 20
@@ -37,13 +69,17 @@ class Settings(BaseSettings):
 
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIMENSIONS: int = 1536  # ← CAMBIADO DE 384 A 1536
-    EMBEDDING_BATCH_SIZE: int = 3
-    EMBEDDING_CACHE_SIZE: int = 10
+    EMBEDDING_BATCH_SIZE: int = 16
+    EMBEDDING_BATCH_WINDOW_MS: int = 5
+    EMBEDDING_STORE_PATH: str = os.getenv("EMBEDDING_STORE_PATH", "")
+    EMBEDDING_STORE_MAX_MB: int = 64
+
+    QUESTION_CACHE_TTL_SECONDS: int = 900
 
     CHAT_MODEL: str = "gpt-4o-mini"
     CHAT_MAX_TOKENS: int = 400
     CHAT_TEMPERATURE: float = 0.7
-    CHAT_CONTEXT_MESSAGES: int = 4
+    CHAT_CONTEXT_MESSAGES: int = 6
 
     MAX_CONCURRENT_REQUESTS: int = 2
     MAX_WEBSOCKET_CONNECTIONS: int = 3
@@ -71,6 +107,26 @@ class Settings(BaseSettings):
     ]
 
     MAX_REQUEST_SIZE_MB: int = 2
+
+    # Extracción de texto de CV en procesos aparte; MAX_CHARS es lo que usa el prompt y
+    # corta la lectura en cuanto se junta. MAX_PAGES: solo se abren esas primeras páginas
+    # (un CV no pasa de unas pocas; 0 sin tope).
+    # Motores: "pypdf2", "pdfplumber" o "fast" (PyPDF2 solo sobre las primeras FAST_PAGES)
+    PDF_EXTRACT_ENGINE: str = "pypdf2"
+    PDF_EXTRACT_FAST_PAGES: int = 2
+    PDF_EXTRACT_WORKERS: int = 1
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 10.0
+    PDF_EXTRACT_MAX_PAGES: int = 10
+    PDF_EXTRACT_MAX_CHARS: int = 8000
+    PDF_EXTRACT_MAX_TASKS_PER_CHILD: int = 50
+
+    # Subida de CV por WebSocket en bloques binarios (cv_upload_begin / frames / cv_upload_end)
+    CV_UPLOAD_MAX_BYTES: int = 5_000_000
+    CV_UPLOAD_CHUNK_BYTES: int = 64 * 1024
+    CV_UPLOAD_TTL_SECONDS: int = 600
+    CV_UPLOAD_MAX_PENDING: int = 20
+    # POST /upload-cv: hasta este tamaño el archivo se queda en memoria, luego a disco
+    CV_UPLOAD_SPOOL_BYTES: int = 512 * 1024
     WEBSOCKET_TIMEOUT: int = 300
 
     UVICORN_WORKERS: int = 1
@@ -79,6 +135,30 @@ class Settings(BaseSettings):
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USER: str = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
+    SMTP_START_TLS: bool = True
+    SMTP_TIMEOUT: int = 20
+
+    # Pool de sesiones SMTP autenticadas (0 = una sesión por mensaje)
+    SMTP_POOL_SIZE: int = 2
+    SMTP_POOL_IDLE_SECONDS: int = 120
+    SMTP_POOL_HEALTHCHECK_SECONDS: int = 30
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+
+    # Outbox de emails: reintentos con backoff exponencial hasta EMAIL_OUTBOX_MAX_ATTEMPTS
+    EMAIL_OUTBOX_INTERVAL_SECONDS: int = 30
+    EMAIL_OUTBOX_BATCH_SIZE: int = 10
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 6
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: int = 30
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS: int = 3600
+    EMAIL_OUTBOX_LEASE_SECONDS: int = 120
+
+    # Avisos a RRHH de candidatos aprobados: "immediate" envía uno por candidato; "digest"
+    # (opcional) los agrupa en un solo correo cada HR_DIGEST_WINDOW_MINUTES o al juntar
+    # HR_DIGEST_MAX_ITEMS. Las posiciones de HR_IMMEDIATE_POSITION_IDS siempre van inmediatas
+    HR_NOTIFICATION_MODE: str = "immediate"
+    HR_DIGEST_WINDOW_MINUTES: int = 60
+    HR_DIGEST_MAX_ITEMS: int = 20
+    HR_IMMEDIATE_POSITION_IDS: List[str] = []
 
     EMAIL_VENTAS: str = os.getenv("EMAIL_VENTAS", "ventas@empresa.com")
     EMAIL_SOPORTE: str = os.getenv("EMAIL_SOPORTE", "soporte@empresa.com")
@@ -18,7 +18,7 @@ from contextlib import asynccontextmanager
 import uvicorn
 from fastapi.staticfiles import StaticFiles
 
-from app.config import settings, GC_CONFIG
+from app.config import settings, GC_CONFIG, MEMORY_LIMITS
 from app.middleware.security import (
     SecurityHeadersMiddleware,
     RateLimitMiddleware,
@@ -68,17 +68,27 @@ async def lifespan(app: FastAPI):
             )
             print("pgvector OK")
 
+        from app.services.email_outbox import email_outbox
+
+        await email_outbox.ensure_table(engine)
+        print("Outbox de emails OK")
+
+        from app.services.cv_parse_cache import cv_parse_cache
+
+        await cv_parse_cache.ensure_table(engine)
+        print("Cache de CVs parseados OK")
+
     except Exception as e:
         print(f"Error DB: {e}")
 
     try:
-        from app.services.checkpointer import create_checkpointer
+        from app.api.chat import get_checkpointer
 
-        checkpointer_url = settings.DATABASE_URL.replace(
-            "postgresql+asyncpg://", "postgresql://"
+        app.state.checkpointer = await get_checkpointer()
+        print(
+            f"Checkpointer OK (pool async {settings.CHECKPOINT_POOL_MIN_SIZE}-"
+            f"{settings.CHECKPOINT_POOL_MAX_SIZE})"
         )
-        app.state.checkpointer = create_checkpointer(checkpointer_url)
-        print("Checkpointer OK")
     except Exception as e:
         print(f"Error Checkpointer: {e}")
         app.state.checkpointer = None
@@ -86,10 +96,19 @@ async def lifespan(app: FastAPI):
     try:
         from app.services.embeddings import embedding_service
 
-        print(f"Embeddings: {settings.EMBEDDING_MODEL}")
+        warmed = await embedding_service.warm_up()
+        print(f"Embeddings: {settings.EMBEDDING_MODEL} ({warmed} precargados)")
     except Exception as e:
         print(f"Embeddings: {e}")
 
+    try:
+        from app.api.chat import get_evaluation_agent
+
+        await get_evaluation_agent()
+        print("Grafo de evaluación compilado")
+    except Exception as e:
+        print(f"Error Grafo: {e}")
+
     print(f"Rate Limits:")
     print(
         f"   Public: {settings.RATE_LIMIT_PUBLIC_RPM}/min, {settings.RATE_LIMIT_PUBLIC_RPH}/hora"
@@ -103,12 +122,34 @@ async def lifespan(app: FastAPI):
 
     gc_task = None
     cleanup_task = None
+    retention_task = None
+    hot_checkpoint_task = None
+    email_outbox_task = None
+    cv_upload_task = None
 
     if GC_CONFIG["enabled"]:
         gc_task = asyncio.create_task(run_garbage_collector())
 
     cleanup_task = asyncio.create_task(run_rate_limiter_cleanup())
 
+    from app.services.email_outbox import email_outbox
+
+    email_outbox_task = asyncio.create_task(email_outbox.run_forever())
+
+    from app.services.cv_upload import cv_uploads
+
+    cv_upload_task = asyncio.create_task(cv_uploads.run_forever())
+
+    if app.state.checkpointer:
+        from app.api.chat import get_checkpointer
+        from app.services.checkpoint_retention import checkpoint_retention
+        from app.services.hot_checkpointer import HotCheckpointSaver
+
+        retention_task = asyncio.create_task(checkpoint_retention.run_forever(get_checkpointer))
+
+        if isinstance(app.state.checkpointer, HotCheckpointSaver):
+            hot_checkpoint_task = asyncio.create_task(app.state.checkpointer.run_forever())
+
     print("=" * 60)
     print(f"API: http://{settings.API_HOST}:{settings.API_PORT}")
     print(f"Docs: http://{settings.API_HOST}:{settings.API_PORT}/docs")
@@ -120,6 +161,42 @@ async def lifespan(app: FastAPI):
         gc_task.cancel()
     if cleanup_task:
         cleanup_task.cancel()
+    if retention_task:
+        retention_task.cancel()
+    if hot_checkpoint_task:
+        hot_checkpoint_task.cancel()
+    if email_outbox_task:
+        email_outbox_task.cancel()
+    if cv_upload_task:
+        cv_upload_task.cancel()
+
+    try:
+        from app.services.answer_writer import answer_write_queue
+
+        await answer_write_queue.close()
+    except Exception:
+        pass
+
+    try:
+        from app.services.email_service import email_service
+
+        await email_service.aclose()
+    except Exception:
+        pass
+
+    try:
+        from app.services.pdf_extraction import pdf_extractor
+
+        pdf_extractor.close()
+    except Exception:
+        pass
+
+    try:
+        from app.services.cv_upload import cv_uploads
+
+        cv_uploads.close()
+    except Exception:
+        pass
 
     try:
         from app.services.database import engine
@@ -128,11 +205,19 @@ async def lifespan(app: FastAPI):
     except Exception:
         pass
 
-    if hasattr(app.state, "checkpointer") and app.state.checkpointer:
-        try:
-            app.state.checkpointer.engine.dispose()
-        except Exception:
-            pass
+    try:
+        from app.services.embeddings import embedding_service
+
+        await embedding_service.close()
+    except Exception:
+        pass
+
+    try:
+        from app.api.chat import close_checkpointer
+
+        await close_checkpointer()
+    except Exception:
+        pass
 
     gc.collect()
 
@@ -259,6 +344,18 @@ async def health():
 async def metrics():
     import psutil
     import os
+    from app.services.embeddings import embedding_service
+    from app.services.ideal_embeddings import ideal_embedding_store
+    from app.services.question_bank import question_bank_cache
+    from app.services.position_catalog import position_catalog
+    from app.services.checkpoint_retention import checkpoint_retention
+    from app.services.checkpoint_turn import checkpoint_turns
+    from app.services.answer_writer import answer_write_queue
+    from app.services.email_outbox import email_outbox
+    from app.services.email_service import email_service
+    from app.services.pdf_extraction import pdf_extractor
+    from app.services.cv_parse_cache import cv_parse_cache
+    from app.services.cv_upload import cv_uploads
 
     process = psutil.Process(os.getpid())
 
@@ -274,9 +371,23 @@ async def metrics():
         },
         "limits": {
             "max_concurrent": settings.MAX_CONCURRENT_REQUESTS,
-            "embedding_cache": settings.EMBEDDING_CACHE_SIZE,
+            "embedding_cache_mb": MEMORY_LIMITS["embedding_cache_mb"],
             "db_pool": settings.DB_POOL_SIZE,
+            "checkpoint_pool": settings.CHECKPOINT_POOL_MAX_SIZE,
         },
+        "checkpointer": app.state.checkpointer.stats() if getattr(app.state, "checkpointer", None) else None,
+        "checkpoint_retention": checkpoint_retention.stats(),
+        "checkpoint_turns": checkpoint_turns.stats(),
+        "answer_writes": answer_write_queue.stats(),
+        "email_outbox": email_outbox.stats(),
+        "smtp": email_service.stats(),
+        "pdf_extraction": pdf_extractor.stats(),
+        "cv_parse_cache": cv_parse_cache.stats(),
+        "cv_uploads": cv_uploads.stats(),
+        "embeddings": embedding_service.stats(),
+        "ideal_embeddings": ideal_embedding_store.stats(),
+        "question_bank": question_bank_cache.stats(),
+        "position_catalog": position_catalog.stats(),
     }
 
 
@@ -257,6 +257,46 @@ class ProspectDocumentAccessLog(Base):
     )
 
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    evaluation_id = Column(UUID(as_uuid=True), ForeignKey('evaluations.id', ondelete='CASCADE'))
+    kind = Column(String(30), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    payload = Column(JSONB(none_as_null=True))
+    status = Column(String(20), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.current_timestamp())
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.current_timestamp())
+    sent_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        CheckConstraint("kind IN ('evaluation_result', 'hr_notification', 'hr_digest_item')", name='check_outbox_kind'),
+        CheckConstraint("status IN ('pending', 'sent', 'dead')", name='check_outbox_status'),
+        Index('idx_email_outbox_due', 'next_attempt_at', postgresql_where="status = 'pending'"),
+        Index('idx_email_outbox_evaluation', 'evaluation_id'),
+    )
+
+
+class CvParseCache(Base):
+    __tablename__ = "cv_parse_cache"
+
+    checksum = Column(String(64), primary_key=True)
+    parser_version = Column(String(32), primary_key=True)
+    parsed_data = Column(JSONB, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.current_timestamp())
+    last_hit_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        Index('idx_cv_parse_cache_created', 'created_at'),
+    )
+
+
 class GraphCheckpoint(Base):
     __tablename__ = "graph_checkpoints"
 
@@ -311,4 +311,12 @@ class GraphCheckpointResponse(BaseModel):
 
 
 class SlotsUpdate(BaseModel):
-    slots_available: int = Field(ge=0, description="Número de vacantes disponibles")
\ No newline at end of file
+    slots_available: int = Field(ge=0, description="Número de vacantes disponibles")
+
+class CheckpointPurgeRequest(BaseModel):
+    session_tokens: List[str] = Field(min_length=1, max_length=1000, description="Threads a purgar")
+
+
+class CvParseCacheInvalidateRequest(BaseModel):
+    checksum: Optional[str] = Field(default=None, min_length=64, max_length=64, description="SHA-256 del PDF; vacío = todos")
+    parser_version: Optional[str] = Field(default=None, max_length=32, description="Versión del parser; vacío = todas")
@@ -0,0 +1,288 @@
+"""
+app/services/answer_writer.py
+Escritura de respuestas y progreso de evaluación: en línea o en una cola ordenada
+por sesión que se vacía en segundo plano (ANSWER_WRITE_MODE="deferred")
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+from app.services.database import AsyncSessionLocal
+from app.services.embeddings import embedding_service
+
+logger = logging.getLogger(__name__)
+
+ANSWER_WRITE_MODES = ("inline", "deferred")
+
+# Colas ya vacías que se conservan (solo guardan ids confirmados) antes de descartar las más antiguas
+_MAX_IDLE_SESSIONS = 500
+
+
+@dataclass(slots=True)
+class AnswerWrite:
+    evaluation_id: str
+    question_id: str
+    answer_text: str
+    score: float
+    similarity_score: Optional[float]
+    matched_keywords: list
+    feedback: dict
+    semantic: bool
+    # Progreso que queda en evaluations tras esta respuesta; None si la evaluación terminó
+    current_test: Optional[int]
+    current_question: Optional[int]
+    write_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    answer_embedding: Optional[list] = None
+
+    def as_state(self) -> dict:
+        """Copia sin embedding para el estado del grafo (se recalcula al reintentar)"""
+        data = asdict(self)
+        data.pop("answer_embedding")
+        return data
+
+    @classmethod
+    def from_state(cls, data: dict) -> "AnswerWrite":
+        return cls(**data)
+
+
+# Reemplazo de la respuesta + avance de progreso en una sola sentencia. En autocommit
+# (sin BEGIN/COMMIT) y con la sentencia ya preparada es un único round-trip
+_INGEST_ANSWER_SQL = text("""
+WITH removed AS (
+    DELETE FROM evaluation_answers
+    WHERE evaluation_id = :evaluation_id AND question_id = :question_id
+),
+inserted AS (
+    INSERT INTO evaluation_answers (
+        id, evaluation_id, question_id, answer_text, answer_embedding,
+        score, similarity_score, matched_keywords, feedback_points
+    )
+    VALUES (
+        :answer_id, :evaluation_id, :question_id, :answer_text, :answer_embedding,
+        :score, :similarity_score, :matched_keywords, :feedback_points
+    )
+    RETURNING evaluation_id
+)
+UPDATE evaluations e
+SET current_test = COALESCE(:current_test, e.current_test),
+    current_question = COALESCE(:current_question, e.current_question)
+FROM inserted i
+WHERE e.id = i.evaluation_id
+RETURNING e.current_test, e.current_question
+""").bindparams(
+    bindparam("answer_embedding", type_=Vector(settings.EMBEDDING_DIMENSIONS)),
+    bindparam("matched_keywords", type_=JSONB),
+    bindparam("feedback_points", type_=JSONB),
+)
+
+
+async def write_answers(db: AsyncSession, writes: List[AnswerWrite]) -> Optional[Tuple[int, int]]:
+    """
+    Escribe las respuestas en orden, una sentencia autocommit cada una; repetirlas
+    no duplica respuestas. Devuelve (current_test, current_question) tras la última.
+    """
+    if db.in_transaction():
+        # Cierra lo leído en el turno para poder usar la conexión en autocommit
+        await db.commit()
+
+    conn = await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+    position = None
+
+    try:
+        for write in writes:
+            position = await _ingest_answer(conn, write)
+    finally:
+        await db.commit()
+
+    return position
+
+
+async def _ingest_answer(conn: AsyncConnection, write: AnswerWrite) -> Optional[Tuple[int, int]]:
+    answer_embedding = write.answer_embedding
+    if write.semantic and answer_embedding is None:
+        answer_embedding = await embedding_service.embed_vector(write.answer_text)
+    if answer_embedding is not None and len(answer_embedding) == 0:
+        answer_embedding = None
+
+    result = await conn.execute(_INGEST_ANSWER_SQL, {
+        "answer_id": uuid.uuid4(),
+        "evaluation_id": UUID(write.evaluation_id),
+        "question_id": UUID(write.question_id),
+        "answer_text": write.answer_text,
+        "answer_embedding": answer_embedding,
+        "score": write.score,
+        "similarity_score": write.similarity_score,
+        "matched_keywords": write.matched_keywords,
+        "feedback_points": write.feedback,
+        "current_test": write.current_test,
+        "current_question": write.current_question,
+    })
+    row = result.first()
+    return (row.current_test, row.current_question) if row else None
+
+
+class _SessionQueue:
+    __slots__ = ("pending", "acknowledged", "worker", "last_error")
+
+    def __init__(self):
+        self.pending: Deque[AnswerWrite] = deque()
+        self.acknowledged: Set[str] = set()
+        self.worker: Optional[asyncio.Task] = None
+        self.last_error: Optional[str] = None
+
+
+class AnswerWriteQueue:
+    """
+    Una cola y un worker por sesión: las respuestas de un candidato se escriben en
+    el orden en que se contestaron, en lotes con su propia sesión de BD.
+    La durabilidad la aporta el estado del grafo (pending_answers): lo que no llegó
+    a confirmarse se vuelve a encolar en el siguiente turno, aun tras un reinicio.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = settings.ANSWER_WRITE_MAX_RETRIES,
+        retry_delay_seconds: float = 0.5,
+    ):
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+        self._queues: Dict[str, _SessionQueue] = {}
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_write_ms = 0.0
+        self.last_error = None
+
+    def submit(self, session_token: str, write: AnswerWrite):
+        if session_token not in self._queues and len(self._queues) >= _MAX_IDLE_SESSIONS:
+            self._prune()
+
+        queue = self._queues.setdefault(session_token, _SessionQueue())
+        queue.pending.append(write)
+        self.submitted += 1
+        self._start_worker(queue)
+
+    def _start_worker(self, queue: _SessionQueue):
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._run(queue))
+
+    async def _run(self, queue: _SessionQueue):
+        attempts = 0
+
+        while queue.pending:
+            # Lo acumulado mientras se escribía el lote anterior va con una sola conexión
+            batch = list(queue.pending)
+            started = time.perf_counter()
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await write_answers(db, batch)
+            except Exception as e:
+                attempts += 1
+                queue.last_error = self.last_error = str(e)
+
+                if attempts > self.max_retries:
+                    # Las respuestas siguen en pending: reconcile/drain relanzan el worker
+                    self.failures += 1
+                    logger.error(f"Error guardando {len(batch)} respuestas, se reintentará en el próximo turno: {e}")
+                    return
+
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay_seconds * attempts)
+                continue
+
+            attempts = 0
+            for write in batch:
+                queue.pending.popleft()
+                queue.acknowledged.add(write.write_id)
+            queue.last_error = None
+            self.written += len(batch)
+            self.batches += 1
+            self.last_write_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def reconcile(self, session_token: str, pending_answers: List[dict]) -> List[dict]:
+        """Quita del estado lo ya escrito y reencola lo que esta cola no conoce (p. ej. tras un reinicio)"""
+        queue = self._queues.get(session_token)
+        if queue is not None and queue.pending:
+            # Un worker que agotó sus reintentos vuelve a intentar con el nuevo turno
+            self._start_worker(queue)
+
+        queued = {write.write_id for write in queue.pending} if queue else set()
+        acknowledged = queue.acknowledged if queue else set()
+        remaining = []
+
+        for data in pending_answers or []:
+            if data["write_id"] in acknowledged:
+                acknowledged.discard(data["write_id"])
+                continue
+            if data["write_id"] not in queued:
+                self.submit(session_token, AnswerWrite.from_state(data))
+            remaining.append(data)
+
+        return remaining
+
+    async def drain(self, session_token: str) -> bool:
+        """Espera a que se escriba todo lo pendiente de la sesión; False si algo quedó sin guardar"""
+        queue = self._queues.get(session_token)
+        if queue is None:
+            return True
+
+        if queue.worker is not None:
+            await asyncio.shield(queue.worker)
+
+        if queue.pending:
+            # El worker agotó sus reintentos: un intento más antes de rendirse
+            self._start_worker(queue)
+            await asyncio.shield(queue.worker)
+
+        return not queue.pending
+
+    def _prune(self):
+        for session_token, queue in list(self._queues.items()):
+            if len(self._queues) < _MAX_IDLE_SESSIONS:
+                break
+            if not queue.pending and (queue.worker is None or queue.worker.done()):
+                del self._queues[session_token]
+
+    def forget(self, session_token: str):
+        queue = self._queues.get(session_token)
+        if queue is not None and not queue.pending:
+            del self._queues[session_token]
+
+    async def close(self):
+        for session_token in list(self._queues):
+            if not await self.drain(session_token):
+                queue = self._queues[session_token]
+                logger.error(
+                    f"{len(queue.pending)} respuestas sin guardar al cerrar la sesión {session_token}: {queue.last_error}"
+                )
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._queues),
+            "pending": sum(len(queue.pending) for queue in self._queues.values()),
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failures": self.failures,
+            "last_write_ms": self.last_write_ms,
+            "last_error": self.last_error,
+        }
+
+
+answer_write_queue = AnswerWriteQueue()
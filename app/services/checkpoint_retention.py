@@ -0,0 +1,281 @@
+"""
+app/services/checkpoint_retention.py
+Retención de checkpoints de LangGraph: compactación por thread, expiración de
+sesiones terminadas/abandonadas y purga completa, siempre en lotes acotados
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Iterable, List
+
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tablas del saver actual y de la implementación anterior (graph_*), que puede
+# seguir existiendo en bases antiguas
+_CHECKPOINT_TABLES = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+_LEGACY_TABLES = ("graph_checkpoint_writes", "graph_checkpoints")
+
+# Próximo lote de threads de una tabla, recorrido por thread_id (keyset sobre el
+# índice de la PK): cada lote continúa donde terminó el anterior. Toda sentencia de
+# retención trabaja solo sobre los threads de un lote
+_THREAD_BATCH_SQL = """
+SELECT DISTINCT thread_id
+FROM {table}
+WHERE thread_id > %(after)s
+ORDER BY thread_id
+LIMIT %(batch_size)s
+"""
+
+# Deja los keep_last checkpoints más recientes de cada thread del lote
+_COMPACT_SQL = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (
+               PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+           ) AS position
+    FROM checkpoints
+    WHERE thread_id = ANY(%(thread_ids)s::text[])
+),
+doomed AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id
+    FROM ranked
+    WHERE position > %(keep_last)s
+),
+deleted_writes AS (
+    DELETE FROM checkpoint_writes w
+    USING doomed d
+    WHERE w.thread_id = d.thread_id
+      AND w.checkpoint_ns = d.checkpoint_ns
+      AND w.checkpoint_id = d.checkpoint_id
+)
+DELETE FROM checkpoints c
+USING doomed d
+WHERE c.thread_id = d.thread_id
+  AND c.checkpoint_ns = d.checkpoint_ns
+  AND c.checkpoint_id = d.checkpoint_id
+"""
+
+# Un blob solo se usa mientras algún checkpoint del thread apunte a su versión
+_ORPHAN_BLOBS_SQL = """
+DELETE FROM checkpoint_blobs b
+WHERE b.thread_id = ANY(%(thread_ids)s::text[])
+  AND NOT EXISTS (
+      SELECT 1 FROM checkpoints c
+      WHERE c.thread_id = ANY(%(thread_ids)s::text[])
+        AND c.thread_id = b.thread_id
+        AND c.checkpoint_ns = b.checkpoint_ns
+        AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+  )
+"""
+
+# Sesiones terminadas (evaluación fuera de in_progress) expiran antes que las
+# inactivas; la actividad se toma del ts del checkpoint más reciente
+_EXPIRED_THREADS_SQL = """
+SELECT c.thread_id
+FROM checkpoints c
+LEFT JOIN evaluations e ON e.session_token = c.thread_id
+WHERE c.thread_id = ANY(%(thread_ids)s::text[])
+GROUP BY c.thread_id, e.status
+HAVING (
+    e.status IS NOT NULL AND e.status <> 'in_progress'
+    AND max((c.checkpoint ->> 'ts')::timestamptz) < now() - make_interval(hours => %(completed_ttl)s)
+) OR max((c.checkpoint ->> 'ts')::timestamptz) < now() - make_interval(hours => %(idle_ttl)s)
+"""
+
+
+class CheckpointRetention:
+    """
+    Cada sentencia trabaja sobre a lo sumo batch_size threads en su propia
+    transacción (autocommit), para no retener locks ni conexiones del pool del
+    checkpointer. Cada paso recorre hasta max_batches lotes por corrida y la
+    siguiente corrida sigue desde el último thread_id visto.
+    Asume canales sin DeltaChannel: el estado se reconstruye solo con el último checkpoint.
+    """
+
+    def __init__(
+        self,
+        keep_last: int = settings.CHECKPOINT_KEEP_LAST,
+        completed_ttl_hours: int = settings.CHECKPOINT_COMPLETED_TTL_HOURS,
+        idle_ttl_hours: int = settings.CHECKPOINT_IDLE_TTL_HOURS,
+        batch_size: int = settings.CHECKPOINT_RETENTION_BATCH_SIZE,
+        max_batches: int = settings.CHECKPOINT_RETENTION_MAX_BATCHES,
+    ):
+        self.keep_last = max(1, keep_last)
+        self.completed_ttl_hours = completed_ttl_hours
+        self.idle_ttl_hours = idle_ttl_hours
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        # Último thread_id visto por cada paso ("" = desde el principio)
+        self._cursors = {"expire": "", "compact": "", "orphan_blobs": ""}
+
+        self.runs = 0
+        self.compacted = 0
+        self.expired_threads = 0
+        self.orphan_blobs = 0
+        self.purged_threads = 0
+        self.last_run_ms = 0.0
+        self.last_error = None
+
+    async def _scan_threads(
+        self,
+        pool: AsyncConnectionPool,
+        step: str,
+        table: str,
+        handle: Callable[[AsyncConnection, List[str]], Awaitable[int]]
+    ) -> int:
+        """Pasa a handle los threads de table en lotes de batch_size; suma lo que devuelve"""
+        total = 0
+        after = self._cursors[step]
+
+        for _ in range(self.max_batches):
+            async with pool.connection() as conn:
+                cur = await conn.execute(_THREAD_BATCH_SQL.format(table=table), {
+                    "after": after,
+                    "batch_size": self.batch_size,
+                })
+                thread_ids = [row["thread_id"] for row in await cur.fetchall()]
+
+                if thread_ids:
+                    total += await handle(conn, thread_ids)
+
+            if len(thread_ids) < self.batch_size:
+                after = ""
+                break
+
+            after = thread_ids[-1]
+            await asyncio.sleep(0)
+
+        self._cursors[step] = after
+        return total
+
+    async def compact(self, pool: AsyncConnectionPool) -> int:
+        """Deja solo los keep_last checkpoints más recientes de cada thread"""
+        async def handle(conn: AsyncConnection, thread_ids: List[str]) -> int:
+            cur = await conn.execute(_COMPACT_SQL, {"thread_ids": thread_ids, "keep_last": self.keep_last})
+            return cur.rowcount
+
+        deleted = await self._scan_threads(pool, "compact", "checkpoints", handle)
+        self.compacted += deleted
+        return deleted
+
+    async def delete_orphan_blobs(self, pool: AsyncConnectionPool) -> int:
+        async def handle(conn: AsyncConnection, thread_ids: List[str]) -> int:
+            cur = await conn.execute(_ORPHAN_BLOBS_SQL, {"thread_ids": thread_ids})
+            return cur.rowcount
+
+        deleted = await self._scan_threads(pool, "orphan_blobs", "checkpoint_blobs", handle)
+        self.orphan_blobs += deleted
+        return deleted
+
+    async def expire_sessions(self, pool: AsyncConnectionPool) -> int:
+        async def handle(conn: AsyncConnection, thread_ids: List[str]) -> int:
+            cur = await conn.execute(_EXPIRED_THREADS_SQL, {
+                "thread_ids": thread_ids,
+                "completed_ttl": self.completed_ttl_hours,
+                "idle_ttl": self.idle_ttl_hours,
+            })
+            expired = [row["thread_id"] for row in await cur.fetchall()]
+
+            if expired:
+                await self._delete_threads(conn, expired, _CHECKPOINT_TABLES)
+            return len(expired)
+
+        expired = await self._scan_threads(pool, "expire", "checkpoints", handle)
+        self.expired_threads += expired
+        return expired
+
+    async def _delete_threads(self, conn: AsyncConnection, thread_ids: List[str], tables: Iterable[str]) -> dict:
+        deleted = {}
+
+        async with conn.transaction():
+            for table in tables:
+                cur = await conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ANY(%s::text[])",
+                    (thread_ids,)
+                )
+                deleted[table] = cur.rowcount
+
+        return deleted
+
+    async def purge_threads(self, pool: AsyncConnectionPool, thread_ids: List[str]) -> dict:
+        """Borra todo rastro de los threads en todas las tablas de checkpoints"""
+        thread_ids = [str(thread_id) for thread_id in thread_ids]
+        if not thread_ids:
+            return {}
+
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(name) IS NOT NULL",
+                (list(_LEGACY_TABLES),)
+            )
+            legacy_tables = [row["name"] for row in await cur.fetchall()]
+
+        deleted = {}
+        for start in range(0, len(thread_ids), self.batch_size):
+            chunk = thread_ids[start:start + self.batch_size]
+            async with pool.connection() as conn:
+                counts = await self._delete_threads(conn, chunk, _CHECKPOINT_TABLES + tuple(legacy_tables))
+            for table, count in counts.items():
+                deleted[table] = deleted.get(table, 0) + count
+
+        self.purged_threads += len(thread_ids)
+        return deleted
+
+    async def table_sizes(self, pool: AsyncConnectionPool) -> dict:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT name, pg_total_relation_size(to_regclass(name)) AS bytes
+                FROM unnest(%s::text[]) AS name
+                WHERE to_regclass(name) IS NOT NULL
+                """,
+                (list(_CHECKPOINT_TABLES),)
+            )
+            return {row["name"]: row["bytes"] for row in await cur.fetchall()}
+
+    async def run_once(self, pool: AsyncConnectionPool) -> dict:
+        started = time.perf_counter()
+
+        result = {
+            "expired_threads": await self.expire_sessions(pool),
+            "compacted": await self.compact(pool),
+            "orphan_blobs": await self.delete_orphan_blobs(pool),
+        }
+
+        self.runs += 1
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def run_forever(self, get_checkpointer, interval_seconds: int = settings.CHECKPOINT_RETENTION_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval_seconds)
+
+            try:
+                checkpointer = await get_checkpointer()
+                await self.run_once(checkpointer._pool)
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error en retención de checkpoints: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "keep_last": self.keep_last,
+            "runs": self.runs,
+            "compacted": self.compacted,
+            "expired_threads": self.expired_threads,
+            "orphan_blobs": self.orphan_blobs,
+            "purged_threads": self.purged_threads,
+            "last_run_ms": self.last_run_ms,
+            "last_error": self.last_error,
+        }
+
+
+checkpoint_retention = CheckpointRetention()
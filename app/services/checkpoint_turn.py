@@ -0,0 +1,127 @@
+"""
+app/services/checkpoint_turn.py
+Lectura de checkpoint única por turno del WebSocket: el router, el saludo y el grafo
+reutilizan la misma tupla en lugar de volver a pedirla al checkpointer
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple, copy_checkpoint, get_checkpoint_id
+
+
+class CheckpointTurn:
+    """Estado del thread al inicio del turno, leído una sola vez"""
+
+    __slots__ = ("thread_id", "checkpoint_tuple", "loaded", "reading", "reads", "memo_hits")
+
+    def __init__(self, thread_id: str):
+        self.thread_id = str(thread_id)
+        self.checkpoint_tuple: Optional[CheckpointTuple] = None
+        self.loaded = False
+        self.reading = False
+        self.reads = 0
+        self.memo_hits = 0
+
+    @property
+    def state(self) -> Optional[dict]:
+        if self.checkpoint_tuple is None:
+            return None
+        return self.checkpoint_tuple.checkpoint.get("channel_values") or None
+
+    def covers(self, config: RunnableConfig) -> bool:
+        configurable = config.get("configurable", {})
+        if str(configurable.get("thread_id")) != self.thread_id or configurable.get("checkpoint_ns", ""):
+            return False
+
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id is None:
+            return True
+        return self.checkpoint_tuple is not None and checkpoint_id == self.checkpoint_tuple.checkpoint["id"]
+
+
+_current_turn: ContextVar[Optional[CheckpointTurn]] = ContextVar("checkpoint_turn", default=None)
+
+
+class CheckpointTurnMeter:
+
+    def __init__(self):
+        self.turns = 0
+        self.reads = 0
+        self.memo_hits = 0
+        self.max_reads_per_turn = 0
+        self.multi_read_turns = 0
+
+    def record(self, turn: CheckpointTurn):
+        self.turns += 1
+        self.reads += turn.reads
+        self.memo_hits += turn.memo_hits
+        self.max_reads_per_turn = max(self.max_reads_per_turn, turn.reads)
+        if turn.reads > 1:
+            self.multi_read_turns += 1
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "reads": self.reads,
+            "reads_per_turn": round(self.reads / self.turns, 2) if self.turns else 0.0,
+            "max_reads_per_turn": self.max_reads_per_turn,
+            "multi_read_turns": self.multi_read_turns,
+            "memo_hits": self.memo_hits,
+        }
+
+
+checkpoint_turns = CheckpointTurnMeter()
+
+
+async def read_through_turn(
+    config: RunnableConfig,
+    read: Callable[[RunnableConfig], Awaitable[Optional[CheckpointTuple]]],
+) -> Optional[CheckpointTuple]:
+    """aget_tuple de los savers: dentro de un turno solo la primera lectura del thread llega al saver"""
+    turn = _current_turn.get()
+
+    # reading: un saver que envuelve a otro no cuenta dos veces la misma lectura
+    if turn is None or turn.reading:
+        return await read(config)
+
+    if turn.loaded and turn.covers(config):
+        turn.memo_hits += 1
+        checkpoint_tuple = turn.checkpoint_tuple
+        if checkpoint_tuple is None:
+            return None
+        return checkpoint_tuple._replace(checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint))
+
+    turn.reading = True
+    try:
+        checkpoint_tuple = await read(config)
+    finally:
+        turn.reading = False
+
+    turn.reads += 1
+    if get_checkpoint_id(config) is None and turn.covers(config):
+        turn.checkpoint_tuple = checkpoint_tuple
+        turn.loaded = True
+
+    return checkpoint_tuple
+
+
+def note_checkpoint_put(config: RunnableConfig):
+    """Un aput del thread deja obsoleta la tupla del turno"""
+    turn = _current_turn.get()
+    if turn is not None and str(config["configurable"].get("thread_id")) == turn.thread_id:
+        turn.loaded = False
+
+
+@asynccontextmanager
+async def checkpoint_turn(checkpointer, thread_id: str) -> AsyncIterator[CheckpointTurn]:
+    turn = CheckpointTurn(thread_id)
+    token = _current_turn.set(turn)
+
+    try:
+        await checkpointer.aget_tuple({"configurable": {"thread_id": turn.thread_id}})
+        yield turn
+    finally:
+        _current_turn.reset(token)
+        checkpoint_turns.record(turn)
@@ -1,81 +1,131 @@
 """
 app/services/checkpointer.py
-AsyncPostgresSaver wrapper para recursos limitados (512MB RAM, 2 CPUs)
+Checkpointer Postgres asyncio nativo para recursos limitados (512MB RAM, 2 CPUs)
 """
 
-from langgraph.checkpoint.postgres import PostgresSaver
-from langgraph.checkpoint.base import BaseCheckpointSaver
-from psycopg_pool import ConnectionPool
-from typing import Optional, Any, Iterator, AsyncIterator
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver as _NativeAsyncPostgresSaver
+from psycopg import AsyncCursor
+from psycopg.rows import dict_row
+from psycopg.types.json import set_json_dumps
+from psycopg_pool import AsyncConnectionPool
+from typing import AsyncIterator
+import json
+import threading
+from contextlib import asynccontextmanager
 
+from app.config import settings
+from app.services.checkpoint_turn import note_checkpoint_put, read_through_turn
 
-class AsyncPostgresSaver(BaseCheckpointSaver):
-    """Wrapper async para PostgresSaver heredando de BaseCheckpointSaver"""
+# Parámetros que exige el saver de langgraph en cada conexión
+_CONNECTION_KWARGS = {
+    "autocommit": True,
+    "prepare_threshold": 0,
+    "row_factory": dict_row,
+}
 
-    def __init__(self, saver: PostgresSaver):
-        self._saver = saver
-        self._executor = ThreadPoolExecutor(max_workers=2)
 
-    async def aget_tuple(self, config: dict) -> Optional[Any]:
-        """Método async para get_tuple"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self._executor, self._saver.get_tuple, config)
-
-    async def aput(
-        self, config: dict, checkpoint: dict, metadata: dict, new_versions: dict
-    ) -> dict:
-        """Método async para put"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self._executor, self._saver.put, config, checkpoint, metadata, new_versions
-        )
-
-    async def aput_writes(self, config: dict, writes: list, task_id: str) -> None:
-        """Método async para put_writes"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self._executor, self._saver.put_writes, config, writes, task_id
-        )
-
-    def get_tuple(self, config: dict) -> Optional[Any]:
-        """Método sync para get_tuple"""
-        return self._saver.get_tuple(config)
-
-    def put(
-        self, config: dict, checkpoint: dict, metadata: dict, new_versions: dict
-    ) -> dict:
-        """Método sync para put"""
-        return self._saver.put(config, checkpoint, metadata, new_versions)
-
-    def put_writes(self, config: dict, writes: list, task_id: str) -> None:
-        """Método sync para put_writes"""
-        return self._saver.put_writes(config, writes, task_id)
-
-    async def alist(self, config: dict, **kwargs) -> AsyncIterator:
-        """Método async para list"""
-
-        def _list():
-            return list(self._saver.list(config, **kwargs))
-
-        loop = asyncio.get_event_loop()
-        items = await loop.run_in_executor(self._executor, _list)
-
-        for item in items:
-            yield item
+class AsyncPostgresSaver(_NativeAsyncPostgresSaver):
+    """
+    Saver async sobre un AsyncConnectionPool compartido por todas las sesiones.
+    aput y aput_writes se envían en modo pipeline (un round-trip por operación).
+    Mide los bytes escritos por checkpoint (documento y metadata JSONB + blobs de
+    canales) sobre la misma serialización que envía psycopg.
+    """
 
-    def list(self, config: dict, **kwargs) -> Iterator:
-        """Método sync para list"""
-        return self._saver.list(config, **kwargs)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # _dump_blobs/_dump_writes corren en hilos (asyncio.to_thread)
+        self._meter_lock = threading.Lock()
+        self.checkpoints_written = 0
+        self.document_bytes = 0
+        self.blob_bytes = 0
+        self.blobs_written = 0
+        self.writes_written = 0
+        self.write_bytes = 0
+
+    async def aget_tuple(self, config):
+        return await read_through_turn(config, super().aget_tuple)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        note_checkpoint_put(config)
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+
+        with self._meter_lock:
+            self.checkpoints_written += 1
+
+        return next_config
+
+    def _dump_json(self, obj) -> bytes:
+        """dumps de los Jsonb en las conexiones del pool: cuenta lo que psycopg envía"""
+        data = json.dumps(obj).encode()
+
+        with self._meter_lock:
+            self.document_bytes += len(data)
+
+        return data
+
+    def _dump_blobs(self, thread_id, checkpoint_ns, values, versions):
+        rows = super()._dump_blobs(thread_id, checkpoint_ns, values, versions)
+
+        with self._meter_lock:
+            self.blobs_written += len(rows)
+            self.blob_bytes += sum(len(row[-1] or b"") for row in rows)
+
+        return rows
+
+    def _dump_writes(self, thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, writes):
+        rows = super()._dump_writes(thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, writes)
+
+        with self._meter_lock:
+            self.writes_written += len(rows)
+            self.write_bytes += sum(len(row[-1] or b"") for row in rows)
+
+        return rows
+
+    @asynccontextmanager
+    async def _cursor(self, *, pipeline: bool = False) -> AsyncIterator[AsyncCursor]:
+        # El saver base toma self.lock en cada operación; con un pool cada
+        # operación ya tiene su propia conexión y el lock solo serializa sesiones.
+        # Copia de AsyncPostgresSaver._cursor de langgraph-checkpoint-postgres 3.1.3
+        # sin el lock: tests/test_checkpointer.py falla si el original cambia
+        if not isinstance(self.conn, AsyncConnectionPool):
+            async with super()._cursor(pipeline=pipeline) as cur:
+                yield cur
+            return
+
+        async with self.conn.connection() as conn:
+            if pipeline and self.supports_pipeline:
+                async with conn.pipeline(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                    yield cur
+            elif pipeline:
+                async with conn.transaction(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                    yield cur
+            else:
+                async with conn.cursor(binary=True, row_factory=dict_row) as cur:
+                    yield cur
 
     @property
-    def _pool(self):
-        """Acceso al pool del saver original"""
-        return self._saver._pool
-
-
-def create_checkpointer(connection_url: str) -> AsyncPostgresSaver:
+    def _pool(self) -> AsyncConnectionPool:
+        return self.conn
+
+    async def aclose(self):
+        await self.conn.close()
+
+    def stats(self) -> dict:
+        checkpoints = self.checkpoints_written
+        return {
+            "pool": self.conn.get_stats(),
+            "checkpoints_written": checkpoints,
+            "bytes_per_checkpoint": round((self.document_bytes + self.blob_bytes) / checkpoints, 1) if checkpoints else 0.0,
+            "document_bytes": self.document_bytes,
+            "blob_bytes": self.blob_bytes,
+            "blobs_written": self.blobs_written,
+            "writes_written": self.writes_written,
+            "write_bytes": self.write_bytes,
+        }
+
+
+async def create_checkpointer(connection_url: str) -> AsyncPostgresSaver:
     """
     Crear checkpointer async con pool optimizado para recursos limitados
 
@@ -83,16 +133,24 @@ def create_checkpointer(connection_url: str) -> AsyncPostgresSaver:
         connection_url: URL PostgreSQL (formato psycopg, NO asyncpg)
 
     Returns:
-        AsyncPostgresSaver configurado
+        AsyncPostgresSaver configurado, con tablas creadas/migradas
     """
-    pool = ConnectionPool(
+    async def configure(conn):
+        # Las conexiones se abren en pool.open(), con el saver ya creado
+        set_json_dumps(saver._dump_json, conn)
+
+    pool = AsyncConnectionPool(
         conninfo=connection_url,
-        min_size=1,
-        max_size=3,
+        min_size=settings.CHECKPOINT_POOL_MIN_SIZE,
+        max_size=settings.CHECKPOINT_POOL_MAX_SIZE,
         timeout=20.0,
         max_lifetime=300,
         max_idle=60,
+        kwargs=_CONNECTION_KWARGS,
+        configure=configure,
+        open=False,
     )
-
-    saver = PostgresSaver(pool)
-    return AsyncPostgresSaver(saver)
+    saver = AsyncPostgresSaver(pool)
+    await pool.open()
+    await saver.setup()
+    return saver
@@ -0,0 +1,109 @@
+"""
+app/services/cv_parse_cache.py
+Cache persistente del CV ya parseado, por checksum del PDF y versión del parser:
+el mismo archivo no vuelve a pasar por la extracción ni por el LLM
+
+Usa su propia sesión: las lecturas y escrituras de la cache no quedan dentro de
+la transacción del request ni la confirman
+"""
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import CvParseCache
+from app.services.database import AsyncSessionLocal
+
+_GET_SQL = text("""
+UPDATE cv_parse_cache
+SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+WHERE checksum = :checksum AND parser_version = :parser_version
+RETURNING parsed_data
+""")
+
+_PUT_SQL = text("""
+INSERT INTO cv_parse_cache (checksum, parser_version, parsed_data, hits)
+VALUES (:checksum, :parser_version, CAST(:parsed_data AS JSONB), 0)
+ON CONFLICT (checksum, parser_version) DO UPDATE
+SET parsed_data = EXCLUDED.parsed_data, created_at = CURRENT_TIMESTAMP
+""")
+
+
+class CvParseCacheStore:
+    """
+    Una fila por (checksum, parser_version). Al cambiar el prompt, el modelo o los
+    topes de extracción cambia parser_version y las filas anteriores dejan de usarse.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.invalidated = 0
+
+    async def ensure_table(self, engine: AsyncEngine):
+        async with engine.begin() as conn:
+            await conn.run_sync(CvParseCache.__table__.create, checkfirst=True)
+
+    async def get(self, checksum: str, parser_version: str) -> Optional[Dict[str, Any]]:
+        self.lookups += 1
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(_GET_SQL, {"checksum": checksum, "parser_version": parser_version})
+            parsed_data = result.scalar_one_or_none()
+            await db.commit()
+
+        if parsed_data is not None:
+            self.hits += 1
+        return parsed_data
+
+    async def put(self, checksum: str, parser_version: str, parsed_data: Dict[str, Any]):
+        async with AsyncSessionLocal() as db:
+            await db.execute(_PUT_SQL, {
+                "checksum": checksum,
+                "parser_version": parser_version,
+                "parsed_data": json.dumps(parsed_data),
+            })
+            await db.commit()
+        self.stores += 1
+
+    async def invalidate(self, checksum: Optional[str] = None, parser_version: Optional[str] = None) -> int:
+        """Borra las entradas de un checksum, de una versión del parser, o todas"""
+        clauses, params = [], {}
+        if checksum:
+            clauses.append("checksum = :checksum")
+            params["checksum"] = checksum
+        if parser_version:
+            clauses.append("parser_version = :parser_version")
+            params["parser_version"] = parser_version
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text(f"DELETE FROM cv_parse_cache{where}"), params)
+            await db.commit()
+
+        self.invalidated += result.rowcount
+        return result.rowcount
+
+    async def summary(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text("""
+                SELECT parser_version, count(*) AS entries, COALESCE(sum(hits), 0) AS hits
+                FROM cv_parse_cache
+                GROUP BY parser_version
+                ORDER BY max(created_at) DESC
+            """))
+            return {row.parser_version: {"entries": row.entries, "hits": int(row.hits)} for row in result}
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "stores": self.stores,
+            "invalidated": self.invalidated,
+        }
+
+
+cv_parse_cache = CvParseCacheStore()
@@ -0,0 +1,465 @@
+"""
+app/services/cv_upload.py
+Recepción de CVs sin cargar el archivo entero en memoria: por WebSocket en frames
+binarios numerados (la subida sobrevive a una reconexión) y por HTTP leyendo el
+multipart a medida que llega. En ambos el SHA-256 y el tope se calculan al vuelo
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import time
+import uuid
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cada frame binario: número de secuencia (uint32 big-endian) seguido del bloque
+CHUNK_HEADER = struct.Struct(">I")
+
+
+class CvUploadError(Exception):
+    """Error del protocolo de subida; el mensaje se envía al cliente"""
+
+    def __init__(self, message: str, abort: bool = False):
+        super().__init__(message)
+        self.abort = abort
+
+
+class CvUpload:
+    __slots__ = (
+        "upload_id", "session_token", "file_name", "declared_size", "declared_sha256",
+        "path", "_file", "_sha256", "next_seq", "received", "started_at", "touched_at"
+    )
+
+    def __init__(self, session_token: str, file_name: str, declared_size: int, declared_sha256: Optional[str]):
+        self.upload_id = uuid.uuid4().hex
+        self.session_token = session_token
+        self.file_name = file_name
+        self.declared_size = declared_size
+        self.declared_sha256 = declared_sha256
+        fd, self.path = tempfile.mkstemp(prefix="cv_upload_", suffix=".pdf")
+        self._file = os.fdopen(fd, "wb")
+        self._sha256 = hashlib.sha256()
+        self.next_seq = 0
+        self.received = 0
+        self.started_at = self.touched_at = time.monotonic()
+
+    def write(self, data: bytes):
+        """Solo disco y hash: corre en un hilo, la secuencia la avanza el registro"""
+        self._file.write(data)
+        self._sha256.update(data)
+
+    def finish(self) -> str:
+        """Cierra el temporal (queda en path) y devuelve su checksum"""
+        self._file.close()
+        return self._sha256.hexdigest()
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def progress(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "next_seq": self.next_seq,
+            "received": self.received,
+            "size": self.declared_size,
+        }
+
+
+class CvUploadRegistry:
+    """
+    Subidas en curso del proceso. Una subida se identifica por upload_id y solo la
+    puede continuar el mismo session_token; las abandonadas se borran tras ttl_seconds
+    (run_forever desde el lifespan, y también al empezar una nueva).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = settings.CV_UPLOAD_MAX_BYTES,
+        chunk_bytes: int = settings.CV_UPLOAD_CHUNK_BYTES,
+        ttl_seconds: int = settings.CV_UPLOAD_TTL_SECONDS,
+        max_pending: int = settings.CV_UPLOAD_MAX_PENDING,
+    ):
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._uploads: Dict[str, CvUpload] = {}
+
+        self.started = 0
+        self.resumed = 0
+        self.completed = 0
+        self.aborted = 0
+        self.expired = 0
+        self.chunks = 0
+        self.duplicate_chunks = 0
+        self.bytes_received = 0
+
+    def expire(self) -> int:
+        now = time.monotonic()
+        expired = 0
+        for upload_id, upload in list(self._uploads.items()):
+            if now - upload.touched_at > self.ttl_seconds:
+                self._uploads.pop(upload_id).discard()
+                expired += 1
+
+        self.expired += expired
+        return expired
+
+    def _find(self, session_token: str, upload_id: str) -> CvUpload:
+        upload = self._uploads.get(upload_id)
+        if upload is None or upload.session_token != session_token:
+            raise CvUploadError("Subida no encontrada o expirada", abort=True)
+        return upload
+
+    def begin(
+        self,
+        session_token: str,
+        file_name: str,
+        size: int,
+        sha256: Optional[str] = None,
+        upload_id: Optional[str] = None
+    ) -> CvUpload:
+        """Nueva subida, o la existente si upload_id viene de una conexión anterior"""
+        self.expire()
+
+        if upload_id:
+            upload = self._find(session_token, upload_id)
+            upload.touched_at = time.monotonic()
+            self.resumed += 1
+            return upload
+
+        if not isinstance(size, int) or size <= 0:
+            raise CvUploadError("Tamaño de archivo inválido")
+        if size > self.max_bytes:
+            raise CvUploadError(f"Archivo muy grande (max {self.max_bytes // 1_000_000}MB)")
+        if len(self._uploads) >= self.max_pending:
+            raise CvUploadError("Demasiadas subidas en curso, intenta en unos minutos")
+
+        # Una subida a la vez por sesión: la nueva reemplaza a la anterior
+        for previous in [u for u in self._uploads.values() if u.session_token == session_token]:
+            self._remove(previous)
+            self.aborted += 1
+
+        upload = CvUpload(session_token, file_name, size, sha256.lower() if sha256 else None)
+        self._uploads[upload.upload_id] = upload
+        self.started += 1
+        return upload
+
+    def active(self, session_token: str) -> Optional[CvUpload]:
+        for upload in self._uploads.values():
+            if upload.session_token == session_token:
+                return upload
+        return None
+
+    async def write_chunk(self, session_token: str, frame: bytes) -> CvUpload:
+        """Escribe un frame binario; un bloque ya recibido se ignora"""
+        upload = self.active(session_token)
+        if upload is None:
+            raise CvUploadError("No hay una subida en curso")
+
+        if len(frame) <= CHUNK_HEADER.size:
+            raise CvUploadError("Bloque vacío")
+        (seq,) = CHUNK_HEADER.unpack_from(frame)
+        data = memoryview(frame)[CHUNK_HEADER.size:]
+
+        if seq < upload.next_seq:
+            # Reenvío tras una reconexión: ya estaba escrito
+            self.duplicate_chunks += 1
+            return upload
+        if seq > upload.next_seq:
+            raise CvUploadError(f"Bloque fuera de orden: se esperaba {upload.next_seq}")
+        if len(data) > self.chunk_bytes:
+            raise CvUploadError(f"Bloque muy grande (max {self.chunk_bytes} bytes)")
+        if upload.received + len(data) > min(upload.declared_size, self.max_bytes):
+            self._remove(upload)
+            self.aborted += 1
+            raise CvUploadError("El archivo supera el tamaño declarado", abort=True)
+
+        # La secuencia avanza antes de escribir: un reenvío durante la escritura es duplicado
+        upload.next_seq += 1
+        upload.received += len(data)
+        upload.touched_at = time.monotonic()
+        try:
+            await asyncio.to_thread(upload.write, data)
+        except (OSError, ValueError):
+            if upload.upload_id not in self._uploads:
+                # Cancelada o reemplazada desde otra conexión mientras se escribía
+                raise CvUploadError("Subida no encontrada o expirada", abort=True)
+            self._remove(upload)
+            self.aborted += 1
+            raise
+
+        self.chunks += 1
+        self.bytes_received += len(data)
+        return upload
+
+    async def finish(self, session_token: str, upload_id: str) -> Tuple[CvUpload, str]:
+        """
+        Cierra la subida y devuelve el checksum verificado. El archivo queda en
+        upload.path para leerlo desde ahí; quien llama lo borra con upload.discard()
+        """
+        upload = self._find(session_token, upload_id)
+
+        if upload.received != upload.declared_size:
+            raise CvUploadError(
+                f"Subida incompleta: {upload.received} de {upload.declared_size} bytes"
+            )
+
+        self._uploads.pop(upload.upload_id, None)
+        try:
+            checksum = await asyncio.to_thread(upload.finish)
+        except BaseException:
+            upload.discard()
+            raise
+
+        if upload.declared_sha256 and checksum != upload.declared_sha256:
+            upload.discard()
+            self.aborted += 1
+            raise CvUploadError("El checksum del archivo no coincide", abort=True)
+
+        self.completed += 1
+        return upload, checksum
+
+    def cancel(self, session_token: str, upload_id: str):
+        self._remove(self._find(session_token, upload_id))
+        self.aborted += 1
+
+    def _remove(self, upload: CvUpload):
+        self._uploads.pop(upload.upload_id, None)
+        upload.discard()
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(max(1, self.ttl_seconds // 2))
+
+            try:
+                self.expire()
+            except Exception as e:
+                logger.error(f"Error expirando subidas de CV: {e}")
+
+    def close(self):
+        for upload in list(self._uploads.values()):
+            self._remove(upload)
+
+    def stats(self) -> dict:
+        return {
+            "in_progress": len(self._uploads),
+            "started": self.started,
+            "resumed": self.resumed,
+            "completed": self.completed,
+            "aborted": self.aborted,
+            "expired": self.expired,
+            "chunks": self.chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+            "bytes_received": self.bytes_received,
+        }
+
+
+cv_uploads = CvUploadRegistry()
+
+
+class CvSpool:
+    """
+    Archivo recibido por partes: en memoria hasta spool_bytes y, si crece más, en
+    un temporal con nombre que el proceso de extracción puede abrir directamente.
+    """
+
+    def __init__(self, spool_bytes: int = settings.CV_UPLOAD_SPOOL_BYTES):
+        self.spool_bytes = spool_bytes
+        self._buffer = BytesIO()
+        self._file: Optional[BinaryIO] = None
+        self._sha256 = hashlib.sha256()
+        self.path: Optional[str] = None
+        self.size = 0
+
+    async def write(self, data: bytes):
+        """En memoria se escribe en el acto; el paso a disco y lo que sigue, en un hilo"""
+        if self._file is None and self.size + len(data) <= self.spool_bytes:
+            self._buffer.write(data)
+            self._sha256.update(data)
+        else:
+            await asyncio.to_thread(self._write_to_disk, data)
+        self.size += len(data)
+
+    def _write_to_disk(self, data: bytes):
+        if self._file is None:
+            fd, self.path = tempfile.mkstemp(prefix="cv_upload_", suffix=".pdf")
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = BytesIO()
+
+        self._file.write(data)
+        self._sha256.update(data)
+
+    @property
+    def checksum(self) -> str:
+        return self._sha256.hexdigest()
+
+    async def finish(self):
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+
+    def source(self) -> Union[bytes, str]:
+        """Contenido si quedó en memoria, ruta del temporal si pasó a disco"""
+        return self.path or self._buffer.getvalue()
+
+    def open(self) -> BinaryIO:
+        if self.path:
+            return open(self.path, "rb")
+        return BytesIO(self._buffer.getbuffer())
+
+    def read(self) -> bytes:
+        with self.open() as spooled:
+            return spooled.read()
+
+    def discard(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self._buffer = BytesIO()
+
+
+class CvMultipartUpload:
+    __slots__ = ("fields", "file_name", "content_type", "spool")
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.file_name: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.spool: Optional[CvSpool] = None
+
+    def discard(self):
+        if self.spool is not None:
+            self.spool.discard()
+
+
+# Margen para los campos de texto y los encabezados de cada parte
+_FORM_OVERHEAD_BYTES = 16 * 1024
+_MAX_FIELD_BYTES = 1024
+
+
+async def receive_cv_multipart(
+    request: Request,
+    file_field: str = "file",
+    max_bytes: int = settings.CV_UPLOAD_MAX_BYTES
+) -> CvMultipartUpload:
+    """
+    Lee un multipart/form-data desde el stream de la request. El archivo va al
+    spool con SHA-256 incremental; se corta en cuanto supera max_bytes o no es PDF.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+
+    if content_type != b"multipart/form-data" or not boundary:
+        raise CvUploadError("Se esperaba multipart/form-data")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + _FORM_OVERHEAD_BYTES:
+        raise CvUploadError(f"Archivo muy grande (máx {max_bytes // 1_000_000}MB)")
+
+    upload = CvMultipartUpload()
+    part = {"headers": {}, "field": b"", "value": b"", "name": None, "is_file": False, "data": bytearray()}
+    # Los callbacks del parser son síncronos: juntan los bloques del archivo y el
+    # spool los escribe después de cada parser.write, fuera de los callbacks
+    file_state = {"pending": [], "size": 0, "ended": False}
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", name=None, is_file=False, data=bytearray())
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = disposition.get(b"name", b"").decode("latin-1")
+
+        if b"filename" not in disposition:
+            return
+        if part["name"] != file_field or upload.spool is not None:
+            raise CvUploadError("Archivo inesperado en el formulario")
+
+        upload.file_name = disposition[b"filename"].decode("utf-8", "replace")
+        upload.content_type = part["headers"].get(b"content-type", b"").decode("latin-1").strip()
+        if upload.content_type != "application/pdf":
+            raise CvUploadError("Solo archivos PDF permitidos")
+
+        upload.spool = CvSpool()
+        part["is_file"] = True
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["is_file"]:
+            file_state["size"] += end - start
+            if file_state["size"] > max_bytes:
+                raise CvUploadError(f"Archivo muy grande (máx {max_bytes // 1_000_000}MB)")
+            file_state["pending"].append(data[start:end])
+            return
+
+        if len(part["data"]) + (end - start) > _MAX_FIELD_BYTES:
+            raise CvUploadError(f"Campo {part['name']} muy largo")
+        part["data"] += data[start:end]
+
+    def on_part_end():
+        if part["is_file"]:
+            file_state["ended"] = True
+        elif part["name"]:
+            upload.fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async def flush_file():
+        if file_state["pending"]:
+            await upload.spool.write(b"".join(file_state["pending"]))
+            file_state["pending"].clear()
+        if file_state["ended"]:
+            file_state["ended"] = False
+            await upload.spool.finish()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await flush_file()
+        parser.finalize()
+        await flush_file()
+    except MultipartParseError:
+        upload.discard()
+        raise CvUploadError("Formulario mal formado")
+    except BaseException:
+        upload.discard()
+        raise
+
+    return upload
@@ -0,0 +1,294 @@
+"""
+app/services/email_outbox.py
+Outbox de emails: la evaluación deja los correos en email_outbox dentro de su
+transacción y un worker en segundo plano los entrega con reintentos. Los avisos
+a RRHH en modo digest (hr_digest_item) se agrupan en un solo correo
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.config import settings
+from app.models import EmailOutbox
+from app.services.database import AsyncSessionLocal
+from app.services.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+# Toma un lote vencido y lo reserva moviendo next_attempt_at: si el proceso muere
+# a mitad del envío, el correo vuelve a estar disponible al vencer la reserva
+_CLAIM_SQL = text("""
+UPDATE email_outbox
+SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => CAST(:lease_seconds AS integer))
+WHERE id IN (
+    SELECT id FROM email_outbox
+    WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+      AND kind <> 'hr_digest_item'
+    ORDER BY next_attempt_at
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, evaluation_id, kind, recipient, subject, body, attempts
+""")
+
+# Avisos del digest listos para enviarse: los más antiguos hasta max_items, solo
+# si ya se juntaron max_items o el más antiguo cumplió la ventana
+_CLAIM_DIGEST_SQL = text("""
+WITH due AS (
+    SELECT id, created_at FROM email_outbox
+    WHERE kind = 'hr_digest_item' AND status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+    ORDER BY created_at
+    LIMIT :max_items
+    FOR UPDATE SKIP LOCKED
+),
+ready AS (
+    SELECT id FROM due
+    WHERE (SELECT count(*) FROM due) >= :max_items
+       OR (SELECT min(created_at) FROM due) <= CURRENT_TIMESTAMP - make_interval(mins => CAST(:window_minutes AS integer))
+)
+UPDATE email_outbox o
+SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => CAST(:lease_seconds AS integer))
+FROM ready
+WHERE o.id = ready.id
+RETURNING o.id, o.recipient, o.payload, o.attempts, o.created_at
+""")
+
+_MARK_SENT_SQL = text("""
+WITH sent AS (
+    UPDATE email_outbox
+    SET status = 'sent', sent_at = CURRENT_TIMESTAMP, attempts = attempts + 1, last_error = NULL
+    WHERE id = ANY(:ids)
+    RETURNING evaluation_id, kind
+)
+UPDATE evaluations e
+SET email_sent = true
+FROM sent
+WHERE e.id = sent.evaluation_id AND sent.kind = 'evaluation_result'
+""")
+
+_MARK_FAILED_SQL = text("""
+UPDATE email_outbox
+SET attempts = attempts + 1,
+    last_error = :error,
+    status = CASE WHEN attempts + 1 >= :max_attempts THEN 'dead' ELSE 'pending' END,
+    next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => CAST(:delay_seconds AS integer))
+WHERE id = ANY(:ids)
+""")
+
+
+class EmailOutboxWorker:
+    """
+    Entrega lo pendiente de email_outbox sin retener conexiones de BD durante el
+    envío SMTP. Tras max_attempts fallos el correo queda en status='dead'.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = settings.EMAIL_OUTBOX_INTERVAL_SECONDS,
+        batch_size: int = settings.EMAIL_OUTBOX_BATCH_SIZE,
+        max_attempts: int = settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        retry_base_seconds: int = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS,
+        retry_max_seconds: int = settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS,
+        lease_seconds: int = settings.EMAIL_OUTBOX_LEASE_SECONDS,
+        digest_window_minutes: int = settings.HR_DIGEST_WINDOW_MINUTES,
+        digest_max_items: int = settings.HR_DIGEST_MAX_ITEMS,
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.digest_window_minutes = digest_window_minutes
+        self.digest_max_items = max(1, digest_max_items)
+        self._wake: Optional[asyncio.Event] = None
+
+        self.runs = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.digests_sent = 0
+        self.last_run_ms = 0.0
+        self.last_error = None
+
+    async def ensure_table(self, engine: AsyncEngine):
+        async with engine.begin() as conn:
+            await conn.run_sync(EmailOutbox.__table__.create, checkfirst=True)
+
+    def enqueue(
+        self,
+        db: AsyncSession,
+        evaluation_id: Optional[str],
+        kind: str,
+        recipient: str,
+        subject: str,
+        body: str,
+        payload: Optional[dict] = None
+    ):
+        """Agrega el correo a la transacción de db; se entrega cuando esta se confirme"""
+        db.add(EmailOutbox(
+            evaluation_id=evaluation_id,
+            kind=kind,
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            payload=payload
+        ))
+        self.enqueued += 1
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def _retry_delay(self, attempts: int) -> int:
+        return min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(0, attempts - 1))
+
+    async def _claim(self) -> list:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(_CLAIM_SQL, {
+                "lease_seconds": self.lease_seconds,
+                "batch_size": self.batch_size,
+            })
+            rows = result.fetchall()
+            await db.commit()
+        return rows
+
+    async def _mark_failed(self, ids: List, attempts: int, error: Exception):
+        async with AsyncSessionLocal() as db:
+            await db.execute(_MARK_FAILED_SQL, {
+                "ids": ids,
+                "error": f"{type(error).__name__}: {error}"[:1000],
+                "max_attempts": self.max_attempts,
+                "delay_seconds": self._retry_delay(attempts),
+            })
+            await db.commit()
+
+        self.last_error = str(error)
+        if attempts >= self.max_attempts:
+            self.dead += len(ids)
+        else:
+            self.retried += len(ids)
+
+    async def _mark_sent(self, ids: List):
+        async with AsyncSessionLocal() as db:
+            await db.execute(_MARK_SENT_SQL, {"ids": ids})
+            await db.commit()
+
+        self.sent += len(ids)
+
+    async def _deliver(self, row) -> bool:
+        try:
+            await email_service.enviar(row.recipient, row.subject, row.body)
+        except Exception as e:
+            attempts = row.attempts + 1
+            await self._mark_failed([row.id], attempts, e)
+            if attempts >= self.max_attempts:
+                logger.error(f"Email {row.kind} a {row.recipient} descartado tras {attempts} intentos: {e}")
+            return False
+
+        await self._mark_sent([row.id])
+        return True
+
+    async def _claim_digest(self) -> list:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(_CLAIM_DIGEST_SQL, {
+                "max_items": self.digest_max_items,
+                "window_minutes": self.digest_window_minutes,
+                "lease_seconds": self.lease_seconds,
+            })
+            rows = result.fetchall()
+            await db.commit()
+        return rows
+
+    async def _deliver_digest(self, rows: list) -> bool:
+        from app.tools.email_tools import build_hr_digest_email
+
+        rows = sorted(rows, key=lambda row: row.created_at)
+        ids = [row.id for row in rows]
+        subject, body = build_hr_digest_email([row.payload for row in rows])
+
+        try:
+            await email_service.enviar(rows[0].recipient, subject, body)
+        except Exception as e:
+            attempts = max(row.attempts for row in rows) + 1
+            await self._mark_failed(ids, attempts, e)
+            if attempts >= self.max_attempts:
+                logger.error(f"Digest de RRHH con {len(ids)} avisos descartado tras {attempts} intentos: {e}")
+            return False
+
+        await self._mark_sent(ids)
+        self.digests_sent += 1
+        return True
+
+    async def run_once(self) -> dict:
+        started = time.perf_counter()
+        result = {"sent": 0, "failed": 0}
+
+        while True:
+            rows = await self._claim()
+
+            for row in rows:
+                if await self._deliver(row):
+                    result["sent"] += 1
+                else:
+                    result["failed"] += 1
+
+            if len(rows) < self.batch_size:
+                break
+
+        while True:
+            rows = await self._claim_digest()
+            if not rows:
+                break
+
+            if await self._deliver_digest(rows):
+                result["sent"] += len(rows)
+            else:
+                result["failed"] += len(rows)
+
+            if len(rows) < self.digest_max_items:
+                break
+
+        self.runs += 1
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def run_forever(self):
+        self._wake = asyncio.Event()
+
+        while True:
+            # La primera vuelta entrega lo que quedó pendiente antes de un reinicio
+            try:
+                await self.run_once()
+                await email_service.close_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error en outbox de emails: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+            "digests_sent": self.digests_sent,
+            "last_run_ms": self.last_run_ms,
+            "last_error": self.last_error,
+        }
+
+
+email_outbox = EmailOutboxWorker()
@@ -1,65 +1,227 @@
 """
 app/services/email_service.py
-Servicio de emails ASYNC corregido
+Servicio de emails ASYNC con pool de conexiones SMTP autenticadas
 """
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Errores al abrir la sesión (conexión, EHLO/STARTTLS, login): el mensaje todavía no
+# se entregó, así que se reintenta una vez con otra conexión. Un error durante el envío
+# no se reintenta aquí (un timeout tras DATA pudo haber sido aceptado); queda al outbox
+_CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "created_at", "last_used", "messages")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = self.last_used = time.monotonic()
+        self.messages = 0
+
 
 class EmailService:
-    """Servicio para envío de emails asíncrono"""
-    
-    def __init__(self):
-        self.smtp_server = settings.SMTP_HOST
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_user = settings.SMTP_USER
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.from_email = settings.SMTP_USER  # Usar SMTP_USER como from_email
-    
-    async def _enviar_email(
+    """
+    Servicio para envío de emails asíncrono. Con pool_size > 0 reutiliza sesiones
+    SMTP ya autenticadas (STARTTLS + login una vez por conexión); con 0 abre una
+    sesión por mensaje.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = settings.SMTP_POOL_SIZE,
+        idle_seconds: int = settings.SMTP_POOL_IDLE_SECONDS,
+        healthcheck_seconds: int = settings.SMTP_POOL_HEALTHCHECK_SECONDS,
+        max_messages_per_connection: int = settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        timeout: int = settings.SMTP_TIMEOUT,
+        start_tls: bool = settings.SMTP_START_TLS,
+        validate_certs: bool = True,
+        smtp_server: str = settings.SMTP_HOST,
+        smtp_port: int = settings.SMTP_PORT,
+        smtp_user: str = settings.SMTP_USER,
+        smtp_password: str = settings.SMTP_PASSWORD,
+    ):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.smtp_user = smtp_user
+        self.smtp_password = smtp_password
+        self.from_email = smtp_user  # Usar SMTP_USER como from_email
+
+        self.pool_size = max(0, pool_size)
+        self.idle_seconds = idle_seconds
+        self.healthcheck_seconds = healthcheck_seconds
+        self.max_messages_per_connection = max(1, max_messages_per_connection)
+        self.timeout = timeout
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+
+        self._idle: List[_PooledConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.sent = 0
+        self.failed = 0
+        self.connections_opened = 0
+        self.reconnects = 0
+        self.healthchecks = 0
+
+    def _build_message(self, destinatario: str, subject: str, body: str, from_email: str = None) -> MIMEMultipart:
+        mensaje = MIMEMultipart("alternative")
+        mensaje["Subject"] = subject
+        mensaje["From"] = from_email or self.from_email
+        mensaje["To"] = destinatario
+        mensaje.attach(MIMEText(body, "html", "utf-8"))
+        return mensaje
+
+    def _credentials(self) -> dict:
+        if not self.smtp_user:
+            return {}
+        return {"username": self.smtp_user, "password": self.smtp_password}
+
+    async def _connect(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.smtp_server,
+            port=self.smtp_port,
+            timeout=self.timeout,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            **self._credentials(),
+        )
+        await smtp.connect()
+        self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    async def _discard(self, connection: _PooledConnection):
+        try:
+            await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    async def _is_healthy(self, connection: _PooledConnection) -> bool:
+        if not connection.smtp.is_connected:
+            return False
+        if time.monotonic() - connection.last_used < self.healthcheck_seconds:
+            return True
+
+        self.healthchecks += 1
+        try:
+            await connection.smtp.noop()
+            return True
+        except Exception:
+            return False
+
+    async def _acquire(self) -> _PooledConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            if time.monotonic() - connection.last_used > self.idle_seconds:
+                await self._discard(connection)
+                continue
+            if await self._is_healthy(connection):
+                return connection
+            await self._discard(connection)
+
+        for attempt in range(2):
+            try:
+                return await self._connect()
+            except _CONNECTION_ERRORS:
+                if attempt:
+                    raise
+                self.reconnects += 1
+
+    async def _release(self, connection: _PooledConnection):
+        connection.last_used = time.monotonic()
+        connection.messages += 1
+
+        if connection.messages >= self.max_messages_per_connection or len(self._idle) >= self.pool_size:
+            await self._discard(connection)
+        else:
+            self._idle.append(connection)
+
+    async def _send_pooled(self, mensaje: MIMEMultipart):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+        async with self._slots:
+            connection = await self._acquire()
+            try:
+                await connection.smtp.send_message(mensaje)
+            except Exception:
+                await self._discard(connection)
+                raise
+
+            await self._release(connection)
+
+    async def enviar(
         self,
         destinatario: str,
         subject: str,
         body: str,
         from_email: str = None
-    ) -> bool:
+    ):
         """
-        Envía email de forma ASÍNCRONA usando aiosmtplib
+        Envía email de forma ASÍNCRONA usando aiosmtplib; propaga el error de SMTP
         """
+        mensaje = self._build_message(destinatario, subject, body, from_email)
+        started = time.perf_counter()
+
         try:
-            # Crear mensaje
-            mensaje = MIMEMultipart("alternative")
-            mensaje["Subject"] = subject
-            mensaje["From"] = from_email or self.from_email
-            mensaje["To"] = destinatario
-            
-            # Agregar body HTML
-            html_part = MIMEText(body, "html", "utf-8")
-            mensaje.attach(html_part)
-            
-            print(f"📧 Intentando enviar email a {destinatario}...")
-            print(f"   SMTP: {self.smtp_server}:{self.smtp_port}")
-            print(f"   User: {self.smtp_user}")
-            
-            # Enviar usando aiosmtplib con STARTTLS
-            await aiosmtplib.send(
-                mensaje,
-                hostname=self.smtp_server,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                start_tls=True,  # STARTTLS para Gmail
-            )
-            
-            print(f"✅ Email enviado exitosamente a {destinatario}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error enviando email a {destinatario}:")
-            print(f"   Tipo: {type(e).__name__}")
-            print(f"   Mensaje: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return False
\ No newline at end of file
+            if self.pool_size:
+                await self._send_pooled(mensaje)
+            else:
+                await aiosmtplib.send(
+                    mensaje,
+                    hostname=self.smtp_server,
+                    port=self.smtp_port,
+                    timeout=self.timeout,
+                    start_tls=self.start_tls,
+                    validate_certs=self.validate_certs,
+                    **self._credentials(),
+                )
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.sent += 1
+        logger.info(f"Email enviado a {destinatario} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    async def close_idle(self):
+        """Cierra las conexiones que superaron idle_seconds sin uso"""
+        now = time.monotonic()
+        expired = [connection for connection in self._idle if now - connection.last_used > self.idle_seconds]
+        self._idle = [connection for connection in self._idle if connection not in expired]
+
+        for connection in expired:
+            await self._discard(connection)
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "idle_connections": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "sent": self.sent,
+            "failed": self.failed,
+            "reconnects": self.reconnects,
+            "healthchecks": self.healthchecks,
+        }
+
+
+email_service = EmailService()
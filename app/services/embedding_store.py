@@ -0,0 +1,178 @@
+"""
+app/services/embedding_store.py
+Tier persistente de embeddings en SQLite local: sobrevive reinicios y deploys
+(en Render requiere un disco persistente montado en EMBEDDING_STORE_PATH)
+"""
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# No se reescribe last_access en cada hit, solo si quedó más viejo que esto
+_TOUCH_INTERVAL_SECONDS = 300
+# Al superar el límite se borra hasta dejar este porcentaje libre
+_EVICTION_TARGET_RATIO = 0.9
+
+
+class PersistentEmbeddingStore:
+    """Vectores float32 normalizados indexados por (modelo, dimensiones, hash del texto)"""
+
+    def __init__(self, path: str, model: str, dimensions: int, max_bytes: int):
+        self.path = path
+        self.model = model
+        self.dimensions = dimensions
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+
+        row = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        self.entries, self.current_bytes = row
+
+    def get(self, text_hash: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT vector, last_access FROM embeddings
+                WHERE model = ? AND dimensions = ? AND text_hash = ?
+                """,
+                (self.model, self.dimensions, text_hash)
+            ).fetchone()
+
+            if row is None or len(row[0]) != self.dimensions * 4:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            if now - row[1] > _TOUCH_INTERVAL_SECONDS:
+                self._conn.execute(
+                    """
+                    UPDATE embeddings SET last_access = ?
+                    WHERE model = ? AND dimensions = ? AND text_hash = ?
+                    """,
+                    (now, self.model, self.dimensions, text_hash)
+                )
+
+            self.hits += 1
+            return np.frombuffer(row[0], dtype=np.float32)
+
+    def put(self, text_hash: str, vector: np.ndarray):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+
+        try:
+            with self._lock:
+                previous = self._conn.execute(
+                    """
+                    SELECT LENGTH(vector) FROM embeddings
+                    WHERE model = ? AND dimensions = ? AND text_hash = ?
+                    """,
+                    (self.model, self.dimensions, text_hash)
+                ).fetchone()
+
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (self.model, self.dimensions, text_hash, blob, time.time())
+                )
+
+                if previous:
+                    self.current_bytes -= previous[0]
+                else:
+                    self.entries += 1
+                self.current_bytes += len(blob)
+
+                if self.current_bytes > self.max_bytes:
+                    self._evict()
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando embedding persistente: {e}")
+
+    def _evict(self):
+        target = int(self.max_bytes * _EVICTION_TARGET_RATIO)
+
+        while self.current_bytes > target and self.entries > 0:
+            rows = self._conn.execute(
+                """
+                SELECT rowid, LENGTH(vector) FROM embeddings
+                ORDER BY last_access ASC
+                LIMIT 256
+                """
+            ).fetchall()
+
+            if not rows:
+                break
+
+            freed = 0
+            removed = []
+            for rowid, size in rows:
+                removed.append((rowid,))
+                freed += size
+                if self.current_bytes - freed <= target:
+                    break
+
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", removed)
+            self.current_bytes -= freed
+            self.entries -= len(removed)
+            self.evictions += len(removed)
+
+    def recent(self, limit: int) -> List[Tuple[str, np.ndarray]]:
+        """Entradas más recientes del modelo actual, para precargar el cache en memoria"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT text_hash, vector FROM embeddings
+                WHERE model = ? AND dimensions = ?
+                ORDER BY last_access DESC
+                LIMIT ?
+                """,
+                (self.model, self.dimensions, limit)
+            ).fetchall()
+
+        return [
+            (text_hash, np.frombuffer(blob, dtype=np.float32))
+            for text_hash, blob in rows
+            if len(blob) == self.dimensions * 4
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": self.entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
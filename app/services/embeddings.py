@@ -1,50 +1,172 @@
 """
 app/services/embeddings.py
-Servicio de embeddings ultra-optimizado con cache LRU reducido
+Servicio de embeddings con cache LRU acotado por memoria (MEMORY_LIMITS)
 """
 import hashlib
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
 from openai import AsyncOpenAI, OpenAI
 import numpy as np
-from app.config import settings
+from app.config import settings, MEMORY_LIMITS
+from app.services.embedding_store import PersistentEmbeddingStore
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 
+# Overhead aproximado por entrada (clave md5, objeto ndarray, nodo del OrderedDict)
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def text_key(text: str) -> str:
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def normalize_embedding(embedding) -> np.ndarray:
+    """Vector float32 de norma 1 (solo lectura); el vector cero se deja igual"""
+    vector = np.array(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    vector.setflags(write=False)
+    return vector
+
+
 class EmbeddingCache:
-    
-    def __init__(self, max_size: int = 10):
-        self.cache = {}
-        self.max_size = max_size
-        self.access_order = []
-    
-    def _make_key(self, text: str) -> str:
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
-    
-    def get(self, text: str) -> Optional[List[float]]:
-        key = self._make_key(text)
-        if key in self.cache:
-            if key in self.access_order:
-                self.access_order.remove(key)
-            self.access_order.append(key)
-            return self.cache[key]
-        return None
-    
-    def set(self, text: str, embedding: List[float]):
-        key = self._make_key(text)
-        
-        if len(self.cache) >= self.max_size and key not in self.cache:
-            oldest = self.access_order.pop(0)
-            del self.cache[oldest]
-        
-        self.cache[key] = embedding
-        if key in self.access_order:
-            self.access_order.remove(key)
-        self.access_order.append(key)
-    
+    """LRU O(1) acotado por bytes que guarda vectores normalizados float32"""
+
+    def __init__(self, max_bytes: int = MEMORY_LIMITS["embedding_cache_mb"] * 1024 * 1024):
+        self.cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry_size(self, vector: np.ndarray) -> int:
+        return vector.nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_by_key(text_key(text))
+
+    def set(self, text: str, embedding) -> np.ndarray:
+        return self.set_by_key(text_key(text), embedding)
+
+    def get_by_key(self, key: str) -> Optional[np.ndarray]:
+        vector = self.cache.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def set_by_key(self, key: str, embedding) -> np.ndarray:
+        vector = normalize_embedding(embedding)
+        size = self._entry_size(vector)
+
+        previous = self.cache.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= self._entry_size(previous)
+
+        if size > self.max_bytes:
+            return vector
+
+        self.cache[key] = vector
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self.cache.popitem(last=False)
+            self.current_bytes -= self._entry_size(evicted)
+            self.evictions += 1
+
+        return vector
+
     def clear(self):
         self.cache.clear()
-        self.access_order.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingBatcher:
+    """Agrupa pedidos concurrentes en una sola llamada embeddings.create(input=[...])"""
+
+    def __init__(self, service: "EmbeddingService", max_batch_size: int, window_ms: int):
+        self._service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = window_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.requests = 0
+        self.inputs = 0
+        self.max_observed_batch = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.requests += 1
+        self.inputs += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+
+        try:
+            response = await self._service.async_client.embeddings.create(
+                model=self._service.model,
+                input=[text for text, _ in batch],
+                dimensions=self._service.dimensions
+            )
+            by_index = {item.index: item.embedding for item in response.data}
+
+            for idx, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(by_index[idx])
+
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "inputs": self.inputs,
+            "avg_batch_size": round(self.inputs / self.requests, 2) if self.requests else 0.0,
+            "max_batch_size": self.max_observed_batch,
+        }
 
 
 class EmbeddingService:
@@ -62,42 +184,140 @@ class EmbeddingService:
             timeout=20.0,
             max_retries=2
         )
-        self.cache = EmbeddingCache(max_size=settings.EMBEDDING_CACHE_SIZE)
+        self.cache = EmbeddingCache()
         self.model = settings.EMBEDDING_MODEL
         self.dimensions = settings.EMBEDDING_DIMENSIONS
         self.executor = ThreadPoolExecutor(max_workers=2)
+        self.zero_vector = normalize_embedding(np.zeros(self.dimensions, dtype=np.float32))
+        self.store = self._open_store()
+        self.batcher = EmbeddingBatcher(
+            self,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            window_ms=settings.EMBEDDING_BATCH_WINDOW_MS
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.inflight_started = 0
+        self.inflight_deduplicated = 0
+        # Escrituras al store en segundo plano: se esperan en close()
+        self._store_writes: Set[asyncio.Future] = set()
+        self.store_write_errors = 0
     
     @classmethod
     def get_instance(cls) -> "EmbeddingService":
         if cls._instance is None:
             cls._instance = cls()
         return cls._instance
+
+    def _open_store(self) -> Optional[PersistentEmbeddingStore]:
+        if not settings.EMBEDDING_STORE_PATH:
+            return None
+
+        try:
+            return PersistentEmbeddingStore(
+                path=settings.EMBEDDING_STORE_PATH,
+                model=self.model,
+                dimensions=self.dimensions,
+                max_bytes=settings.EMBEDDING_STORE_MAX_MB * 1024 * 1024
+            )
+        except Exception as e:
+            print(f"Embeddings persistentes deshabilitados: {e}")
+            return None
+
+    async def warm_up(self) -> int:
+        """Precarga en memoria los embeddings persistidos más recientes"""
+        if self.store is None:
+            return 0
+
+        limit = self.cache.max_bytes // (self.zero_vector.nbytes + _ENTRY_OVERHEAD_BYTES)
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(self.executor, self.store.recent, limit)
+
+        for key, vector in reversed(entries):
+            self.cache.set_by_key(key, vector)
+
+        return len(entries)
     
     async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_vector(text)).tolist()
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de varios textos; los pedidos concurrentes se agrupan en lotes"""
+        vectors = await asyncio.gather(*(self.embed_vector(text) for text in texts))
+        return [vector.tolist() for vector in vectors]
+
+    async def embed_vector(self, text: str) -> np.ndarray:
         if not text or not text.strip():
-            return [0.0] * self.dimensions
+            return self.zero_vector
         
         text = text.strip()[:8000]
+        key = text_key(text)
         
-        cached = self.cache.get(text)
+        cached = self.cache.get_by_key(key)
         if cached is not None:
             return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.inflight_deduplicated += 1
+        else:
+            # Single-flight: los pedidos concurrentes del mismo texto esperan la
+            # misma tarea; shield evita que cancelar a un llamador la cancele
+            inflight = asyncio.ensure_future(self._resolve(key, text))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.inflight_started += 1
+
+        return await asyncio.shield(inflight)
+
+    async def _resolve(self, key: str, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+
+        if self.store is not None:
+            stored = await loop.run_in_executor(self.executor, self.store.get, key)
+            if stored is not None:
+                return self.cache.set_by_key(key, stored)
         
         try:
-            response = await self.async_client.embeddings.create(
-                model=self.model,
-                input=text,
-                dimensions=self.dimensions
-            )
-            
-            embedding = response.data[0].embedding
-            self.cache.set(text, embedding)
-            return embedding
+            vector = self.cache.set_by_key(key, await self.batcher.embed(text))
+
+            if self.store is not None:
+                write = loop.run_in_executor(self.executor, self.store.put, key, vector)
+                self._store_writes.add(write)
+                write.add_done_callback(self._store_write_done)
+
+            return vector
             
         except Exception as e:
             print(f"Error embedding: {e}")
-            return [0.0] * self.dimensions
+            return self.zero_vector
     
+    def _store_write_done(self, write: asyncio.Future):
+        # Puede llegar dos veces (callback y close): solo cuenta la primera
+        if write not in self._store_writes:
+            return
+
+        self._store_writes.discard(write)
+        if write.cancelled():
+            return
+
+        error = write.exception()
+        if error is not None:
+            self.store_write_errors += 1
+            print(f"Error guardando embedding persistente: {error}")
+
+    async def close(self):
+        """Espera las escrituras pendientes al store antes de cerrarlo"""
+        if self._store_writes:
+            await asyncio.gather(*self._store_writes, return_exceptions=True)
+
+        # gather termina sin ceder el loop si ya estaban listas: sus callbacks aún no corrieron
+        for write in list(self._store_writes):
+            self._store_write_done(write)
+
+        self.executor.shutdown(wait=True)
+        if self.store is not None:
+            self.store.close()
+
     def _sync_embed(self, text: str) -> List[float]:
         if not text or not text.strip():
             return [0.0] * self.dimensions
@@ -106,7 +326,7 @@ class EmbeddingService:
         
         cached = self.cache.get(text)
         if cached is not None:
-            return cached
+            return cached.tolist()
         
         try:
             response = self.sync_client.embeddings.create(
@@ -115,15 +335,14 @@ class EmbeddingService:
                 dimensions=self.dimensions
             )
             
-            embedding = response.data[0].embedding
-            self.cache.set(text, embedding)
-            return embedding
+            return self.cache.set(text, response.data[0].embedding).tolist()
             
         except Exception as e:
             print(f"Error embedding sync: {e}")
             return [0.0] * self.dimensions
     
     def encode_single(self, text: str) -> List[float]:
+        """Solo para contextos sync (scripts). Dentro del event loop usar await embed_text"""
         try:
             loop = asyncio.get_event_loop()
             if loop.is_running():
@@ -133,21 +352,28 @@ class EmbeddingService:
         except RuntimeError:
             return self._sync_embed(text)
     
-    def cosine_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
-        
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return float(dot_product / (norm1 * norm2))
+    def cosine_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        """Ambos vectores deben venir normalizados (normalize_embedding / embed_vector)"""
+        return float(np.dot(embedding1, embedding2))
     
     def clear_cache(self):
         self.cache.clear()
 
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "store": {
+                **self.store.stats(),
+                "pending_writes": len(self._store_writes),
+                "write_errors": self.store_write_errors,
+            } if self.store else None,
+            "batches": self.batcher.stats(),
+            "inflight": {
+                "active": len(self._inflight),
+                "started": self.inflight_started,
+                "deduplicated": self.inflight_deduplicated,
+            },
+        }
+
 
 embedding_service = EmbeddingService.get_instance()
\ No newline at end of file
@@ -0,0 +1,424 @@
+"""
+app/services/hot_checkpointer.py
+Capa en memoria (write-behind) delante del checkpointer Postgres para sesiones activas
+
+Lecturas: el último checkpoint de cada thread activo se sirve desde memoria.
+Escrituras: aput/aput_writes solo actualizan memoria; a Postgres se baja únicamente
+el último checkpoint de cada thread (con sus writes pendientes) cuando:
+  - cambia workflow_stage o current_test (transición de etapa),
+  - el cliente se desconecta (flush_thread desde el WebSocket),
+  - el estado lleva HOT_CHECKPOINT_FLUSH_INTERVAL_SECONDS sin bajar (timer),
+  - el RSS supera MEMORY_LIMITS["app_max_mb"] (presión de memoria),
+  - se cierra la aplicación (aclose).
+
+Recuperación ante caída del proceso: se pierden los checkpoints aún no bajados,
+como máximo los turnos de una etapa dentro del intervalo del timer. La sesión se
+reanuda desde el último checkpoint bajado y el candidato vuelve a ver la pregunta
+siguiente a ese punto. Lo que los nodos escriben directo en la base (respuestas y
+progreso de la evaluación) es idempotente, así que repetir esas preguntas
+reemplaza las respuestas previas en lugar de duplicarlas.
+Ver tests/test_hot_checkpointer.py.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+
+import psutil
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    Checkpoint,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_serializable_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from app.config import settings, MEMORY_LIMITS
+from app.services.checkpoint_turn import note_checkpoint_put, read_through_turn
+
+logger = logging.getLogger(__name__)
+
+# Canales cuyo cambio marca una transición de etapa y fuerza el flush
+_FLUSH_ON_CHANGE = ("workflow_stage", "current_test")
+
+
+@dataclass(slots=True)
+class _HotThread:
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint: Checkpoint
+    metadata: dict
+    parent_id: Optional[str]
+    flushed_id: Optional[str]
+    stored_writes: list = field(default_factory=list)
+    write_calls: List[Tuple[str, str, tuple]] = field(default_factory=list)
+    unflushed_calls: List[Tuple[str, str, tuple]] = field(default_factory=list)
+    dirty_keys: Set[str] = field(default_factory=set)
+    checkpoint_dirty: bool = False
+    dirty_since: Optional[float] = None
+    touched_at: float = field(default_factory=time.monotonic)
+    flush_scheduled: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def dirty(self) -> bool:
+        return self.checkpoint_dirty or bool(self.unflushed_calls)
+
+    def config(self, checkpoint_id: Optional[str]) -> RunnableConfig:
+        configurable = {"thread_id": self.thread_id, "checkpoint_ns": self.checkpoint_ns}
+        if checkpoint_id:
+            configurable["checkpoint_id"] = checkpoint_id
+        return {"configurable": configurable}
+
+    def mark_dirty(self):
+        now = time.monotonic()
+        self.touched_at = now
+        if self.dirty_since is None:
+            self.dirty_since = now
+
+
+def _pending_writes(calls: Iterable[Tuple[str, str, tuple]]) -> list:
+    """Mismo resultado que leer checkpoint_writes: upsert de canales especiales, insert-once del resto"""
+    rows = {}
+
+    for task_id, task_path, writes in calls:
+        upsert = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if upsert:
+                rows[key] = (task_path, channel, value)
+            else:
+                rows.setdefault(key, (task_path, channel, value))
+
+    ordered = sorted(rows.items(), key=lambda item: writes_sort_key(item[1][0], item[0][0], item[0][1]))
+    return [(task_id, channel, value) for (task_id, _), (_, channel, value) in ordered]
+
+
+class HotCheckpointSaver(BaseCheckpointSaver):
+    """
+    LRU acotado a max_threads. Solo se desalojan threads ya bajados a Postgres;
+    los sucios se bajan primero, así que el límite puede excederse transitoriamente
+    en tantos threads como flushes haya en curso.
+    """
+
+    def __init__(
+        self,
+        durable: BaseCheckpointSaver,
+        max_threads: int = settings.HOT_CHECKPOINT_MAX_THREADS,
+        flush_interval_seconds: int = settings.HOT_CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+        idle_seconds: int = settings.HOT_CHECKPOINT_IDLE_SECONDS,
+        memory_limit_mb: int = MEMORY_LIMITS["app_max_mb"],
+    ):
+        super().__init__(serde=durable.serde)
+        self.durable = durable
+        self.max_threads = max(1, max_threads)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.idle_seconds = idle_seconds
+        self.memory_limit_mb = memory_limit_mb
+
+        self._threads: "OrderedDict[Tuple[str, str], _HotThread]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.buffered_writes = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.evictions = 0
+        self.pressure_events = 0
+        self.last_error = None
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def _to_tuple(self, entry: _HotThread) -> CheckpointTuple:
+        return CheckpointTuple(
+            config=entry.config(entry.checkpoint["id"]),
+            checkpoint=copy_checkpoint(entry.checkpoint),
+            metadata=entry.metadata,
+            parent_config=entry.config(entry.parent_id) if entry.parent_id else None,
+            pending_writes=entry.stored_writes + _pending_writes(entry.write_calls),
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await read_through_turn(config, self._read_tuple)
+
+    async def _read_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        entry = self._threads.get(key)
+
+        if entry and (not checkpoint_id or checkpoint_id == entry.checkpoint["id"]):
+            self._threads.move_to_end(key)
+            entry.touched_at = time.monotonic()
+            self.hits += 1
+            return self._to_tuple(entry)
+
+        self.misses += 1
+        # Un checkpoint anterior al último solo existe en Postgres si llegó a bajarse
+        checkpoint_tuple = await self.durable.aget_tuple(config)
+
+        if checkpoint_tuple and not checkpoint_id and key not in self._threads:
+            parent = checkpoint_tuple.parent_config
+            self._threads[key] = _HotThread(
+                thread_id=key[0],
+                checkpoint_ns=key[1],
+                checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint),
+                metadata=checkpoint_tuple.metadata,
+                parent_id=parent["configurable"].get("checkpoint_id") if parent else None,
+                flushed_id=checkpoint_tuple.checkpoint["id"],
+                stored_writes=list(checkpoint_tuple.pending_writes or []),
+            )
+            self._enforce_bound()
+
+        return checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata, new_versions) -> RunnableConfig:
+        note_checkpoint_put(config)
+        key = self._key(config)
+        parent_id = config["configurable"].get("checkpoint_id")
+        checkpoint = copy_checkpoint(checkpoint)
+        entry = self._threads.get(key)
+
+        if entry is None:
+            # Sin entrada en memoria, el padre ya está en Postgres (solo se desalojan threads bajados)
+            entry = _HotThread(
+                thread_id=key[0],
+                checkpoint_ns=key[1],
+                checkpoint=checkpoint,
+                metadata={},
+                parent_id=parent_id,
+                flushed_id=parent_id,
+            )
+            self._threads[key] = entry
+            transition = False
+        else:
+            previous = entry.checkpoint["channel_values"]
+            current = checkpoint["channel_values"]
+            transition = any(previous.get(channel) != current.get(channel) for channel in _FLUSH_ON_CHANGE)
+
+        entry.checkpoint = checkpoint
+        entry.metadata = get_serializable_checkpoint_metadata(config, metadata)
+        entry.parent_id = parent_id
+        entry.stored_writes = []
+        entry.write_calls = []
+        entry.unflushed_calls = []
+        entry.dirty_keys.update(new_versions)
+        entry.checkpoint_dirty = True
+        entry.mark_dirty()
+
+        self._threads.move_to_end(key)
+        self.puts += 1
+
+        if transition:
+            self._schedule_flush(entry)
+        self._enforce_bound()
+
+        return entry.config(checkpoint["id"])
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        entry = self._threads.get(self._key(config))
+
+        if entry is None or config["configurable"].get("checkpoint_id") != entry.checkpoint["id"]:
+            await self.durable.aput_writes(config, writes, task_id, task_path)
+            return
+
+        call = (task_id, task_path, tuple(writes))
+        entry.write_calls.append(call)
+        entry.unflushed_calls.append(call)
+        entry.mark_dirty()
+        self.buffered_writes += len(call[2])
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs) -> AsyncIterator[CheckpointTuple]:
+        if config and "thread_id" in config.get("configurable", {}):
+            await self.flush_thread(config["configurable"]["thread_id"])
+        else:
+            await self.flush_all()
+
+        async for checkpoint_tuple in self.durable.alist(config, **kwargs):
+            yield checkpoint_tuple
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.discard([thread_id])
+        await self.durable.adelete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.durable.get_next_version(current, channel)
+
+    async def _flush_entry(self, entry: _HotThread):
+        async with entry.lock:
+            entry.flush_scheduled = False
+            if not entry.dirty:
+                return
+
+            checkpoint = entry.checkpoint
+            checkpoint_dirty = entry.checkpoint_dirty
+            keys = entry.dirty_keys
+            calls = entry.unflushed_calls
+            dirty_since = entry.dirty_since
+
+            # aput puede correr mientras se escribe: lo que llegue desde aquí vuelve a marcar la entrada
+            entry.checkpoint_dirty = False
+            entry.dirty_keys = set()
+            entry.unflushed_calls = []
+            entry.dirty_since = None
+
+            stored = not checkpoint_dirty
+            written = 0
+            try:
+                if checkpoint_dirty:
+                    versions = checkpoint["channel_versions"]
+                    await self.durable.aput(
+                        entry.config(entry.flushed_id),
+                        checkpoint,
+                        entry.metadata,
+                        {channel: versions[channel] for channel in keys if channel in versions},
+                    )
+                    entry.flushed_id = checkpoint["id"]
+                    stored = True
+
+                target = entry.config(checkpoint["id"])
+                for task_id, task_path, writes in calls:
+                    await self.durable.aput_writes(target, writes, task_id, task_path)
+                    written += 1
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_error = str(e)
+
+                if not stored:
+                    entry.dirty_keys |= keys
+                    entry.checkpoint_dirty = True
+                if entry.checkpoint is checkpoint:
+                    entry.unflushed_calls = calls[written:] + entry.unflushed_calls
+                if entry.dirty:
+                    entry.dirty_since = min(filter(None, (dirty_since, entry.dirty_since)), default=time.monotonic())
+                raise
+
+            self.flushes += 1
+
+    async def _flush_quietly(self, entry: _HotThread):
+        try:
+            await self._flush_entry(entry)
+        except Exception as e:
+            logger.error(f"Error bajando checkpoint {entry.thread_id}: {e}")
+        self._enforce_bound()
+
+    def _schedule_flush(self, entry: _HotThread):
+        if entry.flush_scheduled:
+            return
+
+        entry.flush_scheduled = True
+        task = asyncio.create_task(self._flush_quietly(entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _enforce_bound(self):
+        excess = len(self._threads) - self.max_threads
+
+        for key, entry in list(self._threads.items()):
+            if excess <= 0:
+                break
+
+            if entry.dirty or entry.lock.locked():
+                self._schedule_flush(entry)
+                continue
+
+            del self._threads[key]
+            self.evictions += 1
+            excess -= 1
+
+    async def flush_thread(self, thread_id: str):
+        for entry in [entry for entry in self._threads.values() if entry.thread_id == str(thread_id)]:
+            await self._flush_entry(entry)
+
+    async def flush_all(self):
+        for entry in list(self._threads.values()):
+            try:
+                await self._flush_entry(entry)
+            except Exception as e:
+                logger.error(f"Error bajando checkpoint {entry.thread_id}: {e}")
+
+    async def discard(self, thread_ids: Iterable[str]):
+        """Saca los threads de memoria sin bajarlos (antes de purgarlos en Postgres)"""
+        thread_ids = {str(thread_id) for thread_id in thread_ids}
+
+        for key, entry in list(self._threads.items()):
+            if entry.thread_id in thread_ids:
+                async with entry.lock:
+                    self._threads.pop(key, None)
+
+    async def run_once(self) -> dict:
+        now = time.monotonic()
+        flushed = evicted = 0
+
+        for key, entry in list(self._threads.items()):
+            if entry.dirty and now - entry.dirty_since >= self.flush_interval_seconds:
+                try:
+                    await self._flush_entry(entry)
+                    flushed += 1
+                except Exception as e:
+                    logger.error(f"Error bajando checkpoint {entry.thread_id}: {e}")
+            elif not entry.dirty and now - entry.touched_at >= self.idle_seconds and not entry.lock.locked():
+                self._threads.pop(key, None)
+                evicted += 1
+
+        rss_mb = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+        if rss_mb > self.memory_limit_mb:
+            self.pressure_events += 1
+            await self.flush_all()
+            for key, entry in list(self._threads.items()):
+                if not entry.dirty and not entry.lock.locked():
+                    self._threads.pop(key, None)
+                    evicted += 1
+
+        self.evictions += evicted
+        return {"flushed": flushed, "evicted": evicted}
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(max(1, self.flush_interval_seconds / 2))
+
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error en flush de checkpoints: {e}")
+
+    @property
+    def _pool(self):
+        return self.durable._pool
+
+    async def aclose(self):
+        await self.flush_all()
+        await self.durable.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **self.durable.stats(),
+            "hot": {
+                "threads": len(self._threads),
+                "dirty_threads": sum(1 for entry in self._threads.values() if entry.dirty),
+                "max_threads": self.max_threads,
+                "hits": self.hits,
+                "misses": self.misses,
+                "puts": self.puts,
+                "buffered_writes": self.buffered_writes,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "evictions": self.evictions,
+                "pressure_events": self.pressure_events,
+                "last_error": self.last_error,
+            },
+        }
@@ -0,0 +1,113 @@
+"""
+app/services/ideal_embeddings.py
+Matriz en memoria de embeddings ideales por posición para el scoring semántico
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import QuestionTemplate
+
+
+@dataclass(frozen=True)
+class PositionIdealMatrix:
+    """Filas float32 normalizadas y contiguas; index mapea question_id -> fila"""
+    index: Dict[str, int]
+    matrix: np.ndarray
+    loaded_at: float
+
+    def get(self, question_id: str) -> Optional[np.ndarray]:
+        row = self.index.get(question_id)
+        return None if row is None else self.matrix[row]
+
+
+class IdealEmbeddingStore:
+
+    def __init__(self, ttl_seconds: int = settings.QUESTION_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._positions: Dict[str, PositionIdealMatrix] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+
+    async def get(self, db: AsyncSession, position_id, question_id: str) -> Optional[np.ndarray]:
+        position_id = str(UUID(str(position_id)))
+        entry = self._positions.get(position_id)
+
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            entry = await self._load(db, position_id)
+        else:
+            self.hits += 1
+
+        return entry.get(question_id)
+
+    async def _load(self, db: AsyncSession, position_id: str) -> PositionIdealMatrix:
+        lock = self._locks.setdefault(position_id, asyncio.Lock())
+
+        async with lock:
+            entry = self._positions.get(position_id)
+            if entry is not None and time.monotonic() - entry.loaded_at <= self.ttl_seconds:
+                return entry
+
+            generation = self._generation
+            result = await db.execute(
+                select(QuestionTemplate.id, QuestionTemplate.ideal_embedding)
+                .where(
+                    QuestionTemplate.position_id == UUID(position_id),
+                    QuestionTemplate.ideal_embedding.isnot(None)
+                )
+            )
+            rows = result.fetchall()
+
+            entry = self._build(rows)
+            self.loads += 1
+
+            # Si hubo una invalidación durante la carga, no se publica el resultado
+            if generation == self._generation:
+                self._positions[position_id] = entry
+
+            return entry
+
+    def _build(self, rows) -> PositionIdealMatrix:
+        if not rows:
+            return PositionIdealMatrix(index={}, matrix=np.empty((0, 0), dtype=np.float32), loaded_at=time.monotonic())
+
+        matrix = np.vstack([np.asarray(embedding, dtype=np.float32) for _, embedding in rows])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        matrix.setflags(write=False)
+
+        return PositionIdealMatrix(
+            index={str(question_id): row for row, (question_id, _) in enumerate(rows)},
+            matrix=matrix,
+            loaded_at=time.monotonic()
+        )
+
+    def invalidate(self, position_id=None):
+        self._generation += 1
+
+        if position_id is None:
+            self._positions.clear()
+        else:
+            self._positions.pop(str(UUID(str(position_id))), None)
+
+    def stats(self) -> dict:
+        return {
+            "positions": len(self._positions),
+            "questions": sum(len(entry.index) for entry in self._positions.values()),
+            "bytes": sum(entry.matrix.nbytes for entry in self._positions.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+        }
+
+
+ideal_embedding_store = IdealEmbeddingStore()
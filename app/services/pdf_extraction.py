@@ -0,0 +1,281 @@
+"""
+app/services/pdf_extraction.py
+Extracción de texto de PDF en procesos aparte (uno por slot): fuera del event loop,
+con tope de caracteres, tope de páginas y un timeout duro por documento.
+El motor (PyPDF2, pdfplumber o solo las primeras páginas) se elige con PDF_EXTRACT_ENGINE
+"""
+import asyncio
+import multiprocessing
+import time
+from abc import ABC, abstractmethod
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import PyPDF2
+
+from app.config import settings
+
+
+def _open_source(pdf_source: Union[bytes, str]):
+    return pdf_source if isinstance(pdf_source, str) else BytesIO(pdf_source)
+
+
+class PdfEngine(ABC):
+    """Motor de extracción: entrega el texto página por página, sin pasar de max_pages (None: todas)"""
+
+    name = ""
+
+    @abstractmethod
+    def pages(self, pdf_source: Union[bytes, str], max_pages: Optional[int]) -> Iterator[str]:
+        ...
+
+
+class PyPdf2Engine(PdfEngine):
+    name = "pypdf2"
+
+    def pages(self, pdf_source: Union[bytes, str], max_pages: Optional[int]) -> Iterator[str]:
+        reader = PyPDF2.PdfReader(_open_source(pdf_source))
+        count = len(reader.pages) if max_pages is None else min(max_pages, len(reader.pages))
+
+        # Las páginas se cargan al pedirlas por índice: las que pasan del tope no se leen
+        for index in range(count):
+            yield reader.pages[index].extract_text() or ""
+
+
+class PdfPlumberEngine(PdfEngine):
+    """Más lento, pero respeta mejor el orden de lectura en CVs a dos columnas"""
+
+    name = "pdfplumber"
+
+    def pages(self, pdf_source: Union[bytes, str], max_pages: Optional[int]) -> Iterator[str]:
+        import pdfplumber
+
+        # pages= evita construir los objetos de página que no se van a leer
+        pages = range(1, max_pages + 1) if max_pages is not None else None
+
+        with pdfplumber.open(_open_source(pdf_source), pages=pages) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+                page.close()
+
+
+class FirstPagesEngine(PyPdf2Engine):
+    """PyPDF2 limitado a las primeras PDF_EXTRACT_FAST_PAGES páginas"""
+
+    name = "fast"
+
+    def __init__(self, fast_pages: int = settings.PDF_EXTRACT_FAST_PAGES):
+        self.fast_pages = max(1, fast_pages)
+
+    def pages(self, pdf_source: Union[bytes, str], max_pages: Optional[int]) -> Iterator[str]:
+        return super().pages(pdf_source, min(max_pages or self.fast_pages, self.fast_pages))
+
+
+PDF_ENGINES: Dict[str, PdfEngine] = {
+    engine.name: engine for engine in (PyPdf2Engine(), PdfPlumberEngine(), FirstPagesEngine())
+}
+
+
+def _extract_text(
+    pdf_source: Union[bytes, str],
+    max_pages: int,
+    max_chars: int,
+    engine: str = PyPdf2Engine.name
+) -> Tuple[str, int, float]:
+    """Corre en el proceso worker: texto, páginas leídas y segundos empleados. max_pages 0: sin tope"""
+    started = time.perf_counter()
+
+    parts = []
+    collected = 0
+    pages = 0
+
+    for page_text in PDF_ENGINES[engine].pages(pdf_source, max_pages or None):
+        parts.append(page_text + "\n")
+        collected += len(page_text) + 1
+        pages += 1
+
+        if collected >= max_chars:
+            break
+
+    return "".join(parts)[:max_chars].strip(), pages, time.perf_counter() - started
+
+
+def _worker_main(conn):
+    """Proceso worker: atiende documentos del pipe hasta que el padre lo cierra"""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+
+        try:
+            conn.send((True, _extract_text(*job)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _PdfWorker:
+    """Un proceso spawn con su pipe: atiende un documento a la vez"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def _exchange(self, job: tuple):
+        # Bloqueante (el PDF puede no caber en el buffer del pipe): corre en un hilo
+        self.conn.send(job)
+        return self.conn.recv()
+
+    async def run(self, job: tuple, timeout_seconds: float):
+        self.tasks += 1
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(None, self._exchange, job), timeout=timeout_seconds)
+
+    def stop(self, kill: bool = False):
+        # Sin kill el worker sale solo al ver el pipe cerrado; con kill, el hilo que
+        # espera la respuesta recibe EOF antes de cerrar nuestro extremo
+        if kill:
+            self.process.terminate()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class PdfExtractor:
+    """
+    Hasta `workers` procesos dedicados (spawn, sin heredar el estado del proceso
+    de la app), cada uno con un documento a la vez y reciclado cada
+    max_tasks_per_child documentos. Si un documento supera el timeout se mata solo
+    su proceso: los demás documentos en curso no se ven afectados.
+    """
+
+    def __init__(
+        self,
+        engine: str = settings.PDF_EXTRACT_ENGINE,
+        workers: int = settings.PDF_EXTRACT_WORKERS,
+        timeout_seconds: float = settings.PDF_EXTRACT_TIMEOUT_SECONDS,
+        max_pages: int = settings.PDF_EXTRACT_MAX_PAGES,
+        max_chars: int = settings.PDF_EXTRACT_MAX_CHARS,
+        max_tasks_per_child: int = settings.PDF_EXTRACT_MAX_TASKS_PER_CHILD,
+    ):
+        if engine not in PDF_ENGINES:
+            raise ValueError(f"PDF_EXTRACT_ENGINE desconocido: {engine} (opciones: {', '.join(PDF_ENGINES)})")
+
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.timeout_seconds = timeout_seconds
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[_PdfWorker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.documents = 0
+        self.pages = 0
+        self.extract_seconds = 0.0
+        self.timeouts = 0
+        self.errors = 0
+        self.worker_restarts = 0
+        self.last_ms_per_page = 0.0
+        self.max_ms_per_page = 0.0
+        self.last_error = None
+
+    def _acquire(self) -> _PdfWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.process.is_alive():
+                return worker
+            worker.stop()
+        return _PdfWorker(self._context)
+
+    def _release(self, worker: _PdfWorker):
+        if worker.tasks >= self.max_tasks_per_child:
+            worker.stop()
+        else:
+            self._idle.append(worker)
+
+    def _kill(self, worker: _PdfWorker):
+        worker.stop(kill=True)
+        self.worker_restarts += 1
+
+    async def extract(self, pdf_source: Union[bytes, str]) -> str:
+        """
+        Texto del PDF (contenido o ruta de un archivo) hasta max_pages/max_chars;
+        "" si no se pudo extraer a tiempo. Con una ruta el PDF no se copia al worker.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        job = (pdf_source, self.max_pages, self.max_chars, self.engine)
+
+        async with self._slots:
+            for attempt in range(2):
+                worker = self._acquire()
+                try:
+                    ok, result = await worker.run(job, self.timeout_seconds)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self.last_error = f"timeout tras {self.timeout_seconds}s"
+                    self._kill(worker)
+                    return ""
+                except (EOFError, OSError) as e:
+                    # El worker murió (p. ej. por memoria): se reintenta una vez con uno nuevo
+                    self.last_error = f"worker terminado: {type(e).__name__}"
+                    self._kill(worker)
+                    if attempt == 0:
+                        continue
+                    self.errors += 1
+                    return ""
+                except BaseException:
+                    # Cancelado a mitad del documento: el worker queda ocupado y no se reutiliza
+                    self._kill(worker)
+                    raise
+
+                self._release(worker)
+
+                if not ok:
+                    self.errors += 1
+                    self.last_error = result
+                    return ""
+
+                text, pages, seconds = result
+                self._record(pages, seconds)
+                return text
+
+        return ""
+
+    def _record(self, pages: int, seconds: float):
+        self.documents += 1
+        self.pages += pages
+        self.extract_seconds += seconds
+
+        if pages:
+            ms_per_page = seconds * 1000 / pages
+            self.last_ms_per_page = round(ms_per_page, 2)
+            self.max_ms_per_page = round(max(self.max_ms_per_page, ms_per_page), 2)
+
+    def close(self):
+        workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> dict:
+        return {
+            "engine": self.engine,
+            "workers": self.workers,
+            "documents": self.documents,
+            "pages": self.pages,
+            "avg_ms_per_page": round(self.extract_seconds * 1000 / self.pages, 2) if self.pages else 0.0,
+            "last_ms_per_page": self.last_ms_per_page,
+            "max_ms_per_page": self.max_ms_per_page,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "worker_restarts": self.worker_restarts,
+            "last_error": self.last_error,
+        }
+
+
+pdf_extractor = PdfExtractor()
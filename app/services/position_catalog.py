@@ -0,0 +1,105 @@
+"""
+app/services/position_catalog.py
+Cache de proceso de las posiciones activas que se ofrecen en el chat
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import JobPosition
+
+
+@dataclass(frozen=True, slots=True)
+class PositionSummary:
+    id: str
+    title: str
+    description: Optional[str]
+    salary: float
+    currency: str
+
+
+@dataclass(frozen=True, slots=True)
+class PositionCatalog:
+    positions: Tuple[PositionSummary, ...]
+    by_id: Dict[str, PositionSummary]
+    loaded_at: float
+
+    def get(self, position_id: str) -> Optional[PositionSummary]:
+        return self.by_id.get(position_id)
+
+
+class PositionCatalogCache:
+
+    def __init__(self, ttl_seconds: int = settings.QUESTION_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._catalog: Optional[PositionCatalog] = None
+        self._lock = asyncio.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+
+    def _is_fresh(self, catalog: Optional[PositionCatalog]) -> bool:
+        return catalog is not None and time.monotonic() - catalog.loaded_at <= self.ttl_seconds
+
+    async def get(self, db: AsyncSession) -> PositionCatalog:
+        catalog = self._catalog
+
+        if self._is_fresh(catalog):
+            self.hits += 1
+            return catalog
+
+        async with self._lock:
+            if self._is_fresh(self._catalog):
+                return self._catalog
+
+            generation = self._generation
+            result = await db.execute(
+                select(
+                    JobPosition.id,
+                    JobPosition.title,
+                    JobPosition.description,
+                    JobPosition.salary,
+                    JobPosition.currency
+                ).where(JobPosition.is_active == True)
+            )
+
+            positions = tuple(
+                PositionSummary(
+                    id=str(row.id),
+                    title=row.title,
+                    description=row.description,
+                    salary=float(row.salary) if row.salary else 0.0,
+                    currency=row.currency
+                )
+                for row in result.fetchall()
+            )
+            catalog = PositionCatalog(
+                positions=positions,
+                by_id={position.id: position for position in positions},
+                loaded_at=time.monotonic()
+            )
+            self.loads += 1
+
+            if generation == self._generation:
+                self._catalog = catalog
+
+            return catalog
+
+    def invalidate(self):
+        self._generation += 1
+        self._catalog = None
+
+    def stats(self) -> dict:
+        return {
+            "positions": len(self._catalog.positions) if self._catalog else 0,
+            "hits": self.hits,
+            "loads": self.loads,
+        }
+
+
+position_catalog = PositionCatalogCache()
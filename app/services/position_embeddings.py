@@ -25,22 +25,7 @@ async def generate_position_embedding(db: AsyncSession, position_id: str) -> boo
         
         embedding = await embedding_service.embed_text(context)
         
-        await db.execute(
-            text("""
-                INSERT INTO conocimiento_rag (tipo, titulo, contenido, embedding, metadata)
-                VALUES ('job_position', :title, :content, :embedding::vector, :metadata::jsonb)
-                ON CONFLICT (id) DO UPDATE SET
-                    contenido = EXCLUDED.contenido,
-                    embedding = EXCLUDED.embedding,
-                    updated_at = CURRENT_TIMESTAMP
-            """),
-            {
-                "title": position.title,
-                "content": context,
-                "embedding": embedding,
-                "metadata": {"position_id": position_id}
-            }
-        )
+        await _upsert_position_embedding(db, position, context, embedding)
         
         return True
         
@@ -49,6 +34,25 @@ async def generate_position_embedding(db: AsyncSession, position_id: str) -> boo
         return False
 
 
+async def _upsert_position_embedding(db: AsyncSession, position: JobPosition, context: str, embedding: List[float]):
+    await db.execute(
+        text("""
+            INSERT INTO conocimiento_rag (tipo, titulo, contenido, embedding, metadata)
+            VALUES ('job_position', :title, :content, :embedding::vector, :metadata::jsonb)
+            ON CONFLICT (id) DO UPDATE SET
+                contenido = EXCLUDED.contenido,
+                embedding = EXCLUDED.embedding,
+                updated_at = CURRENT_TIMESTAMP
+        """),
+        {
+            "title": position.title,
+            "content": context,
+            "embedding": embedding,
+            "metadata": {"position_id": str(position.id)}
+        }
+    )
+
+
 async def delete_position_embedding(db: AsyncSession, position_id: str) -> bool:
     try:
         result = await db.execute(
@@ -73,14 +77,18 @@ async def regenerate_all_position_embeddings(db: AsyncSession) -> Dict[str, Any]
     )
     positions = result.scalars().all()
     
+    contexts = [_build_position_context(position) for position in positions]
+    embeddings = await embedding_service.embed_many(contexts)
+    
     success_count = 0
     failed = []
     
-    for position in positions:
-        success = await generate_position_embedding(db, str(position.id))
-        if success:
+    for position, context, embedding in zip(positions, contexts, embeddings):
+        try:
+            await _upsert_position_embedding(db, position, context, embedding)
             success_count += 1
-        else:
+        except Exception as e:
+            print(f"Error generando embedding: {e}")
             failed.append(str(position.id))
     
     await db.commit()
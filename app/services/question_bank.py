@@ -0,0 +1,170 @@
+"""
+app/services/question_bank.py
+Cache de proceso del banco de preguntas por posición (registros inmutables y versionados)
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import QuestionTemplate
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionRecord:
+    id: str
+    text: str
+    validation_type: str
+    ideal_answer: Optional[str]
+    expected_keywords: Tuple[str, ...]
+    min_similarity: float
+    weight: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "validation_type": self.validation_type,
+            "ideal_answer": self.ideal_answer,
+            "expected_keywords": list(self.expected_keywords),
+            "min_similarity": self.min_similarity,
+            "weight": self.weight
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionBank:
+    """Preguntas activas de una posición; version es un hash del contenido"""
+    position_id: str
+    version: str
+    tests: Tuple[Tuple[QuestionRecord, ...], Tuple[QuestionRecord, ...]]
+    loaded_at: float
+
+    def total(self, test_number: int) -> int:
+        return len(self.tests[test_number - 1]) if test_number in (1, 2) else 0
+
+    def question(self, test_number: int, question_number: int) -> Optional[QuestionRecord]:
+        if test_number not in (1, 2):
+            return None
+
+        questions = self.tests[test_number - 1]
+        index = question_number - 1
+        return questions[index] if 0 <= index < len(questions) else None
+
+    def find(self, question_id: str) -> Optional[QuestionRecord]:
+        for questions in self.tests:
+            for question in questions:
+                if question.id == question_id:
+                    return question
+        return None
+
+
+class QuestionBankCache:
+
+    def __init__(self, ttl_seconds: int = settings.QUESTION_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._banks: Dict[str, QuestionBank] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+
+    def _is_fresh(self, bank: Optional[QuestionBank]) -> bool:
+        return bank is not None and time.monotonic() - bank.loaded_at <= self.ttl_seconds
+
+    async def get(self, db: AsyncSession, position_id) -> QuestionBank:
+        position_id = str(UUID(str(position_id)))
+        bank = self._banks.get(position_id)
+
+        if self._is_fresh(bank):
+            self.hits += 1
+            return bank
+
+        return await self._load(db, position_id)
+
+    async def _load(self, db: AsyncSession, position_id: str) -> QuestionBank:
+        lock = self._locks.setdefault(position_id, asyncio.Lock())
+
+        async with lock:
+            bank = self._banks.get(position_id)
+            if self._is_fresh(bank):
+                return bank
+
+            generation = self._generation
+            result = await db.execute(
+                select(
+                    QuestionTemplate.id,
+                    QuestionTemplate.test_number,
+                    QuestionTemplate.question_text,
+                    QuestionTemplate.validation_type,
+                    QuestionTemplate.ideal_answer,
+                    QuestionTemplate.expected_keywords,
+                    QuestionTemplate.min_similarity,
+                    QuestionTemplate.weight
+                )
+                .where(
+                    QuestionTemplate.position_id == UUID(position_id),
+                    QuestionTemplate.is_active == True
+                )
+                .order_by(QuestionTemplate.test_number, QuestionTemplate.question_order)
+            )
+
+            bank = self._build(position_id, result.fetchall())
+            self.loads += 1
+
+            if generation == self._generation:
+                self._banks[position_id] = bank
+
+            return bank
+
+    def _build(self, position_id: str, rows) -> QuestionBank:
+        tests = ([], [])
+        digest = hashlib.blake2b(digest_size=8)
+
+        for row in rows:
+            if row.test_number not in (1, 2):
+                continue
+
+            record = QuestionRecord(
+                id=str(row.id),
+                text=row.question_text,
+                validation_type=row.validation_type,
+                ideal_answer=row.ideal_answer,
+                expected_keywords=tuple(row.expected_keywords or ()),
+                min_similarity=float(row.min_similarity) if row.min_similarity is not None else 0.65,
+                weight=float(row.weight) if row.weight is not None else 1.0
+            )
+            tests[row.test_number - 1].append(record)
+            digest.update(repr((row.test_number,) + tuple(record.as_dict().values())).encode("utf-8"))
+
+        return QuestionBank(
+            position_id=position_id,
+            version=digest.hexdigest(),
+            tests=(tuple(tests[0]), tuple(tests[1])),
+            loaded_at=time.monotonic()
+        )
+
+    def invalidate(self, position_id=None):
+        self._generation += 1
+
+        if position_id is None:
+            self._banks.clear()
+        else:
+            self._banks.pop(str(UUID(str(position_id))), None)
+
+    def stats(self) -> dict:
+        return {
+            "positions": len(self._banks),
+            "questions": sum(bank.total(1) + bank.total(2) for bank in self._banks.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+        }
+
+
+question_bank_cache = QuestionBankCache()
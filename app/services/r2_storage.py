@@ -5,6 +5,7 @@ import boto3
 from app.config import settings
 from datetime import datetime, timezone
 import os
+from typing import BinaryIO, Union
 
 
 def get_r2_client():
@@ -18,7 +19,7 @@ def get_r2_client():
 
 
 async def upload_to_r2(
-    file_content: bytes,
+    file_content: Union[bytes, BinaryIO],
     prospect_id: str,
     filename: str
 ) -> str:
@@ -3,14 +3,49 @@ app/tools/cv_parser.py - PostgreSQL Checkpointer para LangGraph
 """
 from openai import AsyncOpenAI
 from app.config import settings
+from app.services.pdf_extraction import pdf_extractor
+from app.services.cv_parse_cache import cv_parse_cache
+import hashlib
 import json
-import PyPDF2
-from io import BytesIO
-from typing import Dict, Any
+from typing import Dict, Any, Union
 
+CV_PARSER_MODEL = "gpt-4o-mini"
+CV_PARSER_SYSTEM_PROMPT = "Eres un extractor de datos de CV. Responde SOLO JSON válido."
+CV_PARSER_MAX_TOKENS = 500
 
-async def parse_cv_with_llm(pdf_content: bytes) -> Dict[str, Any]:
-    text = extract_text_from_pdf(pdf_content)
+
+def compute_parser_version() -> str:
+    """Cambia con el prompt, el modelo, el motor o los topes de extracción: invalida la cache"""
+    fingerprint = json.dumps([
+        CV_PARSER_MODEL,
+        CV_PARSER_SYSTEM_PROMPT,
+        CV_PARSER_MAX_TOKENS,
+        build_extraction_prompt(""),
+        settings.PDF_EXTRACT_ENGINE,
+        settings.PDF_EXTRACT_FAST_PAGES,
+        settings.PDF_EXTRACT_MAX_PAGES,
+        settings.PDF_EXTRACT_MAX_CHARS,
+    ])
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+async def parse_cv(pdf_source: Union[bytes, str], checksum: str) -> Dict[str, Any]:
+    """CV parseado desde cache si ya se vio este PDF con la misma versión del parser"""
+    cached = await cv_parse_cache.get(checksum, CV_PARSER_VERSION)
+    if cached is not None:
+        return cached
+
+    parsed_data = await parse_cv_with_llm(pdf_source)
+
+    # Los fallos (sin texto, error del LLM) no se guardan: pueden ser transitorios
+    if "error" not in parsed_data:
+        await cv_parse_cache.put(checksum, CV_PARSER_VERSION, parsed_data)
+
+    return parsed_data
+
+
+async def parse_cv_with_llm(pdf_source: Union[bytes, str]) -> Dict[str, Any]:
+    text = await pdf_extractor.extract(pdf_source)
     
     if not text or len(text.strip()) < 50:
         return create_empty_cv_data("No se pudo extraer texto del PDF")
@@ -21,13 +56,13 @@ async def parse_cv_with_llm(pdf_content: bytes) -> Dict[str, Any]:
     
     try:
         response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=CV_PARSER_MODEL,
             messages=[
-                {"role": "system", "content": "Eres un extractor de datos de CV. Responde SOLO JSON válido."},
+                {"role": "system", "content": CV_PARSER_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,
-            max_tokens=500
+            max_tokens=CV_PARSER_MAX_TOKENS
         )
         
         parsed_data = clean_and_parse_response(response.choices[0].message.content)
@@ -37,21 +72,6 @@ async def parse_cv_with_llm(pdf_content: bytes) -> Dict[str, Any]:
         return create_empty_cv_data(str(e))
 
 
-def extract_text_from_pdf(pdf_content: bytes) -> str:
-    try:
-        pdf_file = BytesIO(pdf_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        
-        return text.strip()
-        
-    except Exception:
-        return ""
-
-
 def build_extraction_prompt(text: str) -> str:
     return f"""Extrae la siguiente información del CV en formato JSON:
 
@@ -80,7 +100,7 @@ REGLAS:
 - Responde SOLO JSON válido, sin markdown
 
 CV:
-{text[:8000]}"""
+{text[:settings.PDF_EXTRACT_MAX_CHARS]}"""
 
 
 def clean_and_parse_response(raw_response: str) -> Dict[str, Any]:
@@ -118,4 +138,7 @@ def create_empty_cv_data(error_message: str) -> Dict[str, Any]:
         "languages": [],
         "certifications": [],
         "error": error_message
-    }
\ No newline at end of file
+    }
+
+
+CV_PARSER_VERSION = compute_parser_version()
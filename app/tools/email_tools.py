@@ -2,63 +2,62 @@
 app/tools/email_tools.py
 Envío de emails con templates mejorados
 """
-from app.services.email_service import EmailService
-from app.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
 
-email_service = EmailService()
+from app.services.email_outbox import email_outbox
+from app.config import settings
 
 
-async def send_evaluation_result_email(
+def queue_evaluation_emails(
+    db: AsyncSession,
+    evaluation_id: str,
     prospect_email: str,
     prospect_name: str,
+    position_id: str,
+    position_title: str,
     total_score: float,
     test_1_score: float,
     test_2_score: float,
     passed: bool
-) -> bool:
-    try:
-        if passed:
-            subject, body = build_approval_email(
-                prospect_name, total_score, test_1_score, test_2_score
-            )
-        else:
-            subject, body = build_rejection_email(
-                prospect_name, total_score, test_1_score, test_2_score
-            )
-        
-        return await email_service._enviar_email(
-            destinatario=prospect_email,
-            subject=subject,
-            body=body
+):
+    """Deja en el outbox (transacción de db) el resultado y, si aprobó, el aviso a RRHH"""
+    if passed:
+        subject, body = build_approval_email(
+            prospect_name, total_score, test_1_score, test_2_score
+        )
+    else:
+        subject, body = build_rejection_email(
+            prospect_name, total_score, test_1_score, test_2_score
         )
-        
-    except Exception:
-        return False
 
+    email_outbox.enqueue(db, evaluation_id, "evaluation_result", prospect_email, subject, body)
 
-async def send_hr_notification(
-    evaluation_id: str,
-    prospect_name: str,
-    position_title: str,
-    total_score: float,
-    test_1_score: float,
-    test_2_score: float
-) -> bool:
-    try:
-        subject = f"Nuevo Prospecto Aprobado: {prospect_name} - {position_title}"
-        body = build_hr_notification_body(
+    if not passed:
+        return
+
+    immediate = (
+        settings.HR_NOTIFICATION_MODE == "immediate"
+        or position_id in settings.HR_IMMEDIATE_POSITION_IDS
+    )
+    email_outbox.enqueue(
+        db,
+        evaluation_id,
+        "hr_notification" if immediate else "hr_digest_item",
+        settings.EMAIL_VENTAS,
+        f"Nuevo Prospecto Aprobado: {prospect_name} - {position_title}",
+        build_hr_notification_body(
             evaluation_id, prospect_name, position_title,
             total_score, test_1_score, test_2_score
-        )
-        
-        return await email_service._enviar_email(
-            destinatario=settings.EMAIL_VENTAS,
-            subject=subject,
-            body=body
-        )
-        
-    except Exception:
-        return False
+        ),
+        payload=None if immediate else {
+            "evaluation_id": evaluation_id,
+            "prospect_name": prospect_name,
+            "position_title": position_title,
+            "total_score": total_score,
+            "test_1_score": test_1_score,
+            "test_2_score": test_2_score,
+        }
+    )
 
 
 def build_approval_email(
@@ -244,4 +243,50 @@ def build_hr_notification_body(
         </div>
     </body>
     </html>
-    """
\ No newline at end of file
+    """
+
+
+def build_hr_digest_email(items: list[dict]) -> tuple[str, str]:
+    """Un correo con una fila por candidato aprobado (mismos datos que build_hr_notification_body)"""
+    subject = f"Prospectos Aprobados: {len(items)} nuevos - {settings.NOMBRE_EMPRESA}"
+
+    rows = "".join(
+        f"""
+                <tr>
+                    <td style="padding: 8px; border: 1px solid #ddd;">{item["prospect_name"]}</td>
+                    <td style="padding: 8px; border: 1px solid #ddd;">{item["position_title"]}</td>
+                    <td style="padding: 8px; border: 1px solid #ddd; text-align: right;">{item["test_1_score"]:.2f}</td>
+                    <td style="padding: 8px; border: 1px solid #ddd; text-align: right;">{item["test_2_score"]:.2f}</td>
+                    <td style="padding: 8px; border: 1px solid #ddd; text-align: right;"><strong>{item["total_score"]:.2f}</strong></td>
+                    <td style="padding: 8px; border: 1px solid #ddd; font-size: 11px; color: #666;">{item["evaluation_id"]}</td>
+                </tr>"""
+        for item in items
+    )
+
+    body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
+        <div style="background: #28a745; color: white; padding: 20px; text-align: center;">
+            <h1>PROSPECTOS APROBADOS</h1>
+            <p style="font-size: 16px;">{len(items)} candidatos aprobaron la evaluación</p>
+        </div>
+        
+        <div style="background: white; padding: 20px; border: 1px solid #ddd;">
+            <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
+                <tr style="background: #f8f9fa;">
+                    <th style="padding: 8px; border: 1px solid #ddd; text-align: left;">Prospecto</th>
+                    <th style="padding: 8px; border: 1px solid #ddd; text-align: left;">Posición</th>
+                    <th style="padding: 8px; border: 1px solid #ddd;">Test 1</th>
+                    <th style="padding: 8px; border: 1px solid #ddd;">Test 2</th>
+                    <th style="padding: 8px; border: 1px solid #ddd;">Total</th>
+                    <th style="padding: 8px; border: 1px solid #ddd; text-align: left;">ID Evaluación</th>
+                </tr>{rows}
+            </table>
+            
+            <p style="margin-top: 20px;">Ingresa al panel de RRHH para revisar CV y respuestas, y aprobar para entrevista o rechazar.</p>
+        </div>
+    </body>
+    </html>
+    """
+
+    return subject, body
@@ -14,7 +14,7 @@ async def retrieve_evaluation_context(
     prospect_cv: Optional[Dict[str, Any]] = None,
     limit: int = 3
 ) -> str:
-    query_embedding = embedding_service.encode_single(question_text)
+    query_embedding = await embedding_service.embed_text(question_text)
     context_parts = []
     
     if prospect_cv:
@@ -0,0 +1,151 @@
+"""
+Benchmark: latencia de guardar una respuesta de evaluación.
+
+Compara el camino anterior (ORM add + flush + commit y luego UPDATE del progreso
+con su propio commit) contra write_answers (una sentencia CTE en autocommit que
+reemplaza la respuesta, avanza el progreso y devuelve la nueva posición).
+Ambos usan una sesión por conexión como el WebSocket, sobre un pool igual al de
+la app (1 + 1 overflow, pre-ping).
+
+Necesita el esquema de la app en DATABASE_URL; crea y borra sus propios datos.
+Con --rtt-ms se interpone un proxy TCP local que agrega esa latencia de red.
+
+Uso: python scripts/bench_answer_ingest.py --answers 50 --rtt-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from uuid import UUID
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.models import Evaluation, EvaluationAnswer  # noqa: E402
+from app.services.answer_writer import AnswerWrite, write_answers  # noqa: E402
+from app.services.database import AsyncSessionLocal  # noqa: E402
+from bench_checkpoint_durability import create_fixtures, drop_fixtures  # noqa: E402
+from bench_checkpointer import percentile, start_latency_proxy  # noqa: E402
+
+
+async def legacy_ingest(db: AsyncSession, write: AnswerWrite):
+    db.add(EvaluationAnswer(
+        evaluation_id=UUID(write.evaluation_id),
+        question_id=UUID(write.question_id),
+        answer_text=write.answer_text,
+        answer_embedding=None,
+        score=write.score,
+        similarity_score=write.similarity_score,
+        matched_keywords=write.matched_keywords,
+        feedback_points=write.feedback
+    ))
+    await db.flush()
+    await db.commit()
+
+    await db.execute(
+        text("UPDATE evaluations SET current_question = current_question + 1 WHERE id = :eval_id"),
+        {"eval_id": write.evaluation_id}
+    )
+    await db.commit()
+
+
+async def cte_ingest(db: AsyncSession, write: AnswerWrite):
+    await write_answers(db, [write])
+
+
+async def create_evaluation(position_id: str, prospect_id: str) -> tuple:
+    async with AsyncSessionLocal() as db:
+        evaluation = Evaluation(
+            prospect_id=UUID(prospect_id),
+            position_id=UUID(position_id),
+            session_token=f"bench-ingest-{uuid.uuid4().hex[:8]}",
+            status="in_progress",
+            current_test=1,
+            current_question=1
+        )
+        db.add(evaluation)
+        await db.commit()
+
+        result = await db.execute(
+            text("SELECT id FROM question_templates WHERE position_id = :position_id ORDER BY test_number, question_order"),
+            {"position_id": position_id}
+        )
+        return str(evaluation.id), [str(row.id) for row in result.fetchall()]
+
+
+async def run_path(name: str, ingest, sessionmaker, evaluation_id: str, question_ids: list, answers: int) -> dict:
+    samples = []
+
+    async with sessionmaker() as db:
+        for idx in range(answers):
+            write = AnswerWrite(
+                evaluation_id=evaluation_id,
+                question_id=question_ids[idx % len(question_ids)],
+                answer_text="Si, manejo excel y reportes de ventas",
+                score=80.0,
+                similarity_score=None,
+                matched_keywords=["excel", "reportes", "ventas"],
+                feedback={"total": 5, "matched": 3},
+                semantic=False,
+                current_test=1,
+                current_question=idx % len(question_ids) + 1,
+            )
+            started = time.perf_counter()
+            await ingest(db, write)
+            samples.append((time.perf_counter() - started) * 1000)
+
+    # La primera respuesta prepara las sentencias y abre la conexión
+    samples = samples[1:]
+    return {
+        "path": name,
+        "p50": statistics.median(samples),
+        "p99": percentile(samples, 0.99),
+        "mean": statistics.mean(samples),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--answers", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    database_url = settings.DATABASE_URL
+    if args.rtt_ms > 0:
+        proxied = start_latency_proxy(database_url.replace("postgresql+asyncpg://", "postgresql://"), args.rtt_ms)
+        database_url = proxied.replace("postgresql://", "postgresql+asyncpg://")
+
+    engine = create_async_engine(database_url, pool_pre_ping=True, pool_size=1, max_overflow=1)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+    run_id = uuid.uuid4().hex[:8]
+    position_id, prospect_ids = await create_fixtures(2, f"ingest-{run_id}")
+
+    print(f"Respuestas por camino: {args.answers} | RTT agregado: {args.rtt_ms:.1f} ms")
+    print(f"{'camino':<8} {'p50 ms':>8} {'p99 ms':>8} {'media ms':>9} {'RTT/resp':>9}")
+
+    try:
+        paths = (("orm", legacy_ingest), ("cte", cte_ingest))
+        for (name, ingest), prospect_id in zip(paths, prospect_ids):
+            evaluation_id, question_ids = await create_evaluation(position_id, prospect_id)
+            result = await run_path(name, ingest, sessionmaker, evaluation_id, question_ids, args.answers)
+            round_trips = f"{result['p50'] / args.rtt_ms:>9.1f}" if args.rtt_ms > 0 else f"{'-':>9}"
+            print(
+                f"{result['path']:<8} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+                f"{result['mean']:>9.1f} {round_trips}"
+            )
+    finally:
+        await drop_fixtures(position_id, prospect_ids)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
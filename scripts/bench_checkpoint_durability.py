@@ -0,0 +1,177 @@
+"""
+Benchmark: escrituras de checkpoint por respuesta según el modo de durabilidad.
+
+Corre sesiones de evaluación reales (EvaluationAgent + AsyncPostgresSaver) y mide,
+por cada turno de respuesta (router -> score_answer -> fetch_current_question ->
+send_question), los checkpoints y filas de checkpoint_writes que llegan a Postgres
+y la latencia del turno con durability "sync", "async" y "exit".
+Con --hot el saver va detrás de la capa en memoria (HotCheckpointSaver).
+
+Necesita el esquema de la app en DATABASE_URL. Crea su propia posición, preguntas
+(keyword/boolean, sin llamadas a OpenAI) y prospectos, y los borra al terminar.
+
+Uso: python scripts/bench_checkpoint_durability.py --sessions 5 --answers 7
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.agents.graph_system import DURABILITY_MODES, EvaluationAgent  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.models import JobPosition, Prospect, QuestionTemplate  # noqa: E402
+from app.services.checkpointer import create_checkpointer  # noqa: E402
+from app.services.database import AsyncSessionLocal  # noqa: E402
+from app.services.hot_checkpointer import HotCheckpointSaver  # noqa: E402
+
+QUESTIONS_PER_TEST = 4
+ANSWER = "Si, manejo excel, atiendo clientes y preparo reportes para el equipo de ventas"
+
+
+async def create_fixtures(sessions: int, run_id: str) -> tuple:
+    async with AsyncSessionLocal() as db:
+        position = JobPosition(title=f"Bench durabilidad {run_id}", description="Benchmark", salary=1000, currency="PEN")
+        db.add(position)
+        await db.flush()
+
+        for test in (1, 2):
+            for order in range(1, QUESTIONS_PER_TEST + 1):
+                db.add(QuestionTemplate(
+                    position_id=position.id,
+                    question_text=f"Pregunta {test}-{order}: describe tu experiencia " + "contexto " * 20,
+                    question_type="role_specific" if test == 1 else "transversal",
+                    test_number=test,
+                    question_order=order,
+                    validation_type="boolean" if order % 2 == 0 else "keyword",
+                    expected_keywords=["excel", "clientes", "reportes", "equipo", "ventas"],
+                ))
+
+        prospects = [
+            Prospect(first_name="Bench", last_name=str(idx), email=f"bench-{run_id}-{idx}@example.com")
+            for idx in range(sessions)
+        ]
+        db.add_all(prospects)
+        await db.commit()
+
+        return str(position.id), [str(prospect.id) for prospect in prospects]
+
+
+async def drop_fixtures(position_id: str, prospect_ids: list):
+    async with AsyncSessionLocal() as db:
+        params = {"position_id": position_id, "prospect_ids": prospect_ids}
+        await db.execute(text(
+            "DELETE FROM evaluation_answers WHERE evaluation_id IN "
+            "(SELECT id FROM evaluations WHERE position_id = :position_id)"
+        ), params)
+        await db.execute(text("DELETE FROM evaluations WHERE position_id = :position_id"), params)
+        await db.execute(text("DELETE FROM prospects WHERE id = ANY(CAST(:prospect_ids AS uuid[]))"), params)
+        await db.execute(text("DELETE FROM job_positions WHERE id = :position_id"), params)
+        await db.commit()
+
+
+async def run_session(agent, durable, session_token: str, position_id: str, prospect_id: str, answers: int, samples: dict):
+    async with AsyncSessionLocal() as db:
+        await agent.process_message(db=db, session_token=session_token, initial_state={
+            "workflow_stage": "data_confirmed",
+            "data_confirmed": True,
+            "cv_uploaded": True,
+            "position_id": position_id,
+            "prospect_id": prospect_id,
+            "prospect_name": "Bench",
+            "prospect_email": "bench@example.com",
+        })
+        result = await agent.process_message(db=db, session_token=session_token, message="Listo")
+        if result["workflow_stage"] != "in_progress":
+            raise RuntimeError(f"La sesión no inició la evaluación: {result['response']}")
+
+        for _ in range(answers):
+            checkpoints, writes = durable.checkpoints_written, durable.writes_written
+            started = time.perf_counter()
+            await agent.process_message(db=db, session_token=session_token, message=ANSWER)
+            samples["latency"].append((time.perf_counter() - started) * 1000)
+            samples["checkpoints"].append(durable.checkpoints_written - checkpoints)
+            samples["writes"].append(durable.writes_written - writes)
+
+
+async def run_mode(durability: str, durable, hot: bool, sessions: int, answers: int, run_id: str) -> dict:
+    position_id, prospect_ids = await create_fixtures(sessions, f"{run_id}-{durability}")
+    checkpointer = HotCheckpointSaver(durable) if hot else durable
+    agent = EvaluationAgent(settings.OPENAI_API_KEY, checkpointer, durability=durability)
+    threads = [f"bench-durability-{run_id}-{durability}-{idx}" for idx in range(sessions)]
+    samples = {"latency": [], "checkpoints": [], "writes": []}
+
+    try:
+        # Secuencial: con sesiones concurrentes los contadores del saver se mezclarían entre turnos
+        for thread, prospect_id in zip(threads, prospect_ids):
+            await run_session(agent, durable, thread, position_id, prospect_id, answers, samples)
+
+        if hot:
+            checkpoints, writes = durable.checkpoints_written, durable.writes_written
+            await checkpointer.flush_all()
+            # Lo que la capa en memoria baja al final se reparte entre los turnos medidos
+            turns = len(samples["latency"])
+            samples["checkpoints"].append(durable.checkpoints_written - checkpoints)
+            samples["writes"].append(durable.writes_written - writes)
+            samples["checkpoints"] = [sum(samples["checkpoints"]) / turns]
+            samples["writes"] = [sum(samples["writes"]) / turns]
+    finally:
+        for thread in threads:
+            await durable.adelete_thread(thread)
+        await drop_fixtures(position_id, prospect_ids)
+
+    return {
+        "durability": durability,
+        "checkpoints_per_turn": statistics.mean(samples["checkpoints"]),
+        "writes_per_turn": statistics.mean(samples["writes"]),
+        "latency_p50": statistics.median(samples["latency"]),
+        "latency_max": max(samples["latency"]),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"),
+        help="URL psycopg del checkpointer (las tablas de la app usan DATABASE_URL)",
+    )
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--answers", type=int, default=2 * QUESTIONS_PER_TEST - 1)
+    parser.add_argument("--modes", default=",".join(DURABILITY_MODES))
+    parser.add_argument("--hot", action="store_true")
+    args = parser.parse_args()
+
+    # La última respuesta cerraría la evaluación (correo y cálculo final), fuera de lo que se mide
+    answers = min(args.answers, 2 * QUESTIONS_PER_TEST - 1)
+    run_id = uuid.uuid4().hex[:8]
+    durable = await create_checkpointer(args.database_url)
+
+    print(
+        f"Sesiones: {args.sessions} | Respuestas por sesión: {answers} "
+        f"| Capa en memoria: {'sí' if args.hot else 'no'}"
+    )
+    print(f"{'durability':<11} {'ckpt/turno':>11} {'writes/turno':>13} {'p50 ms':>8} {'max ms':>8}")
+
+    try:
+        for durability in args.modes.split(","):
+            result = await run_mode(durability, durable, args.hot, args.sessions, answers, run_id)
+            print(
+                f"{result['durability']:<11} {result['checkpoints_per_turn']:>11.2f} "
+                f"{result['writes_per_turn']:>13.2f} {result['latency_p50']:>8.1f} "
+                f"{result['latency_max']:>8.1f}"
+            )
+    finally:
+        await durable.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
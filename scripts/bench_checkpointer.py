@@ -0,0 +1,291 @@
+"""
+Benchmark: latencia y throughput de put/get del checkpointer.
+
+Compara el wrapper anterior (PostgresSaver sync + ThreadPoolExecutor de 2 hilos)
+contra el AsyncPostgresSaver nativo (AsyncConnectionPool + pipeline) con 1, 10
+y 50 sesiones concurrentes. Cada turno hace aget_tuple + aput + aput_writes
+con un estado del tamaño de una sesión de evaluación real.
+
+Necesita un Postgres accesible; los threads creados se borran al terminar.
+Con --rtt-ms se interpone un proxy TCP local que agrega esa latencia de red
+(contra un Postgres en localhost el RTT es ~0 y solo se mide CPU de Python).
+
+Uso: python scripts/bench_checkpointer.py --database-url postgresql://... --turns 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.base import BaseCheckpointSaver, empty_checkpoint  # noqa: E402
+from langgraph.checkpoint.base.id import uuid6  # noqa: E402
+from langgraph.checkpoint.postgres import PostgresSaver  # noqa: E402
+from psycopg_pool import ConnectionPool  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.checkpointer import _CONNECTION_KWARGS, create_checkpointer  # noqa: E402
+
+
+class ThreadedPostgresSaver(BaseCheckpointSaver):
+    """Wrapper anterior: PostgresSaver sync detrás de un ThreadPoolExecutor de 2 hilos"""
+
+    def __init__(self, saver: PostgresSaver):
+        self._saver = saver
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    async def aget_tuple(self, config: dict) -> Optional[Any]:
+        """Método async para get_tuple"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self._saver.get_tuple, config)
+
+    async def aput(
+        self, config: dict, checkpoint: dict, metadata: dict, new_versions: dict
+    ) -> dict:
+        """Método async para put"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, self._saver.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config: dict, writes: list, task_id: str) -> None:
+        """Método async para put_writes"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, self._saver.put_writes, config, writes, task_id
+        )
+
+    def get_tuple(self, config: dict) -> Optional[Any]:
+        """Método sync para get_tuple"""
+        return self._saver.get_tuple(config)
+
+    def put(
+        self, config: dict, checkpoint: dict, metadata: dict, new_versions: dict
+    ) -> dict:
+        """Método sync para put"""
+        return self._saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: dict, writes: list, task_id: str) -> None:
+        """Método sync para put_writes"""
+        return self._saver.put_writes(config, writes, task_id)
+
+    async def alist(self, config: dict, **kwargs) -> AsyncIterator:
+        """Método async para list"""
+
+        def _list():
+            return list(self._saver.list(config, **kwargs))
+
+        loop = asyncio.get_event_loop()
+        items = await loop.run_in_executor(self._executor, _list)
+
+        for item in items:
+            yield item
+
+    def list(self, config: dict, **kwargs) -> Iterator:
+        """Método sync para list"""
+        return self._saver.list(config, **kwargs)
+
+    @property
+    def _pool(self):
+        """Acceso al pool del saver original"""
+        return self._saver.conn
+
+
+def create_threaded_checkpointer(connection_url: str) -> ThreadedPostgresSaver:
+    """Checkpointer anterior (sync + hilos), solo para comparar"""
+    pool = ConnectionPool(
+        conninfo=connection_url,
+        min_size=1,
+        max_size=3,
+        timeout=20.0,
+        max_lifetime=300,
+        max_idle=60,
+        kwargs=_CONNECTION_KWARGS,
+    )
+
+    saver = PostgresSaver(pool)
+    return ThreadedPostgresSaver(saver)
+
+
+def build_checkpoint(thread_id: str, turn: int, previous: dict | None) -> tuple:
+    checkpoint = empty_checkpoint()
+    checkpoint["v"] = 4  # formato que escribe el grafo compilado
+    checkpoint["id"] = str(uuid6())
+    checkpoint["channel_values"] = {
+        "messages": [
+            HumanMessage(content=f"Respuesta {turn} " + "x" * 200),
+            AIMessage(content=f"Pregunta {turn + 1}: " + "y" * 300),
+        ],
+        "session_token": thread_id,
+        "workflow_stage": "in_evaluation",
+        "current_test": 1,
+        "current_question": turn,
+        "current_question_data": {"id": str(uuid.uuid4()), "text": "z" * 250},
+    }
+    version = turn + 1
+    checkpoint["channel_versions"] = {key: version for key in checkpoint["channel_values"]}
+    new_versions = dict(checkpoint["channel_versions"])
+
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    if previous:
+        config["configurable"]["checkpoint_id"] = previous["id"]
+
+    return config, checkpoint, new_versions
+
+
+async def run_session(saver, thread_id: str, turns: int, samples: dict):
+    previous = None
+
+    for turn in range(turns):
+        read_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        started = time.perf_counter()
+        await saver.aget_tuple(read_config)
+        samples["get"].append((time.perf_counter() - started) * 1000)
+
+        config, checkpoint, new_versions = build_checkpoint(thread_id, turn, previous)
+        started = time.perf_counter()
+        saved_config = await saver.aput(
+            config, checkpoint, {"source": "loop", "step": turn}, new_versions
+        )
+        await saver.aput_writes(
+            saved_config,
+            [("current_question", turn + 1), ("workflow_stage", "in_evaluation")],
+            str(uuid.uuid4()),
+        )
+        samples["put"].append((time.perf_counter() - started) * 1000)
+        previous = checkpoint
+
+
+async def _pipe(reader, writer, delay_s: float):
+    loop = asyncio.get_running_loop()
+    try:
+        while data := await reader.read(65536):
+            # Cada chunk se entrega delay_s después de leído, sin frenar los siguientes
+            loop.call_later(delay_s, writer.write, data)
+    finally:
+        loop.call_later(delay_s, writer.close)
+
+
+def start_latency_proxy(database_url: str, rtt_ms: float) -> str:
+    """Proxy TCP en un hilo propio con rtt_ms/2 de demora por sentido; devuelve la URL a usar"""
+    parts = urlsplit(database_url)
+    target_host, target_port = parts.hostname, parts.port or 5432
+    delay_s = rtt_ms / 2000
+    ready = threading.Event()
+    bound = {}
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(
+            _pipe(client_reader, server_writer, delay_s),
+            _pipe(server_reader, client_writer, delay_s),
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        bound["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait()
+
+    netloc = parts.netloc.rsplit("@", 1)
+    auth = f"{netloc[0]}@" if len(netloc) == 2 else ""
+    return urlunsplit(parts._replace(netloc=f"{auth}127.0.0.1:{bound['port']}"))
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_level(name: str, saver, sessions: int, turns: int, run_id: str) -> dict:
+    samples = {"get": [], "put": []}
+    threads = [f"bench-{run_id}-{name}-{sessions}-{idx}" for idx in range(sessions)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(saver, thread, turns, samples) for thread in threads))
+    wall_s = time.perf_counter() - started
+
+    for thread in threads:
+        await cleanup_thread(saver, thread)
+
+    return {
+        "saver": name,
+        "sessions": sessions,
+        "get_p50": statistics.median(samples["get"]),
+        "get_p99": percentile(samples["get"], 0.99),
+        "put_p50": statistics.median(samples["put"]),
+        "put_p99": percentile(samples["put"], 0.99),
+        "turns_per_s": (sessions * turns) / wall_s,
+    }
+
+
+async def cleanup_thread(saver, thread_id: str):
+    if isinstance(saver, ThreadedPostgresSaver):
+        await asyncio.get_running_loop().run_in_executor(
+            None, saver._saver.delete_thread, thread_id
+        )
+    else:
+        await saver.adelete_thread(thread_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"),
+    )
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--levels", default="1,10,50")
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if args.rtt_ms > 0:
+        database_url = start_latency_proxy(database_url, args.rtt_ms)
+
+    levels = [int(level) for level in args.levels.split(",")]
+    run_id = uuid.uuid4().hex[:8]
+
+    native = await create_checkpointer(database_url)
+    threaded = create_threaded_checkpointer(database_url)
+
+    print(
+        f"Turnos por sesión: {args.turns} | Pool: {settings.CHECKPOINT_POOL_MAX_SIZE} conexiones "
+        f"| RTT agregado: {args.rtt_ms:.1f} ms"
+    )
+    print(
+        f"{'saver':<10} {'sesiones':>9} {'get p50':>9} {'get p99':>9} "
+        f"{'put p50':>9} {'put p99':>9} {'turnos/s':>9}"
+    )
+
+    try:
+        for sessions in levels:
+            for name, saver in (("threaded", threaded), ("native", native)):
+                result = await run_level(name, saver, sessions, args.turns, run_id)
+                print(
+                    f"{result['saver']:<10} {result['sessions']:>9} "
+                    f"{result['get_p50']:>9.1f} {result['get_p99']:>9.1f} "
+                    f"{result['put_p50']:>9.1f} {result['put_p99']:>9.1f} "
+                    f"{result['turns_per_s']:>9.1f}"
+                )
+    finally:
+        await native.aclose()
+        threaded._pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
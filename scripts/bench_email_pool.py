@@ -0,0 +1,162 @@
+"""
+Benchmark: emails por segundo de EmailService con y sin pool de conexiones SMTP.
+
+Levanta un servidor SMTP local (aiosmtpd) que descarta los mensajes y envía el
+mismo correo con una sesión por mensaje (pool_size=0: connect + EHLO + STARTTLS
++ AUTH cada vez) y con el pool de sesiones autenticadas.
+Con --tls el stub exige STARTTLS con un certificado autofirmado (requiere el
+binario openssl); con --rtt-ms se interpone un proxy TCP con esa latencia.
+
+Requiere aiosmtpd (pip install aiosmtpd); no es dependencia de la app.
+
+Uso: python scripts/bench_email_pool.py --messages 200 --concurrency 2 --tls --rtt-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+except ImportError:
+    raise SystemExit("Este benchmark necesita aiosmtpd: pip install aiosmtpd")
+
+# aiosmtpd registra un aviso de deprecación (Session.login_data) en cada AUTH
+logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+from app.services.email_service import EmailService  # noqa: E402
+from app.tools.email_tools import build_approval_email  # noqa: E402
+from bench_checkpointer import start_latency_proxy  # noqa: E402
+
+
+class SinkHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def accept_any(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def self_signed_context(workdir: str) -> ssl.SSLContext:
+    cert, key = os.path.join(workdir, "cert.pem"), os.path.join(workdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def run_mode(name: str, service: EmailService, messages: int, concurrency: int, subject: str, body: str) -> dict:
+    queue = asyncio.Queue()
+    for idx in range(messages):
+        queue.put_nowait(idx)
+
+    async def sender():
+        while not queue.empty():
+            idx = queue.get_nowait()
+            await service.enviar(f"bench-{idx}@example.com", subject, body)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await service.aclose()
+
+    return {
+        "mode": name,
+        "per_second": messages / elapsed,
+        "ms_per_email": elapsed * 1000 / messages * concurrency,
+        "connections": service.connections_opened if service.pool_size else messages,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    handler = SinkHandler()
+    port = free_port()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        tls_context = self_signed_context(workdir) if args.tls else None
+        controller = Controller(
+            handler,
+            hostname="127.0.0.1",
+            port=port,
+            tls_context=tls_context,
+            require_starttls=args.tls,
+            authenticator=accept_any,
+            auth_require_tls=args.tls,
+        )
+        controller.start()
+
+        host, smtp_port = "127.0.0.1", port
+        if args.rtt_ms > 0:
+            proxied = urlsplit(start_latency_proxy(f"smtp://127.0.0.1:{port}", args.rtt_ms))
+            host, smtp_port = proxied.hostname, proxied.port
+
+        subject, body = build_approval_email("Bench Prospecto", 85.0, 80.0, 90.0)
+        common = dict(
+            smtp_server=host,
+            smtp_port=smtp_port,
+            smtp_user="bench@example.com",
+            smtp_password="bench",
+            start_tls=args.tls,
+            validate_certs=False,
+        )
+
+        print(
+            f"Mensajes: {args.messages} | Concurrencia: {args.concurrency} | "
+            f"STARTTLS: {'sí' if args.tls else 'no'} | RTT agregado: {args.rtt_ms:.1f} ms"
+        )
+        print(f"{'modo':<9} {'emails/s':>9} {'ms/email':>9} {'conexiones':>11}")
+
+        try:
+            modes = (
+                ("sin pool", EmailService(pool_size=0, **common)),
+                ("pool", EmailService(pool_size=args.concurrency, **common)),
+            )
+            for name, service in modes:
+                result = await run_mode(name, service, args.messages, args.concurrency, subject, body)
+                print(
+                    f"{result['mode']:<9} {result['per_second']:>9.1f} "
+                    f"{result['ms_per_email']:>9.2f} {result['connections']:>11}"
+                )
+        finally:
+            controller.stop()
+
+    if handler.received != 2 * args.messages:
+        print(f"Aviso: el servidor recibió {handler.received} de {2 * args.messages} mensajes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
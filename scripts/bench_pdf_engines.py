@@ -0,0 +1,189 @@
+"""
+Benchmark: motores de extracción de PDF (PDF_EXTRACT_ENGINE) sobre un corpus local.
+
+Genera PDFs tipo CV (una y dos columnas, tildes, de 1 a N páginas) con el texto
+conocido, y corre cada motor en un proceso nuevo con los mismos topes que la app
+(PDF_EXTRACT_MAX_PAGES / PDF_EXTRACT_MAX_CHARS). Reporta documentos y páginas por
+segundo, RSS pico del proceso, y calidad: fracción de las palabras esperadas que
+aparecen en el texto extraído y caracteres ilegibles.
+
+Uso: python scripts/bench_pdf_engines.py --pages 1 2 3 10 40 --repeat 3
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from app.config import settings  # noqa: E402
+from app.services.pdf_extraction import PDF_ENGINES  # noqa: E402
+
+WORDS = (
+    "experiencia gestión ventas atención cliente análisis datos excel liderazgo "
+    "comunicación negociación logística almacén inventarios facturación contabilidad "
+    "ingeniería diseño campañas marketing redes sociales presupuesto planificación "
+    "supervisión equipo capacitación calidad auditoría procesos mejora continua"
+).split()
+LINES_PER_PAGE = 44
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(rng: random.Random, page: int, lines: int):
+    for number in range(lines):
+        words = rng.sample(WORDS, 6)
+        yield f"{page}.{number} " + " ".join(words) + f" Año {2000 + number % 24}."
+
+
+def build_pdf(pages: int, two_columns: bool, seed: int):
+    """PDF sin dependencias y su texto esperado en orden de lectura"""
+    rng = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    expected = []
+
+    for page in range(pages):
+        lines = list(_page_lines(rng, page, LINES_PER_PAGE))
+        expected.extend(lines)
+
+        half = len(lines) // 2
+        columns = ((40, lines[:half]), (310, lines[half:])) if two_columns else ((40, lines),)
+
+        stream = " ".join(
+            f"BT /F1 {8 if two_columns else 9} Tf {x} 800 Td 13 TL "
+            + " ".join(f"({_escape(line)}) '" for line in column)
+            + " ET"
+            for x, column in columns
+        ).encode("cp1252")
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        page_ids.append(len(objects))
+
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        body = body if isinstance(body, bytes) else body.encode("latin-1")
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+
+    return bytes(out), expected
+
+
+def _words(text: str) -> Counter:
+    return Counter(text.lower().split())
+
+
+def run_engine(engine: str, corpus: list, repeat: int, max_pages: int, max_chars: int) -> dict:
+    """Corre en un proceso nuevo para que el RSS pico sea solo de este motor"""
+    from app.services.pdf_extraction import _extract_text
+
+    documents = [(Path(path).read_bytes(), expected_words) for path, expected_words in corpus]
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+    pages = 0
+    chars = 0
+    recall = []
+    garbled = 0
+
+    for _ in range(repeat):
+        for content, expected_words in documents:
+            text, read_pages, seconds = _extract_text(content, max_pages, max_chars, engine)
+            timings.append(seconds)
+            pages += read_pages
+            chars += len(text)
+            garbled += sum(1 for char in text if char == "�" or (not char.isprintable() and char not in "\n\t"))
+
+            found = _words(text) & expected_words
+            recall.append(sum(found.values()) / max(1, sum(expected_words.values())))
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    total = sum(timings)
+
+    return {
+        "engine": engine,
+        "docs_per_s": len(timings) / total if total else 0.0,
+        "pages_per_s": pages / total if total else 0.0,
+        "p50_ms": statistics.median(timings) * 1000,
+        "peak_rss_mb": peak_kb / 1024,
+        "delta_rss_mb": (peak_kb - baseline_kb) / 1024,
+        "chars_per_doc": chars / len(timings),
+        "recall": statistics.mean(recall) * 100,
+        "garbled": garbled / max(1, chars) * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 3, 10, 40])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", default=list(PDF_ENGINES), choices=list(PDF_ENGINES))
+    args = parser.parse_args()
+
+    max_pages, max_chars = settings.PDF_EXTRACT_MAX_PAGES, settings.PDF_EXTRACT_MAX_CHARS
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = []
+        for pages in args.pages:
+            for two_columns in (False, True):
+                content, expected = build_pdf(pages, two_columns, seed=pages * 2 + two_columns)
+                path = os.path.join(workdir, f"cv_{pages}p_{'2col' if two_columns else '1col'}.pdf")
+                Path(path).write_bytes(content)
+
+                # Lo que la app debería ver con sus topes: max_pages páginas (0: todas) y max_chars caracteres
+                visible = "\n".join(expected[:max_pages * LINES_PER_PAGE or None])[:max_chars]
+                corpus.append((path, _words(visible.rsplit(" ", 1)[0])))
+
+        print(
+            f"Corpus: {len(corpus)} PDFs ({', '.join(map(str, args.pages))} páginas, 1 y 2 columnas) "
+            f"x {args.repeat} | max_pages={max_pages} max_chars={max_chars} "
+            f"fast_pages={settings.PDF_EXTRACT_FAST_PAGES}"
+        )
+        print(
+            f"{'motor':<11} {'docs/s':>8} {'pág/s':>8} {'p50 ms':>8} {'RSS MB':>8} "
+            f"{'ΔRSS MB':>8} {'chars/doc':>10} {'recall %':>9} {'ilegible %':>11}"
+        )
+
+        context = multiprocessing.get_context("spawn")
+        for engine in args.engines:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                started = time.perf_counter()
+                result = executor.submit(run_engine, engine, corpus, args.repeat, max_pages, max_chars).result()
+
+            print(
+                f"{result['engine']:<11} {result['docs_per_s']:>8.1f} {result['pages_per_s']:>8.1f} "
+                f"{result['p50_ms']:>8.1f} {result['peak_rss_mb']:>8.1f} {result['delta_rss_mb']:>8.1f} "
+                f"{result['chars_per_doc']:>10.0f} {result['recall']:>9.1f} {result['garbled']:>11.2f}"
+                f"   ({time.perf_counter() - started:.1f}s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: latencia por turno de scoring semántico con sesiones concurrentes.
+
+Compara el camino bloqueante (encode_single -> cliente OpenAI sync dentro del
+event loop) contra el camino async (await embed_text). La API de OpenAI se
+simula con httpx.MockTransport y una latencia fija, no se necesita API key.
+
+La latencia de cada turno se mide desde su llegada programada (una cada
+--think-ms por sesión), por lo que incluye la espera detrás de otras sesiones.
+
+Uso: python scripts/bench_scoring_latency.py --sessions 20 --turns 5 --latency-ms 300
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from openai import AsyncOpenAI, OpenAI  # noqa: E402
+
+from app.services.embeddings import embedding_service, normalize_embedding  # noqa: E402
+
+DIMENSIONS = embedding_service.dimensions
+openai_requests = 0
+
+
+def build_embedding_response(request: httpx.Request) -> httpx.Response:
+    global openai_requests
+    openai_requests += 1
+    payload = json.loads(request.content)
+    inputs = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+    as_base64 = payload.get("encoding_format") == "base64"
+
+    data = []
+    for idx, _ in enumerate(inputs):
+        vector = np.random.default_rng().standard_normal(DIMENSIONS).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        embedding = (
+            base64.b64encode(vector.tobytes()).decode("ascii")
+            if as_base64 else vector.tolist()
+        )
+        data.append({"object": "embedding", "index": idx, "embedding": embedding})
+
+    return httpx.Response(200, json={
+        "object": "list",
+        "data": data,
+        "model": payload["model"],
+        "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+    })
+
+
+def install_mock_clients(latency_s: float):
+    def sync_handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency_s)
+        return build_embedding_response(request)
+
+    async def async_handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_s)
+        return build_embedding_response(request)
+
+    embedding_service.sync_client = OpenAI(
+        api_key="sk-bench",
+        http_client=httpx.Client(transport=httpx.MockTransport(sync_handler)),
+    )
+    embedding_service.async_client = AsyncOpenAI(
+        api_key="sk-bench",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(async_handler)),
+    )
+
+
+async def run_session(mode: str, session_idx: int, turns: int, think_s: float,
+                      origin: float, ideal, latencies: list):
+    for turn in range(turns):
+        # Cada turno llega en un instante fijo; la latencia se mide desde la
+        # llegada, así se incluye el tiempo que el turno espera a un loop bloqueado
+        arrival = origin + turn * think_s + (session_idx / 1000)
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+
+        answer = f"Respuesta {session_idx}-{turn} {uuid.uuid4()}"
+
+        if mode == "blocking":
+            answer_embedding = normalize_embedding(embedding_service.encode_single(answer))
+        else:
+            answer_embedding = await embedding_service.embed_vector(answer)
+
+        embedding_service.cosine_similarity(answer_embedding, ideal)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+
+async def run_mode(mode: str, sessions: int, turns: int, think_s: float) -> dict:
+    global openai_requests
+    embedding_service.clear_cache()
+    openai_requests = 0
+    ideal = normalize_embedding(np.random.default_rng(0).standard_normal(DIMENSIONS))
+    latencies = []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(mode, idx, turns, think_s, started, ideal, latencies)
+        for idx in range(sessions)
+    ))
+    wall_s = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "mode": mode,
+        "turns": len(ordered),
+        "p50_ms": statistics.median(ordered),
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        "wall_s": wall_s,
+        "requests": openai_requests,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--think-ms", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    install_mock_clients(args.latency_ms / 1000)
+
+    print(f"Sesiones: {args.sessions} | Turnos por sesión: {args.turns} | Latencia OpenAI: {args.latency_ms:.0f} ms")
+    print(f"{'modo':<10} {'turnos':>7} {'p50 ms':>10} {'p99 ms':>10} {'total s':>9} {'requests':>9}")
+
+    for mode in ("blocking", "async"):
+        result = await run_mode(mode, args.sessions, args.turns, args.think_ms / 1000)
+        print(
+            f"{result['mode']:<10} {result['turns']:>7} {result['p50_ms']:>10.1f} "
+            f"{result['p99_ms']:>10.1f} {result['wall_s']:>9.2f} {result['requests']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Benchmark: memoria pico por subida en POST /upload-cv, lectura completa vs stream.
+
+"buffered" reproduce el endpoint anterior (UploadFile + file.read() + sha256 y el
+contenido serializado hacia el proceso de extracción); "stream" usa
+receive_cv_multipart y entrega al extractor la ruta del temporal. El cuerpo se
+envía en bloques de 64 KiB desde un archivo, así el cliente no suma memoria.
+Mide con tracemalloc (asignaciones de Python) el pico durante cada request.
+
+Uso: python scripts/bench_upload_cv.py --sizes-kb 300 2000 4800 --oversize-kb 8000
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile  # noqa: E402
+
+from app.services.cv_upload import CvUploadError, receive_cv_multipart  # noqa: E402
+
+BOUNDARY = "benchboundary7d1f"
+CHUNK = 64 * 1024
+MAX_BYTES = 5_000_000
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/buffered")
+    async def buffered(position_id: str = Form(...), file: UploadFile = File(...)):
+        file_content = await file.read()
+        if len(file_content) > MAX_BYTES:
+            raise HTTPException(status_code=400, detail="Archivo muy grande")
+        checksum = hashlib.sha256(file_content).hexdigest()
+        handoff = pickle.dumps((file_content,))
+        return {"checksum": checksum, "handoff": len(handoff)}
+
+    @app.post("/stream")
+    async def stream(request: Request):
+        try:
+            upload = await receive_cv_multipart(request, max_bytes=MAX_BYTES)
+        except CvUploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            handoff = pickle.dumps((upload.spool.source(),))
+            return {"checksum": upload.spool.checksum, "handoff": len(handoff)}
+        finally:
+            upload.discard()
+
+    return app
+
+
+def write_body(path: str, size: int):
+    head = (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"position_id\"\r\n\r\nbench\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"cv.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    with open(path, "wb") as body:
+        body.write(head)
+        remaining = size
+        while remaining:
+            block = os.urandom(min(CHUNK, remaining))
+            body.write(block)
+            remaining -= len(block)
+        body.write(f"\r\n--{BOUNDARY}--\r\n".encode())
+
+
+async def body_chunks(path: str):
+    with open(path, "rb") as body:
+        while block := body.read(CHUNK):
+            yield block
+
+
+async def measure(client: httpx.AsyncClient, route: str, path: str, send_length: bool) -> dict:
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if send_length:
+        headers["content-length"] = str(os.path.getsize(path))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = await client.post(route, content=body_chunks(path), headers=headers)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"status": response.status_code, "peak_mb": peak / 1024 / 1024, "ms": elapsed * 1000}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[300, 2000, 4800])
+    parser.add_argument("--oversize-kb", type=int, default=8000)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'archivo':>10} {'modo':<9} {'status':>6} {'pico MB':>8} {'ms':>8}")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            cases = [(size, True) for size in args.sizes_kb] + [(args.oversize_kb, False)]
+            for size_kb, send_length in cases:
+                path = os.path.join(workdir, f"body_{size_kb}.bin")
+                write_body(path, size_kb * 1024)
+                label = f"{size_kb} KB" + ("" if send_length else "*")
+
+                for route in ("/buffered", "/stream"):
+                    result = await measure(client, route, path, send_length)
+                    print(
+                        f"{label:>10} {route[1:]:<9} {result['status']:>6} "
+                        f"{result['peak_mb']:>8.2f} {result['ms']:>8.1f}"
+                    )
+
+    print("* sin Content-Length (chunked): el tope se aplica mientras se lee")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
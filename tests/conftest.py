@@ -0,0 +1,25 @@
+"""
+tests/conftest.py
+Configuración mínima para importar app.* sin servicios externos y correr tests async
+"""
+import asyncio
+import inspect
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest  # noqa: E402
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Los tests `async def` corren en un loop propio (sin depender de pytest-asyncio)"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
@@ -0,0 +1,135 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.services import answer_writer
+from app.services.answer_writer import AnswerWrite, AnswerWriteQueue
+
+
+class FakeStore:
+    """Reemplaza write_answers: registra lo escrito y falla mientras fail_times > 0"""
+
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.written = []
+
+    async def write_answers(self, db, writes):
+        await asyncio.sleep(0)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("bd no disponible")
+        self.written.extend(write.write_id for write in writes)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    monkeypatch.setattr(answer_writer, "AsyncSessionLocal", session)
+    monkeypatch.setattr(answer_writer, "write_answers", store.write_answers)
+    return store
+
+
+def make_write(question: int) -> AnswerWrite:
+    return AnswerWrite(
+        evaluation_id="00000000-0000-0000-0000-000000000001",
+        question_id=f"00000000-0000-0000-0000-{question:012d}",
+        answer_text=f"respuesta {question}",
+        score=80.0,
+        similarity_score=None,
+        matched_keywords=[],
+        feedback={},
+        semantic=False,
+        current_test=1,
+        current_question=question + 1,
+    )
+
+
+async def test_drain_writes_in_submission_order(store):
+    queue = AnswerWriteQueue(retry_delay_seconds=0)
+    writes = [make_write(n) for n in range(3)]
+
+    for write in writes:
+        queue.submit("s1", write)
+
+    assert await queue.drain("s1") is True
+    assert store.written == [write.write_id for write in writes]
+    assert queue.stats()["pending"] == 0
+
+
+async def test_reconcile_drops_acknowledged_writes(store):
+    queue = AnswerWriteQueue(retry_delay_seconds=0)
+    first, second = make_write(1), make_write(2)
+
+    queue.submit("s1", first)
+    await queue.drain("s1")
+
+    remaining = queue.reconcile("s1", [first.as_state(), second.as_state()])
+
+    assert remaining == [second.as_state()]
+    assert await queue.drain("s1") is True
+    assert store.written == [first.write_id, second.write_id]
+
+
+async def test_restart_replays_pending_answers_from_state(store):
+    # Proceso nuevo: la cola no conoce nada y el estado del grafo trae lo no confirmado
+    queue = AnswerWriteQueue(retry_delay_seconds=0)
+    pending_answers = [make_write(1).as_state(), make_write(2).as_state()]
+
+    remaining = queue.reconcile("s1", pending_answers)
+
+    assert remaining == pending_answers
+    assert await queue.drain("s1") is True
+    assert store.written == [data["write_id"] for data in pending_answers]
+    assert queue.reconcile("s1", pending_answers) == []
+
+
+async def test_drain_reports_unsaved_answers_instead_of_raising(store):
+    queue = AnswerWriteQueue(max_retries=1, retry_delay_seconds=0)
+    write = make_write(1)
+    store.fail_times = 10
+
+    queue.submit("s1", write)
+
+    assert await queue.drain("s1") is False
+    assert queue.stats()["pending"] == 1
+    assert queue.stats()["failures"] >= 1
+    assert store.written == []
+
+
+async def test_next_turn_retries_after_failed_drain(store):
+    queue = AnswerWriteQueue(max_retries=0, retry_delay_seconds=0)
+    write = make_write(1)
+    store.fail_times = 2
+
+    queue.submit("s1", write)
+    assert await queue.drain("s1") is False
+
+    store.fail_times = 0
+    remaining = queue.reconcile("s1", [write.as_state()])
+
+    assert remaining == [write.as_state()]
+    assert await queue.drain("s1") is True
+    assert store.written == [write.write_id]
+    assert queue.reconcile("s1", remaining) == []
+
+
+async def test_forget_keeps_sessions_with_pending_writes(store):
+    queue = AnswerWriteQueue(max_retries=0, retry_delay_seconds=0)
+    store.fail_times = 10
+
+    queue.submit("s1", make_write(1))
+    await queue.drain("s1")
+    queue.forget("s1")
+    assert queue.stats()["sessions"] == 1
+
+    store.fail_times = 0
+    queue.reconcile("s1", [])
+    assert await queue.drain("s1") is True
+    queue.forget("s1")
+    assert queue.stats()["sessions"] == 0
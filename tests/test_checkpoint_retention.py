@@ -0,0 +1,149 @@
+"""
+Retención de checkpoints contra Postgres: necesita TEST_DATABASE_URL (postgresql+asyncpg://...).
+Cada test crea las tablas del saver en un schema propio que se borra al terminar.
+"""
+import operator
+import os
+import uuid
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import END, StateGraph
+from psycopg_pool import AsyncConnectionPool
+
+from app.services.checkpoint_retention import CheckpointRetention
+from app.services.checkpointer import _CONNECTION_KWARGS, AsyncPostgresSaver
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL no configurada")
+
+THREADS = [f"thread-{index}" for index in range(5)]
+
+
+class TurnState(TypedDict):
+    answers: Annotated[list, operator.add]
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(TurnState)
+    graph.add_node("answer", lambda state: {"answers": [len(state["answers"])]})
+    graph.set_entry_point("answer")
+    graph.add_edge("answer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+class Checkpoints:
+    def __init__(self):
+        self.schema = f"test_retention_{uuid.uuid4().hex[:8]}"
+
+    async def __aenter__(self):
+        conninfo = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        self.pool = AsyncConnectionPool(
+            conninfo,
+            kwargs={**_CONNECTION_KWARGS, "options": f"-c search_path={self.schema}"},
+            open=False,
+        )
+        await self.pool.open()
+        await self.execute(f"CREATE SCHEMA {self.schema}")
+        await self.execute(
+            f"CREATE TABLE {self.schema}.evaluations (session_token TEXT PRIMARY KEY, status TEXT)"
+        )
+
+        self.saver = AsyncPostgresSaver(self.pool)
+        await self.saver.setup()
+        self.graph = build_graph(self.saver)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        await self.pool.close()
+
+    async def execute(self, sql: str, params=None):
+        async with self.pool.connection() as conn:
+            await conn.execute(sql, params)
+
+    async def fetch(self, sql: str, params=None) -> list:
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(sql, params)
+            return await cur.fetchall()
+
+    async def turns(self, thread_id: str, count: int):
+        for _ in range(count):
+            await self.graph.ainvoke({"answers": []}, {"configurable": {"thread_id": thread_id}})
+
+    async def answers(self, thread_id: str) -> list:
+        state = await self.graph.aget_state({"configurable": {"thread_id": thread_id}})
+        return state.values.get("answers")
+
+    async def per_thread(self, table: str = "checkpoints") -> dict:
+        rows = await self.fetch(f"SELECT thread_id, count(*) AS n FROM {table} GROUP BY thread_id")
+        return {row["thread_id"]: row["n"] for row in rows}
+
+    async def last_seen(self, thread_id: str, interval: str):
+        await self.execute(
+            "UPDATE checkpoints SET checkpoint = jsonb_set(checkpoint, '{ts}', to_jsonb((now() - %s::interval)::text)) "
+            "WHERE thread_id = %s",
+            (interval, thread_id),
+        )
+
+
+async def test_compaction_and_orphan_blobs_work_thread_batch_by_batch():
+    async with Checkpoints() as checkpoints:
+        for thread_id in THREADS:
+            await checkpoints.turns(thread_id, 3)
+        blobs_before = await checkpoints.per_thread("checkpoint_blobs")
+
+        retention = CheckpointRetention(keep_last=2, batch_size=2, max_batches=10)
+        assert await retention.compact(checkpoints.pool) > 0
+        assert await checkpoints.per_thread() == {thread_id: 2 for thread_id in THREADS}
+
+        assert await retention.delete_orphan_blobs(checkpoints.pool) > 0
+        blobs_after = await checkpoints.per_thread("checkpoint_blobs")
+        assert all(blobs_after[thread_id] < blobs_before[thread_id] for thread_id in THREADS)
+
+        for thread_id in THREADS:
+            assert await checkpoints.answers(thread_id) == [0, 1, 2]
+
+
+async def test_next_run_continues_after_the_last_thread_seen():
+    async with Checkpoints() as checkpoints:
+        for thread_id in THREADS:
+            await checkpoints.turns(thread_id, 2)
+
+        retention = CheckpointRetention(keep_last=1, batch_size=2, max_batches=1)
+
+        await retention.compact(checkpoints.pool)
+        counts = await checkpoints.per_thread()
+        assert [counts[thread_id] == 1 for thread_id in THREADS] == [True, True, False, False, False]
+
+        await retention.compact(checkpoints.pool)
+        await retention.compact(checkpoints.pool)
+        assert await checkpoints.per_thread() == {thread_id: 1 for thread_id in THREADS}
+        assert retention._cursors["compact"] == ""
+
+        # Vuelta completa: la siguiente corrida empieza de nuevo por el primer thread
+        await checkpoints.turns(THREADS[0], 1)
+        assert (await checkpoints.per_thread())[THREADS[0]] > 1
+        await retention.compact(checkpoints.pool)
+        assert (await checkpoints.per_thread())[THREADS[0]] == 1
+
+
+async def test_expire_removes_finished_and_idle_sessions():
+    async with Checkpoints() as checkpoints:
+        finished, active, idle, recent = THREADS[:4]
+        for thread_id in (finished, active, idle, recent):
+            await checkpoints.turns(thread_id, 1)
+
+        await checkpoints.execute(
+            "INSERT INTO evaluations VALUES (%s, 'completed'), (%s, 'in_progress')", (finished, active)
+        )
+        await checkpoints.last_seen(finished, "2 days")
+        await checkpoints.last_seen(active, "2 days")
+        await checkpoints.last_seen(idle, "4 days")
+
+        retention = CheckpointRetention(completed_ttl_hours=24, idle_ttl_hours=72, batch_size=2, max_batches=10)
+
+        assert await retention.expire_sessions(checkpoints.pool) == 2
+        assert set(await checkpoints.per_thread()) == {active, recent}
+        assert set(await checkpoints.per_thread("checkpoint_blobs")) <= {active, recent}
@@ -0,0 +1,25 @@
+import inspect
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver as NativeAsyncPostgresSaver
+
+from app.services.checkpointer import AsyncPostgresSaver
+
+
+def test_cursor_override_matches_upstream_signature():
+    # _cursor reemplaza un método interno de langgraph-checkpoint-postgres 3.1.3
+    upstream = inspect.signature(NativeAsyncPostgresSaver._cursor)
+    override = inspect.signature(AsyncPostgresSaver._cursor)
+
+    assert list(upstream.parameters) == list(override.parameters) == ["self", "pipeline"]
+    assert upstream.parameters["pipeline"].kind is inspect.Parameter.KEYWORD_ONLY
+    assert upstream.parameters["pipeline"].default is False
+
+
+def test_cursor_override_opens_the_same_cursors_as_upstream():
+    # Si el original cambia cómo abre la conexión o el cursor, la copia quedó desactualizada
+    upstream = inspect.getsource(NativeAsyncPostgresSaver._cursor)
+
+    assert "async with self.lock, _ainternal.get_connection(self.conn) as conn:" in upstream
+    assert "if self.supports_pipeline:" in upstream
+    for statement in ("conn.pipeline()", "conn.transaction()", "conn.cursor(binary=True, row_factory=dict_row)"):
+        assert statement in upstream
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.services import cv_upload as cv_upload_module
+from app.services.cv_upload import (
+    CHUNK_HEADER,
+    CvSpool,
+    CvUploadError,
+    CvUploadRegistry,
+    receive_cv_multipart,
+)
+
+SESSION = "s1"
+CONTENT = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+def frame(seq: int, data: bytes) -> bytes:
+    return CHUNK_HEADER.pack(seq) + data
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as spooled:
+        return spooled.read()
+
+
+@pytest.fixture
+def registry():
+    registry = CvUploadRegistry(max_bytes=10_000, chunk_bytes=512, ttl_seconds=60, max_pending=2)
+    yield registry
+    registry.close()
+
+
+async def send(registry: CvUploadRegistry, data: bytes, size: int = 400, start: int = 0):
+    for seq, offset in enumerate(range(0, len(data), size), start=start):
+        await registry.write_chunk(SESSION, frame(seq, data[offset:offset + size]))
+
+
+async def test_upload_in_chunks_returns_content_and_checksum(registry):
+    upload = registry.begin(SESSION, "cv.pdf", len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+
+    await send(registry, CONTENT)
+    finished, checksum = await registry.finish(SESSION, upload.upload_id)
+
+    # El archivo queda en disco para leerlo desde ahí; lo borra quien llamó a finish
+    assert finished is upload and read(upload.path) == CONTENT
+    assert checksum == hashlib.sha256(CONTENT).hexdigest()
+    assert registry.active(SESSION) is None
+    assert registry.stats()["completed"] == 1
+
+    upload.discard()
+    assert not os.path.exists(upload.path)
+
+
+async def test_resume_ignores_chunks_already_written(registry):
+    upload = registry.begin(SESSION, "cv.pdf", len(CONTENT))
+    await send(registry, CONTENT[:800])
+
+    # Reconexión: el cliente retoma con el upload_id y reenvía el último bloque
+    resumed = registry.begin(SESSION, "cv.pdf", len(CONTENT), upload_id=upload.upload_id)
+    assert resumed is upload and resumed.next_seq == 2
+    await registry.write_chunk(SESSION, frame(1, CONTENT[400:800]))
+    await send(registry, CONTENT[800:], start=2)
+
+    await registry.finish(SESSION, upload.upload_id)
+    assert read(upload.path) == CONTENT
+    upload.discard()
+    assert registry.stats()["duplicate_chunks"] == 1
+
+
+async def test_resume_requires_the_same_session(registry):
+    upload = registry.begin(SESSION, "cv.pdf", len(CONTENT))
+
+    with pytest.raises(CvUploadError) as error:
+        registry.begin("otra", "cv.pdf", len(CONTENT), upload_id=upload.upload_id)
+    assert error.value.abort
+
+
+async def test_rejects_out_of_order_and_oversized_chunks(registry):
+    registry.begin(SESSION, "cv.pdf", 600)
+
+    with pytest.raises(CvUploadError, match="fuera de orden"):
+        await registry.write_chunk(SESSION, frame(1, b"x"))
+    with pytest.raises(CvUploadError, match="muy grande"):
+        await registry.write_chunk(SESSION, frame(0, b"x" * 513))
+
+    await registry.write_chunk(SESSION, frame(0, b"x" * 500))
+    with pytest.raises(CvUploadError) as error:
+        await registry.write_chunk(SESSION, frame(1, b"x" * 101))
+    assert error.value.abort
+    assert registry.active(SESSION) is None
+
+
+async def test_checksum_mismatch_aborts(registry):
+    upload = registry.begin(SESSION, "cv.pdf", len(CONTENT), hashlib.sha256(b"otro").hexdigest())
+    await send(registry, CONTENT)
+
+    with pytest.raises(CvUploadError) as error:
+        await registry.finish(SESSION, upload.upload_id)
+    assert error.value.abort
+    assert not os.path.exists(upload.path)
+
+
+async def test_incomplete_upload_can_continue(registry):
+    upload = registry.begin(SESSION, "cv.pdf", len(CONTENT))
+    await send(registry, CONTENT[:400])
+
+    with pytest.raises(CvUploadError, match="incompleta"):
+        await registry.finish(SESSION, upload.upload_id)
+    assert registry.active(SESSION) is upload
+
+
+def test_begin_validates_size_and_pending_limit(registry):
+    with pytest.raises(CvUploadError):
+        registry.begin(SESSION, "cv.pdf", 0)
+    with pytest.raises(CvUploadError, match="muy grande"):
+        registry.begin(SESSION, "cv.pdf", 10_001)
+
+    registry.begin("a", "cv.pdf", 10)
+    registry.begin("b", "cv.pdf", 10)
+    with pytest.raises(CvUploadError, match="Demasiadas"):
+        registry.begin("c", "cv.pdf", 10)
+
+
+def test_new_upload_replaces_the_previous_one_of_the_session(registry):
+    first = registry.begin(SESSION, "cv.pdf", 10)
+    second = registry.begin(SESSION, "cv2.pdf", 10)
+
+    assert registry.active(SESSION) is second
+    assert not os.path.exists(first.path)
+    assert registry.stats()["aborted"] == 1
+
+
+def test_expire_removes_abandoned_uploads(registry):
+    upload = registry.begin(SESSION, "cv.pdf", 10)
+    upload.touched_at -= registry.ttl_seconds + 1
+
+    assert registry.expire() == 1
+    assert registry.active(SESSION) is None
+    assert not os.path.exists(upload.path)
+
+
+@pytest.fixture
+def spool_threads(monkeypatch):
+    """Cuenta lo que el spool manda a un hilo"""
+    calls = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(func, *args):
+        calls.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(cv_upload_module.asyncio, "to_thread", counting_to_thread)
+    return calls
+
+
+async def test_spool_stays_in_memory_until_threshold(spool_threads):
+    spool = CvSpool(spool_bytes=1024)
+    await spool.write(CONTENT[:500])
+    await spool.finish()
+
+    assert spool.path is None
+    assert spool.source() == CONTENT[:500]
+    assert spool.checksum == hashlib.sha256(CONTENT[:500]).hexdigest()
+    assert spool_threads == []
+
+
+async def test_spool_moves_to_disk_past_threshold(spool_threads):
+    spool = CvSpool(spool_bytes=512)
+    await spool.write(CONTENT[:400])
+    await spool.write(CONTENT[400:])
+    await spool.write(CONTENT[:10])
+    await spool.finish()
+
+    assert spool.source() == spool.path
+    assert spool.read() == CONTENT + CONTENT[:10]
+    assert spool.size == len(CONTENT) + 10
+    assert spool.checksum == hashlib.sha256(CONTENT + CONTENT[:10]).hexdigest()
+    # El paso a disco, las escrituras siguientes y el cierre no bloquean el event loop
+    assert spool_threads == ["_write_to_disk", "_write_to_disk", "close"]
+
+    spool.discard()
+    assert not os.path.exists(spool.path)
+
+
+BOUNDARY = "testboundary"
+
+
+def multipart_body(file_content: bytes = CONTENT, content_type: str = "application/pdf") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"position_id\"\r\n\r\npos-1\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"cv.pdf\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + file_content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body: bytes, chunk: int = 100, content_length: bool = True) -> Request:
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    chunks = [body[offset:offset + chunk] for offset in range(0, len(body), chunk)]
+
+    async def receive():
+        data = chunks.pop(0)
+        return {"type": "http.request", "body": data, "more_body": bool(chunks)}
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+async def test_multipart_streams_file_into_spool():
+    upload = await receive_cv_multipart(make_request(multipart_body()), max_bytes=10_000)
+
+    try:
+        assert upload.fields == {"position_id": "pos-1"}
+        assert upload.file_name == "cv.pdf"
+        assert upload.spool.read() == CONTENT
+        assert upload.spool.checksum == hashlib.sha256(CONTENT).hexdigest()
+    finally:
+        upload.discard()
+
+
+async def test_multipart_spills_large_file_to_disk():
+    content = CONTENT * 700  # supera CV_UPLOAD_SPOOL_BYTES
+    upload = await receive_cv_multipart(make_request(multipart_body(content), chunk=64 * 1024), max_bytes=1_000_000)
+
+    try:
+        assert upload.spool.path is not None
+        assert read(upload.spool.path) == content
+        assert upload.spool.checksum == hashlib.sha256(content).hexdigest()
+        assert upload.fields == {"position_id": "pos-1"}
+    finally:
+        upload.discard()
+    assert not os.path.exists(upload.spool.path)
+
+
+async def test_multipart_rejects_non_pdf():
+    with pytest.raises(CvUploadError, match="PDF"):
+        await receive_cv_multipart(make_request(multipart_body(content_type="image/png")))
+
+
+async def test_multipart_cuts_oversized_file_without_content_length():
+    request = make_request(multipart_body(), content_length=False)
+
+    with pytest.raises(CvUploadError, match="muy grande"):
+        await receive_cv_multipart(request, max_bytes=500)
+
+
+async def test_multipart_rejects_large_content_length_before_reading():
+    request = make_request(multipart_body(b"x" * 40_000))
+
+    with pytest.raises(CvUploadError, match="muy grande"):
+        await receive_cv_multipart(request, max_bytes=1_000)
@@ -0,0 +1,164 @@
+"""
+Claim del outbox contra Postgres: necesita TEST_DATABASE_URL (postgresql+asyncpg://...).
+Cada test trabaja en un schema propio que se borra al terminar.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.services import email_outbox as outbox_module
+from app.services.email_outbox import EmailOutboxWorker
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL no configurada")
+
+
+class Outbox:
+    def __init__(self, monkeypatch):
+        self.schema = f"test_outbox_{uuid.uuid4().hex[:8]}"
+        self.monkeypatch = monkeypatch
+        self.sent = []
+
+    async def __aenter__(self):
+        admin = create_async_engine(DATABASE_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {self.schema}"))
+            await conn.execute(text(
+                f"CREATE TABLE {self.schema}.evaluations (id UUID PRIMARY KEY, email_sent BOOLEAN DEFAULT false)"
+            ))
+        await admin.dispose()
+
+        self.engine = create_async_engine(
+            DATABASE_URL, connect_args={"server_settings": {"search_path": self.schema}}
+        )
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.monkeypatch.setattr(outbox_module, "AsyncSessionLocal", self.sessions)
+
+        async def enviar(recipient, subject, body):
+            self.sent.append((recipient, subject))
+
+        self.monkeypatch.setattr(outbox_module.email_service, "enviar", enviar)
+        await EmailOutboxWorker().ensure_table(self.engine)
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {self.schema} CASCADE"))
+        await self.engine.dispose()
+
+    async def enqueue(self, worker: EmailOutboxWorker, count: int, kind: str = "hr_notification", payload=None):
+        async with self.sessions() as db:
+            for index in range(count):
+                worker.enqueue(db, None, kind, f"r{index}@example.com", f"asunto {index}", "cuerpo", payload=payload)
+            await db.commit()
+
+    async def execute(self, sql: str):
+        async with self.sessions() as db:
+            await db.execute(text(sql))
+            await db.commit()
+
+    async def scalar(self, sql: str):
+        async with self.sessions() as db:
+            return (await db.execute(text(sql))).scalar()
+
+
+async def test_claim_reserves_a_batch_until_the_lease_expires(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(batch_size=3, lease_seconds=3600)
+        await outbox.enqueue(worker, 5)
+
+        first = await worker._claim()
+        second = await worker._claim()
+        third = await worker._claim()
+
+        assert len(first) == 3 and len(second) == 2 and third == []
+        assert {row.id for row in first}.isdisjoint(row.id for row in second)
+
+        # Lease vencida (proceso caído a mitad del envío): vuelven a estar disponibles
+        await outbox.execute("UPDATE email_outbox SET next_attempt_at = now() - interval '1 second'")
+        assert len(await worker._claim()) == 3
+
+
+async def test_concurrent_claims_do_not_overlap(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(batch_size=4, lease_seconds=3600)
+        await outbox.enqueue(worker, 8)
+
+        batches = await asyncio.gather(worker._claim(), worker._claim())
+        ids = [row.id for batch in batches for row in batch]
+
+        assert len(ids) == len(set(ids)) == 8
+
+
+DIGEST_ITEM = {
+    "evaluation_id": "e1", "prospect_name": "Ana", "position_title": "Ventas",
+    "total_score": 80.0, "test_1_score": 80.0, "test_2_score": 80.0,
+}
+
+
+async def test_claim_skips_digest_items(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(batch_size=10, lease_seconds=3600, digest_max_items=2)
+        await outbox.enqueue(worker, 1)
+        await outbox.enqueue(worker, 2, kind="hr_digest_item", payload=DIGEST_ITEM)
+
+        assert [row.kind for row in await worker._claim()] == ["hr_notification"]
+        assert len(await worker._claim_digest()) == 2
+
+
+async def test_digest_waits_for_max_items(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(lease_seconds=3600, digest_max_items=3, digest_window_minutes=60)
+        await outbox.enqueue(worker, 2, kind="hr_digest_item", payload=DIGEST_ITEM)
+
+        assert await worker._claim_digest() == []
+
+        await outbox.enqueue(worker, 2, kind="hr_digest_item", payload=DIGEST_ITEM)
+        assert len(await worker._claim_digest()) == 3
+        assert await worker._claim_digest() == []
+
+
+async def test_digest_is_sent_once_the_window_closes(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(lease_seconds=3600, digest_max_items=10, digest_window_minutes=60)
+        await outbox.enqueue(worker, 2, kind="hr_digest_item", payload=DIGEST_ITEM)
+
+        assert await worker.run_once() == {"sent": 0, "failed": 0}
+
+        await outbox.execute("UPDATE email_outbox SET created_at = now() - interval '61 minutes'")
+        assert await worker.run_once() == {"sent": 2, "failed": 0}
+        assert len(outbox.sent) == 1
+        assert worker.digests_sent == 1
+        assert await outbox.scalar("SELECT count(*) FROM email_outbox WHERE status = 'sent'") == 2
+
+
+async def test_delivered_mail_is_marked_sent(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(batch_size=1)
+        await outbox.enqueue(worker, 2)
+
+        assert await worker.run_once() == {"sent": 2, "failed": 0}
+        assert len(outbox.sent) == 2
+        assert await outbox.scalar("SELECT count(*) FROM email_outbox WHERE status = 'sent'") == 2
+
+
+async def test_failed_delivery_is_retried_then_marked_dead(monkeypatch):
+    async with Outbox(monkeypatch) as outbox:
+        worker = EmailOutboxWorker(batch_size=10, max_attempts=2, retry_base_seconds=0, retry_max_seconds=0)
+        await outbox.enqueue(worker, 1)
+
+        async def failing(recipient, subject, body):
+            raise ConnectionError("smtp caído")
+
+        monkeypatch.setattr(outbox_module.email_service, "enviar", failing)
+        assert await worker.run_once() == {"sent": 0, "failed": 1}
+        assert await outbox.scalar("SELECT status FROM email_outbox") == "pending"
+
+        assert await worker.run_once() == {"sent": 0, "failed": 1}
+        assert await outbox.scalar("SELECT status FROM email_outbox") == "dead"
+        assert worker.dead == 1
@@ -0,0 +1,88 @@
+import aiosmtplib
+import pytest
+
+from app.services import email_service as email_service_module
+from app.services.email_service import EmailService
+
+
+class FakeSmtp:
+    """Reemplaza aiosmtplib.SMTP: connect_errors / send_errors se consumen en orden"""
+
+    connect_errors = []
+    send_errors = []
+    connects = 0
+    sends = 0
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+
+    async def connect(self):
+        FakeSmtp.connects += 1
+        if FakeSmtp.connect_errors:
+            raise FakeSmtp.connect_errors.pop(0)
+        self.is_connected = True
+
+    async def send_message(self, message):
+        FakeSmtp.sends += 1
+        if FakeSmtp.send_errors:
+            raise FakeSmtp.send_errors.pop(0)
+
+    async def noop(self):
+        pass
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+@pytest.fixture
+def service(monkeypatch):
+    FakeSmtp.connect_errors, FakeSmtp.send_errors = [], []
+    FakeSmtp.connects = FakeSmtp.sends = 0
+    monkeypatch.setattr(email_service_module.aiosmtplib, "SMTP", FakeSmtp)
+    return EmailService(pool_size=1, smtp_server="smtp.test", smtp_user="u@test", smtp_password="p")
+
+
+async def test_pooled_connection_is_reused(service):
+    await service.enviar("a@test", "asunto", "cuerpo")
+    await service.enviar("b@test", "asunto", "cuerpo")
+
+    assert FakeSmtp.connects == 1 and FakeSmtp.sends == 2
+    assert service.stats()["sent"] == 2
+
+
+async def test_connect_failure_is_retried_once(service):
+    FakeSmtp.connect_errors = [aiosmtplib.SMTPConnectError("caído")]
+
+    await service.enviar("a@test", "asunto", "cuerpo")
+
+    assert FakeSmtp.connects == 2 and FakeSmtp.sends == 1
+    assert service.reconnects == 1
+
+
+async def test_connect_failing_twice_is_raised(service):
+    FakeSmtp.connect_errors = [aiosmtplib.SMTPConnectError("caído"), aiosmtplib.SMTPConnectError("caído")]
+
+    with pytest.raises(aiosmtplib.SMTPConnectError):
+        await service.enviar("a@test", "asunto", "cuerpo")
+    assert FakeSmtp.sends == 0
+
+
+@pytest.mark.parametrize("error", [
+    aiosmtplib.SMTPTimeoutError("timeout tras DATA"),
+    aiosmtplib.SMTPServerDisconnected("cortado"),
+])
+async def test_errors_after_handing_off_the_message_are_not_retried(service, error):
+    FakeSmtp.send_errors = [error]
+
+    with pytest.raises(type(error)):
+        await service.enviar("a@test", "asunto", "cuerpo")
+
+    # Reintentar podría duplicar un correo ya aceptado; la conexión se descarta
+    assert FakeSmtp.sends == 1
+    assert service.stats()["failed"] == 1 and service.stats()["idle_connections"] == 0
+
+    await service.enviar("a@test", "asunto", "cuerpo")
+    assert FakeSmtp.connects == 2
@@ -0,0 +1,153 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.embedding_store import PersistentEmbeddingStore
+from app.services.embeddings import (
+    _ENTRY_OVERHEAD_BYTES,
+    EmbeddingCache,
+    EmbeddingService,
+    normalize_embedding,
+)
+
+DIMENSIONS = 4
+ENTRY_BYTES = DIMENSIONS * 4 + _ENTRY_OVERHEAD_BYTES
+
+
+def vector(*values) -> np.ndarray:
+    return normalize_embedding(np.array(values, dtype=np.float32))
+
+
+def test_normalize_embedding_is_unit_and_read_only():
+    result = normalize_embedding([3.0, 4.0])
+
+    assert result.dtype == np.float32
+    assert np.allclose(result, [0.6, 0.8])
+    assert not result.flags.writeable
+    assert np.array_equal(normalize_embedding([0.0, 0.0]), [0.0, 0.0])
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = EmbeddingCache(max_bytes=2 * ENTRY_BYTES)
+    cache.set("a", [1, 0, 0, 0])
+    cache.set("b", [0, 1, 0, 0])
+
+    assert cache.get("a") is not None
+    cache.set("c", [0, 0, 1, 0])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.current_bytes == 2 * ENTRY_BYTES
+
+
+def test_cache_replaces_entries_and_skips_oversized_vectors():
+    cache = EmbeddingCache(max_bytes=ENTRY_BYTES)
+    cache.set("a", [1, 0, 0, 0])
+    cache.set("a", [0, 2, 0, 0])
+
+    assert np.allclose(cache.get("a"), [0, 1, 0, 0])
+    assert cache.current_bytes == ENTRY_BYTES
+
+    oversized = cache.set("big", np.ones(64))
+    assert np.isclose(np.linalg.norm(oversized), 1.0)
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "embeddings.db")
+
+
+def open_store(path: str, model: str = "m1", max_bytes: int = 1_000_000) -> PersistentEmbeddingStore:
+    return PersistentEmbeddingStore(path=path, model=model, dimensions=DIMENSIONS, max_bytes=max_bytes)
+
+
+def test_store_survives_reopen_and_is_scoped_by_model(store_path):
+    store = open_store(store_path)
+    store.put("k1", vector(1, 2, 3, 4))
+    store.close()
+
+    reopened = open_store(store_path)
+    assert np.allclose(reopened.get("k1"), vector(1, 2, 3, 4))
+    assert reopened.stats()["entries"] == 1
+    reopened.close()
+
+    other_model = open_store(store_path, model="m2")
+    assert other_model.get("k1") is None
+    assert other_model.stats()["misses"] == 1
+    other_model.close()
+
+
+def test_store_evicts_oldest_entries_over_budget(store_path):
+    store = open_store(store_path, max_bytes=3 * DIMENSIONS * 4)
+    for index in range(4):
+        store.put(f"k{index}", vector(index + 1, 0, 0, 0))
+
+    assert store.get("k0") is None
+    assert store.get("k3") is not None
+    assert store.current_bytes <= store.max_bytes
+    assert store.evictions >= 1
+    assert [key for key, _ in store.recent(10)][0] == "k3"
+    store.close()
+
+
+@pytest.fixture
+def service(store_path):
+    service = EmbeddingService()
+    service.store = open_store(store_path)
+    service.calls = []
+
+    async def embed(text):
+        service.calls.append(text)
+        await asyncio.sleep(0)
+        return np.array([1, 1, 0, 0], dtype=np.float32)
+
+    service.batcher.embed = embed
+    return service
+
+
+async def test_concurrent_requests_share_one_embedding_call(service):
+    vectors = await asyncio.gather(*(service.embed_vector("hola") for _ in range(3)))
+
+    assert service.calls == ["hola"]
+    assert all(np.array_equal(result, vectors[0]) for result in vectors)
+    assert service.stats()["inflight"]["deduplicated"] == 2
+    await service.close()
+
+
+async def test_close_waits_for_store_writes(service, store_path):
+    await service.embed_vector("hola")
+    await service.embed_vector("chao")
+    await service.close()
+
+    assert not service._store_writes
+    store = open_store(store_path)
+    assert store.stats()["entries"] == 2
+    store.close()
+
+
+async def test_store_write_errors_are_counted_not_raised(service):
+    def failing_put(key, value):
+        raise OSError("disco lleno")
+
+    service.store.put = failing_put
+
+    result = await service.embed_vector("hola")
+    await service.close()
+
+    assert np.isclose(np.linalg.norm(result), 1.0)
+    assert service.store_write_errors == 1
+
+
+async def test_stored_vector_skips_the_api(service):
+    await service.embed_vector("hola")
+    service.cache.clear()
+
+    await service.embed_vector("hola")
+
+    assert service.calls == ["hola"]
+    assert service.store.stats()["hits"] == 1
+    await service.close()
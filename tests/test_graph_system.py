@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agents import graph_system
+from app.agents.graph_system import EvaluationAgent, limit_messages
+from app.config import settings
+
+
+class FakeResult:
+    def __init__(self, row=None):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+
+class FakeDb:
+    """Registra el SQL ejecutado; el SELECT de evaluations devuelve `row`"""
+
+    def __init__(self, row=None):
+        self.row = row
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        self.statements.append((" ".join(str(statement).split()), params))
+        return FakeResult(self.row)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def history(*contents: str) -> list:
+    return [
+        (HumanMessage if index % 2 else AIMessage)(content=content)
+        for index, content in enumerate(contents)
+    ]
+
+
+@pytest.fixture
+def context_messages(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_CONTEXT_MESSAGES", 4)
+
+
+def test_limit_messages_appends_new_messages(context_messages):
+    existing = history("hola", "1")
+
+    assert limit_messages(existing, [AIMessage(content="2")]) == existing + [AIMessage(content="2")]
+    assert limit_messages([], existing) == existing
+    assert limit_messages(existing, []) == existing
+
+
+def test_limit_messages_takes_the_full_history_as_a_replacement(context_messages):
+    existing = history("hola", "1", "pregunta")
+    update = existing + [HumanMessage(content="respuesta")]
+
+    assert limit_messages(existing, update) == update
+    assert limit_messages(existing, list(existing)) == existing
+
+
+def test_limit_messages_keeps_the_last_context_messages(context_messages):
+    existing = history("hola", "1", "pregunta 1", "respuesta 1")
+    update = existing + history("pregunta 2", "respuesta 2")
+
+    assert limit_messages(existing, update) == update[-4:]
+    assert limit_messages([], history(*"abcdef")) == history(*"abcdef")[-4:]
+
+
+def test_limit_messages_does_not_repeat_a_partial_overlap(context_messages):
+    existing = history("hola", "1", "pregunta 1")
+    # La actualización arranca a mitad del historial (p. ej. leído ya recortado)
+    update = existing[1:] + [HumanMessage(content="respuesta 1")]
+
+    assert limit_messages(existing, update) == existing + [HumanMessage(content="respuesta 1")]
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(graph_system, "queue_evaluation_emails", lambda db, **kwargs: None)
+    return EvaluationAgent("sk-test")
+
+
+def make_state(score_totals) -> dict:
+    return {
+        "evaluation_id": "00000000-0000-0000-0000-000000000001",
+        "position_id": "00000000-0000-0000-0000-000000000002",
+        "prospect_email": "",
+        "current_test": 1,
+        "score_totals": score_totals,
+    }
+
+
+def test_accumulate_score_weights_each_answer(agent):
+    state = make_state({})
+
+    agent._accumulate_score(state, 1, 80.0, 2.0)
+    agent._accumulate_score(state, 1, 50.0, 1.0)
+    agent._accumulate_score(state, 2, 90.0, None)
+
+    assert state["score_totals"] == {"1": [210.0, 3.0], "2": [90.0, 1.0]}
+    assert agent._running_scores(state["score_totals"]) == {
+        "test_1_score": 70.0, "test_2_score": 90.0, "total_score": 80.0, "passed": True
+    }
+
+
+def test_accumulate_score_skips_resumed_evaluations(agent):
+    state = make_state(None)
+
+    agent._accumulate_score(state, 1, 80.0, 1.0)
+
+    assert state["score_totals"] is None
+
+
+async def test_finalize_uses_running_totals_without_recomputing(agent):
+    db = FakeDb()
+    state = make_state({"1": [120.0, 2.0], "2": [40.0, 1.0]})
+
+    scores = await agent._finalize_evaluation(db, state)
+
+    assert scores == {"test_1_score": 60.0, "test_2_score": 40.0, "total_score": 50.0, "passed": False}
+    assert len(db.statements) == 1
+    sql, params = db.statements[0]
+    assert sql.startswith("UPDATE evaluations") and params["total_score"] == 50.0
+    assert db.commits == 1
+
+
+async def test_finalize_without_totals_falls_back_to_the_database(agent):
+    row = SimpleNamespace(test_1_score=75, test_2_score=85, total_score=80, passed_ai=True)
+    db = FakeDb(row)
+
+    scores = await agent._finalize_evaluation(db, make_state(None))
+
+    assert scores == {"test_1_score": 75.0, "test_2_score": 85.0, "total_score": 80.0, "passed": True}
+    assert "calculate_evaluation_scores" in db.statements[0][0]
+    assert db.commits == 1
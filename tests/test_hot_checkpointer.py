@@ -0,0 +1,227 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+
+from app.services.hot_checkpointer import HotCheckpointSaver
+
+QUESTIONS_PER_TEST = 3
+THREAD = "hot-1"
+
+
+class DurableSaver(InMemorySaver):
+    """Hace de Postgres: cuenta lo que baja y puede bloquear o fallar el próximo aput"""
+
+    def __init__(self):
+        super().__init__()
+        self.checkpoints_written = 0
+        self.gate = None
+        self.fail_next = False
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail_next:
+            self.fail_next = False
+            raise ConnectionError("postgres no disponible")
+        self.checkpoints_written += 1
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"checkpoints_written": self.checkpoints_written}
+
+
+class TurnState(TypedDict):
+    answers: Annotated[list, operator.add]
+    workflow_stage: str
+    current_test: int
+    current_question: int
+
+
+def answer(state: TurnState) -> dict:
+    question = state.get("current_question", 0) + 1
+    test = state.get("current_test", 1)
+
+    if question > QUESTIONS_PER_TEST:
+        test, question = test + 1, 1
+
+    return {
+        "answers": [f"t{test}q{question}"],
+        "workflow_stage": "completed" if test > 2 else "in_evaluation",
+        "current_test": test,
+        "current_question": question,
+    }
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(TurnState)
+    graph.add_node("answer", answer)
+    graph.set_entry_point("answer")
+    graph.add_edge("answer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def turn(graph, thread_id: str = THREAD) -> dict:
+    return await graph.ainvoke({"answers": []}, {"configurable": {"thread_id": thread_id}})
+
+
+async def settle(hot: HotCheckpointSaver):
+    await asyncio.gather(*hot._tasks)
+
+
+async def durable_answers(durable: DurableSaver, thread_id: str = THREAD):
+    checkpoint_tuple = await durable.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+    return checkpoint_tuple.checkpoint["channel_values"]["answers"] if checkpoint_tuple else None
+
+
+@pytest.fixture
+def durable():
+    return DurableSaver()
+
+
+def make_hot(durable, **kwargs) -> HotCheckpointSaver:
+    kwargs.setdefault("flush_interval_seconds", 3600)
+    kwargs.setdefault("memory_limit_mb", 1_000_000)
+    return HotCheckpointSaver(durable, **kwargs)
+
+
+async def test_turns_within_a_stage_stay_in_memory(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+
+    await turn(graph)
+    await settle(hot)
+    written = durable.checkpoints_written
+    await turn(graph)
+    state = await turn(graph)
+    await settle(hot)
+
+    assert state["answers"] == ["t1q1", "t1q2", "t1q3"]
+    assert durable.checkpoints_written == written
+    assert hot.stats()["hot"]["dirty_threads"] == 1
+
+
+async def test_stage_change_flushes_without_waiting_for_timer(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+
+    for _ in range(QUESTIONS_PER_TEST + 1):
+        state = await turn(graph)
+    await settle(hot)
+
+    assert state["current_test"] == 2
+    assert await durable_answers(durable) == state["answers"]
+
+
+async def test_crash_resumes_from_last_flushed_checkpoint(durable):
+    graph = build_graph(make_hot(durable))
+    for _ in range(3):
+        await turn(graph)
+    await settle(graph.checkpointer)
+
+    # Proceso nuevo: lo que no bajó se pierde y la sesión sigue desde el último flush
+    assert await durable_answers(durable) == ["t1q1"]
+    state = await turn(build_graph(make_hot(durable)))
+    assert state["answers"] == ["t1q1", "t1q2"]
+
+
+async def test_disconnect_flushes_thread(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+    await turn(graph)
+    state = await turn(graph)
+
+    await hot.flush_thread(THREAD)
+
+    assert await durable_answers(durable) == state["answers"]
+    assert hot.stats()["hot"]["dirty_threads"] == 0
+
+
+async def test_timer_flushes_only_expired_threads(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+    await turn(graph)
+    await settle(hot)
+    state = await turn(graph)
+
+    assert await hot.run_once() == {"flushed": 0, "evicted": 0}
+    assert await durable_answers(durable) != state["answers"]
+
+    hot.flush_interval_seconds = 0
+    assert (await hot.run_once())["flushed"] == 1
+    assert await durable_answers(durable) == state["answers"]
+
+
+async def test_memory_pressure_flushes_and_evicts(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+    await turn(graph, "hot-1")
+    await turn(graph, "hot-2")
+    state = await turn(graph, "hot-1")
+    await settle(hot)
+
+    hot.memory_limit_mb = 0
+    result = await hot.run_once()
+
+    assert result["evicted"] == 2
+    assert hot.stats()["hot"]["threads"] == 0
+    assert hot.pressure_events == 1
+    assert await durable_answers(durable, "hot-1") == state["answers"]
+    assert await durable_answers(durable, "hot-2") == ["t1q1"]
+
+
+async def test_aput_during_flush_stays_dirty_for_next_flush(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+    await turn(graph)
+    await settle(hot)
+    flushed = await turn(graph)
+
+    durable.gate = asyncio.Event()
+    flush = asyncio.create_task(hot.flush_thread(THREAD))
+    await asyncio.sleep(0)
+    latest = await turn(graph)
+    durable.gate.set()
+    await flush
+
+    assert await durable_answers(durable) == flushed["answers"]
+    assert hot.stats()["hot"]["dirty_threads"] == 1
+
+    await hot.flush_thread(THREAD)
+    assert await durable_answers(durable) == latest["answers"]
+
+
+async def test_failed_flush_restores_dirty_state(durable):
+    hot = make_hot(durable)
+    graph = build_graph(hot)
+    await turn(graph)
+    await settle(hot)
+    await turn(graph)
+    entry = hot._threads[(THREAD, "")]
+    dirty_since = entry.dirty_since
+
+    durable.gate = asyncio.Event()
+    durable.fail_next = True
+    flush = asyncio.create_task(hot.flush_thread(THREAD))
+    await asyncio.sleep(0)
+    latest = await turn(graph)
+    durable.gate.set()
+
+    with pytest.raises(ConnectionError):
+        await flush
+
+    assert entry.checkpoint_dirty
+    assert entry.dirty_since == dirty_since
+    assert {"answers", "current_question"} <= entry.dirty_keys
+    assert hot.flush_errors == 1
+
+    durable.gate = None
+    await hot.flush_thread(THREAD)
+    assert await durable_answers(durable) == latest["answers"]
+    assert not entry.dirty